@@ -6,11 +6,26 @@ Modèle: LightGBM | ROC-AUC: 0.86
 import streamlit as st
 import pandas as pd
 import numpy as np
-import joblib
 import plotly.graph_objects as go
 import plotly.express as px
+from plotly.subplots import make_subplots
 from datetime import datetime
 import os
+import time
+
+from audit import AuditLogger
+from drift import REFERENCE_PATH, DriftMonitor
+from export import export_frame
+from features import engineer_features
+from feature_store import STORE_PATH, FeatureStore
+from instrumentation import REGISTRY, timed
+from registry import ModelRegistry
+from routing import Router
+from scoring import RISK_BANDS, calibrate, classify_risk, client_frame
+from uncertainty import load_ensemble
+from whatif import LEVERS, cheapest_lever, simulate
+
+_script_wall, _script_cpu = time.perf_counter(), time.thread_time()
 
 # ==================== CONFIGURATION ====================
 st.set_page_config(
@@ -370,7 +385,7 @@ st.markdown("""
     }
     
     /* Buttons */
-    .stButton>button {
+    .stButton>button, .stFormSubmitButton>button {
         background: var(--primary);
         color: white;
         font-weight: 700;
@@ -384,7 +399,7 @@ st.markdown("""
         box-shadow: 0 4px 12px rgba(26,26,46,0.3);
     }
     
-    .stButton>button:hover {
+    .stButton>button:hover, .stFormSubmitButton>button:hover {
         background: var(--primary-light);
         box-shadow: 0 6px 20px rgba(26,26,46,0.4);
         transform: translateY(-2px);
@@ -530,26 +545,70 @@ st.markdown("""
 # ==================== CHARGEMENT MODÈLE ====================
 @st.cache_resource
 def load_model():
-    """Charge le modèle LightGBM et ses composants"""
-    
-    import os
-    
-    # Si on est dans app/, remonte d'un niveau
-    if os.path.exists('../models/lightgbm_churn_final.pkl'):
-        model_path = '../models/'
+    """Charge le registre de modèles et démarre le rechargement à chaud en tâche de fond"""
+    return ModelRegistry().start()
+
+
+@st.cache_resource
+def load_router():
+    """Routage champion / challenger (shadow ou A/B) configuré par CHALLENGER_*"""
+    return Router.from_env(load_model())
+
+
+@st.cache_resource
+def load_audit():
+    """Journal d'audit des prédictions (écriture et suivi de dérive en tâche de fond)"""
+    monitor = DriftMonitor() if os.path.exists(REFERENCE_PATH) else None
+    return AuditLogger(monitor=monitor)
+
+
+@st.cache_resource
+def load_uncertainty(version):
+    """Ensemble bootstrap de la version servie (None s'il n'a pas été construit pour elle)"""
+    return load_ensemble(version)
+
+
+@st.cache_resource
+def load_store():
+    """Ouvre le feature store clients s'il a été construit"""
+    if not os.path.exists(STORE_PATH):
+        return None
+    return FeatureStore(STORE_PATH)
+
+
+def fill_from_store():
+    """Pré-remplit le formulaire avec le client recherché dans le feature store"""
+    store = load_store()
+    query = st.session_state.get("customer_id", "").strip()
+    if store is None or not query.isdigit():
+        st.session_state["lookup"] = None
+        return
+
+    bundle = model_registry.current()
+    record = store.score(int(query), bundle)
+    if record is not None:
+        # Même échelle que les autres probabilités affichées
+        record['calibrated_score'] = float(calibrate(np.array([record['score']]), bundle.metadata)[0])
+    st.session_state["lookup"] = record
+    if record is None:
+        return
+
+    raw = record['raw']
+    st.session_state["gender"] = "Femme" if raw['Gender'] == "Female" else "Homme"
+    st.session_state["age"] = int(min(max(raw['Age'], 18), 100))
+    st.session_state["geo"] = raw['Geography']
+    st.session_state["tenure"] = int(raw['Tenure'])
+    st.session_state["credit"] = int(min(max(raw['CreditScore'], 350), 850))
+    st.session_state["balance"] = float(min(raw['Balance'], 300000.0))
+    st.session_state["salary"] = float(min(raw['Estimated Salary'], 200000.0))
+    st.session_state["products"] = int(raw['Num Of Products'])
+    st.session_state["card"] = "Oui" if raw['Has Credit Card'] else "Non"
+    st.session_state["active"] = "Oui" if raw['Is Active Member'] else "Non"
+
 
-    elif os.path.exists('models/lightgbm_churn_final.pkl'):
-        model_path = 'models/'
-    else:
-        raise FileNotFoundError("Dossier models/ introuvable")
-    
-    model = joblib.load(f'{model_path}lightgbm_churn_final.pkl')
-    metadata = joblib.load(f'{model_path}model_metadata.pkl')
-    scaler = joblib.load(f'{model_path}scaler.pkl')
-    
-    return model, metadata, scaler
 try:
-    model, metadata, scaler = load_model()
+    model_registry = load_model()
+    model, metadata, scaler = model_registry.current()
     model_loaded = True
 except Exception as e:
     model_loaded = False
@@ -595,535 +654,618 @@ if not model_loaded:
     """, unsafe_allow_html=True)
     st.stop()
 
-# ==================== LAYOUT PRINCIPAL ====================
+# ==================== ANALYSE ====================
+def analyse_client(inputs):
+    """Calcule prédiction, niveau de risque et simulation What-If (stockés en session)"""
+    gender = inputs['gender']
+    age = inputs['age']
+    geography = inputs['geography']
+    tenure = inputs['tenure']
+    credit_score = inputs['credit_score']
+    balance = inputs['balance']
+    estimated_salary = inputs['estimated_salary']
+    num_products = inputs['num_products']
+    
+    # Encodage (pour l'affichage et les recommandations)
+    gender_encoded = 1 if gender == "Femme" else 0
+    has_card_encoded = 1 if inputs['has_credit_card'] == "Oui" else 0
+    is_active_encoded = 1 if inputs['is_active_member'] == "Oui" else 0
+    
+    # Feature Engineering (pipeline identique à l'entraînement)
+    client_raw = client_frame(**{
+        'CreditScore': credit_score,
+        'Geography': geography,
+        'Gender': "Female" if gender_encoded else "Male",
+        'Age': age,
+        'Tenure': tenure,
+        'Balance': balance,
+        'Num Of Products': num_products,
+        'Has Credit Card': has_card_encoded,
+        'Is Active Member': is_active_encoded,
+        'Estimated Salary': estimated_salary,
+    })
+    
+    # Prédiction (champion, ou challenger en A/B) : l'analyse reste sur ce bundle
+    # même si le registre bascule entre-temps
+    customer_id = st.session_state.get("customer_id", "").strip()
+    bundle, probabilities = load_router().score(client_raw, key=customer_id or None)
+    model, metadata, scaler = bundle
+    probability = float(probabilities[0])
+    optimal_threshold = metadata['optimal_threshold']
+    # Probabilité calibrée (prior réel) : niveaux de risque ; la décision reste sur le score brut
+    calibrated = calibrate(probabilities, metadata)
+    
+    # Audit : simple ajout au tampon mémoire, l'écriture disque se fait en tâche de fond
+    load_audit().log(client_raw, probabilities, bundle.version, optimal_threshold,
+                     customer_id=int(customer_id) if customer_id.isdigit() else None, calibrated=calibrated)
+    
+    # Incertitude : dispersion des membres de l'ensemble bootstrap (si construit pour ce modèle)
+    ensemble = load_uncertainty(bundle.version)
+    uncertainty = None
+    if ensemble is not None:
+        X = engineer_features(client_raw).to_numpy(dtype=np.float32)
+        uncertainty = {key: float(values[0]) for key, values in ensemble.uncertainty(X, probabilities, metadata).items()}
+        uncertainty['members'] = ensemble.n_members
+    
+    # Simulation What-If
+    start = time.perf_counter()
+    grid = simulate(client_raw.iloc[0].to_dict(), model, scaler)
+    whatif_ms = (time.perf_counter() - start) * 1000
+    
+    return {
+        **inputs,
+        'analysed_at': datetime.now(),
+        'model_version': bundle.version,
+        'raw': client_raw,
+        'gender_encoded': gender_encoded,
+        'has_card_encoded': has_card_encoded,
+        'is_active_encoded': is_active_encoded,
+        'balance_salary_ratio': balance / (estimated_salary + 1),
+        'high_risk': 1 if (age > 40 and age < 60 and is_active_encoded == 0) else 0,
+        'engagement_score': (is_active_encoded * 3) + has_card_encoded + (2 if num_products >= 2 else 0),
+        'probability': probability,
+        'calibrated_probability': float(calibrated[0]),
+        'optimal_threshold': optimal_threshold,
+        # Seuil de décision reporté sur l'échelle calibrée (jauge)
+        'calibrated_threshold': float(calibrate(np.array([optimal_threshold]), metadata)[0]),
+        'prediction': 1 if probability >= optimal_threshold else 0,
+        'risk_level': classify_risk(float(calibrated[0])),
+        'uncertainty': uncertainty,
+        'grid': grid,
+        'best': cheapest_lever(grid, probability, optimal_threshold),
+        'whatif_ms': whatif_ms,
+    }
 
-# Création des colonnes principales
-col_config, col_results = st.columns([380, 1020], gap="large")
 
-# ==================== COLONNE GAUCHE : CONFIGURATION ====================
-with col_config:
-    st.markdown('<div class="config-panel">', unsafe_allow_html=True)
+# ==================== AFFICHAGE RÉSULTATS ====================
+def render_results(analysis):
+    """Affiche la dernière analyse enregistrée en session"""
+    gender, age, geography, tenure = (analysis[k] for k in ('gender', 'age', 'geography', 'tenure'))
+    credit_score, balance, estimated_salary = (analysis[k] for k in ('credit_score', 'balance', 'estimated_salary'))
+    num_products, analysed_at, version = analysis['num_products'], analysis['analysed_at'], analysis['model_version']
+    gender_encoded, has_card_encoded, is_active_encoded = (
+        analysis[k] for k in ('gender_encoded', 'has_card_encoded', 'is_active_encoded'))
+    balance_salary_ratio, high_risk, engagement_score = (
+        analysis[k] for k in ('balance_salary_ratio', 'high_risk', 'engagement_score'))
+    probability, optimal_threshold, prediction = (
+        analysis[k] for k in ('probability', 'optimal_threshold', 'prediction'))
+    risk_level, grid, best, whatif_ms = (analysis[k] for k in ('risk_level', 'grid', 'best', 'whatif_ms'))
+    calibrated_probability = analysis['calibrated_probability']
+    calibrated_threshold = analysis['calibrated_threshold']
+    
+    # Classification risque
+    if risk_level == "Faible":
+        risk_class = "risk-low"
+        risk_color = "#00b894"
+        alert_class = "alert-success"
+    elif risk_level == "Modéré":
+        risk_class = "risk-medium"
+        risk_color = "#fdcb6e"
+        alert_class = "alert-warning"
+    else:
+        risk_class = "risk-high"
+        risk_color = "#d63031"
+        alert_class = "alert-danger"
+    
+
     
-    st.markdown("<h2>Configuration Client</h2>", unsafe_allow_html=True)
+    # Alert principale
+    st.markdown(f"""
+    <div class="alert {alert_class}">
+        <strong>Résultat de l'Analyse</strong><br>
+        Classification : <strong>{'CHURN' if prediction == 1 else 'RÉTENTION'}</strong> • 
+        Niveau de risque : <span class="risk-badge {risk_class}">{risk_level}</span>
+    </div>
+    """, unsafe_allow_html=True)
     
-    # Section Profil
-    st.markdown('<div class="form-section">', unsafe_allow_html=True)
-    st.markdown("<h3>Profil Client</h3>", unsafe_allow_html=True)
+    # Métriques clés
+    col1, col2, col3 = st.columns(3)
     
-    gender = st.selectbox("Genre", ["Homme", "Femme"], key="gender")
-    age = st.slider("Âge", 18, 100, 42, key="age")
-    geography = st.selectbox("Localisation", ["France", "Germany", "Spain"], key="geo")
-    tenure = st.slider("Ancienneté (années)", 0, 10, 5, key="tenure")
+    with col1:
+        st.metric(
+            "Probabilité de Churn",
+            f"{calibrated_probability*100:.1f}%",
+            delta=f"score {(probability - optimal_threshold)*100:+.1f}% vs seuil",
+            help="Probabilité calibrée sur le taux de churn réel ; la classification compare le score brut au seuil optimal"
+        )
     
-    st.markdown('</div>', unsafe_allow_html=True)
+    with col2:
+        uncertainty = analysis['uncertainty']
+        if uncertainty is not None:
+            st.metric(
+                "Incertitude",
+                f"±{uncertainty['std']*100:.1f} pts",
+                delta=f"{uncertainty['agreement']:.0%} des modèles d'accord",
+                delta_color="normal" if uncertainty['agreement'] == 1 else "inverse",
+                help=(f"Intervalle 80 % de la probabilité calibrée : {uncertainty['low']:.1%} – "
+                      f"{uncertainty['high']:.1%} (ensemble bootstrap de {uncertainty['members']} modèles)")
+            )
+        else:
+            st.metric(
+                "Incertitude",
+                "n/d",
+                help="Ensemble bootstrap absent pour ce modèle : python app/uncertainty.py train"
+            )
     
-    # Section Financière
-    st.markdown('<div class="form-section">', unsafe_allow_html=True)
-    st.markdown("<h3>Données Financières</h3>", unsafe_allow_html=True)
+    with col3:
+        st.metric(
+            "Classification",
+            "CHURN" if prediction == 1 else "STABLE",
+            delta="À risque" if prediction == 1 else "Fidèle",
+            delta_color="inverse"
+        )
     
-    credit_score = st.slider("Credit Score", 350, 850, 650, 10, key="credit")
-    balance = st.number_input("Solde du compte (€)", 0.0, 300000.0, 80000.0, 5000.0, key="balance")
-    estimated_salary = st.number_input("Salaire estimé (€)", 0.0, 200000.0, 100000.0, 5000.0, key="salary")
+    # Jauge de risque
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Évaluation du Risque</h3>", unsafe_allow_html=True)
+    
+    # Probabilité calibrée, comme le niveau de risque : les zones colorées sont les bandes RISK_BANDS
+    fig_gauge = go.Figure(go.Indicator(
+        mode="gauge+number+delta",
+        value=calibrated_probability * 100,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        title={'text': f"Probabilité de Churn calibrée (Seuil optimal: {calibrated_threshold:.1%})",
+               'font': {'size': 18}},
+        delta={'reference': calibrated_threshold * 100, 'increasing': {'color': risk_color}},
+        number={'suffix': "%", 'font': {'size': 48}},
+        gauge={
+            'axis': {'range': [0, 100], 'tickwidth': 2},
+            'bar': {'color': risk_color, 'thickness': 0.7},
+            'bgcolor': "white",
+            'borderwidth': 2,
+            'bordercolor': "#e1e8ed",
+            'steps': [
+                {'range': [0, RISK_BANDS[0] * 100], 'color': "#f0fff4"},
+                {'range': [RISK_BANDS[0] * 100, RISK_BANDS[1] * 100], 'color': "#fffbeb"},
+                {'range': [RISK_BANDS[1] * 100, 100], 'color': "#fff5f5"}
+            ],
+            'threshold': {
+                'line': {'color': "#1a1a2e", 'width': 3},
+                'thickness': 0.75,
+                'value': calibrated_threshold * 100
+            }
+        }
+    ))
+    
+    fig_gauge.update_layout(
+        height=300,
+        paper_bgcolor='rgba(0,0,0,0)',
+        font={'family': "Inter", 'size': 14},
+        margin=dict(l=20, r=20, t=60, b=20)
+    )
     
+    st.plotly_chart(fig_gauge, use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Section Produits
-    st.markdown('<div class="form-section">', unsafe_allow_html=True)
-    st.markdown("<h3>Produits & Services</h3>", unsafe_allow_html=True)
+    # Simulation What-If
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Simulation What-If</h3>", unsafe_allow_html=True)
     
-    num_products = st.selectbox("Nombre de produits", [1, 2, 3, 4], index=1, key="products")
-    has_credit_card = st.radio("Carte de crédit", ["Oui", "Non"], horizontal=True, key="card")
-    is_active_member = st.radio("Membre actif", ["Oui", "Non"], horizontal=True, key="active")
+    if best is None:
+        st.markdown("""
+        <div class="alert alert-success">
+            <strong>Aucun levier simple</strong><br>
+            Aucune variante testée ne réduit la probabilité de churn.
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        crosses = best['probability'] < optimal_threshold
+        st.markdown(f"""
+        <div class="alert {'alert-success' if crosses else 'alert-warning'}">
+            <strong>Levier le moins coûteux : {LEVERS[best['lever']]['label']} → {best['value']:,.0f}</strong><br>
+            Probabilité : {probability*100:.1f}% → {best['probability']*100:.1f}%
+            ({'sous' if crosses else 'au-dessus du'} seuil) • Coût estimé : {best['cost']:,.0f} €
+        </div>
+        """, unsafe_allow_html=True)
     
+    fig_whatif = make_subplots(rows=2, cols=3, subplot_titles=[lever['label'] for lever in LEVERS.values()])
+    for i, (column, lever) in enumerate(LEVERS.items()):
+        curve = grid[grid['lever'] == column]
+        fig_whatif.add_trace(go.Scatter(
+            x=curve['value'], y=curve['probability'] * 100,
+            mode='lines+markers', line=dict(color='#533483', width=2), marker=dict(size=4),
+            showlegend=False
+        ), row=i // 3 + 1, col=i % 3 + 1)
+        fig_whatif.add_hline(y=optimal_threshold * 100, line_dash='dash', line_color='#d63031',
+                             row=i // 3 + 1, col=i % 3 + 1)
+    
+    fig_whatif.update_layout(
+        height=500,
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(family="Inter", size=12),
+        margin=dict(l=20, r=20, t=40, b=20)
+    )
+    fig_whatif.update_yaxes(range=[0, 100], ticksuffix='%')
+    
+    st.plotly_chart(fig_whatif, use_container_width=True)
+    st.caption(f"{len(grid)} variantes scorées en un seul appel ({whatif_ms:.1f} ms)")
     st.markdown('</div>', unsafe_allow_html=True)
     
-    # Bouton Analyse
-    st.markdown("<br>", unsafe_allow_html=True)
-    predict_button = st.button("ANALYSER LE RISQUE", type="primary", use_container_width=True)
+    # Recommandations
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Plan d'Action Recommandé</h3>", unsafe_allow_html=True)
+    
+    recommendations = []
+    
+    if is_active_encoded == 0:
+        recommendations.append({
+            'title': 'Réactivation Client Prioritaire',
+            'description': 'Client inactif - risque de churn multiplié par 2. Contact personnalisé requis sous 48h.',
+            'priority': 'high'
+        })
+    
+    if geography == "Germany":
+        recommendations.append({
+            'title': 'Marché Allemand à Risque',
+            'description': 'Le marché allemand présente un taux de churn 2× supérieur (32%). Mesures de rétention spécifiques.',
+            'priority': 'high'
+        })
+    
+    if age >= 40 and age <= 60 and gender_encoded == 1:
+        recommendations.append({
+            'title': 'Segment Critique Femmes 40-60 ans',
+            'description': 'Ce segment affiche un taux de churn de 56%. Programme privilège avec gestionnaire dédié.',
+            'priority': 'high'
+        })
+    
+    if num_products >= 3:
+        recommendations.append({
+            'title': 'Optimisation Portefeuille Produits',
+            'description': f'{num_products} produits détenus. Configuration 3-4 produits corrélée au churn.',
+            'priority': 'high'
+        })
+    
+    if balance > 100000:
+        recommendations.append({
+            'title': 'Service Private Banking',
+            'description': f'Solde élevé ({balance:,.0f}€). Éligibilité au service Private Banking.',
+            'priority': 'medium'
+        })
+    
+    if credit_score < 500:
+        recommendations.append({
+            'title': 'Accompagnement Credit Score',
+            'description': f'Credit score faible ({credit_score}). Plan d\'amélioration avec conseiller financier.',
+            'priority': 'medium'
+        })
+    
+    if tenure < 2:
+        recommendations.append({
+            'title': 'Programme Onboarding',
+            'description': f'Client récent ({tenure} an). Phase critique - suivi renforcé 12 premiers mois.',
+            'priority': 'medium'
+        })
+    
+    if balance == 0:
+        recommendations.append({
+            'title': 'Alerte Compte Dormant',
+            'description': 'Solde nul - forte probabilité de dormance. Contact immédiat requis.',
+            'priority': 'high'
+        })
+    
+    if recommendations:
+        for rec in recommendations:
+            priority_class = "priority-high" if rec['priority'] == 'high' else ""
+            badge_class = "priority-high-badge" if rec['priority'] == 'high' else "priority-medium-badge"
+            badge_text = "PRIORITÉ HAUTE" if rec['priority'] == 'high' else "PRIORITÉ MOYENNE"
+            
+            st.markdown(f"""
+            <div class="recommendation {priority_class}">
+                <h4>{rec['title']}</h4>
+                <p>{rec['description']}</p>
+                <span class="priority-badge {badge_class}">{badge_text}</span>
+            </div>
+            """, unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div class="alert alert-success">
+            <strong>Profil stable</strong><br>
+            Aucune action urgente requise. Maintien du suivi standard.
+        </div>
+        """, unsafe_allow_html=True)
     
     st.markdown('</div>', unsafe_allow_html=True)
-
-# ==================== COLONNE DROITE : RÉSULTATS ====================
-with col_results:
     
-    if predict_button:
-        
-        # Encodage
-        gender_encoded = 1 if gender == "Femme" else 0
-        has_card_encoded = 1 if has_credit_card == "Oui" else 0
-        is_active_encoded = 1 if is_active_member == "Oui" else 0
-        
-        geo_france = 1 if geography == "France" else 0
-        geo_germany = 1 if geography == "Germany" else 0
-        geo_spain = 1 if geography == "Spain" else 0
-        
-        # Feature Engineering
-        balance_salary_ratio = balance / (estimated_salary + 1)
-        
-        if age < 30:
-            age_group_young, age_group_middle, age_group_senior = 1, 0, 0
-        elif age < 50:
-            age_group_young, age_group_middle, age_group_senior = 0, 1, 0
-        else:
-            age_group_young, age_group_middle, age_group_senior = 0, 0, 1
-        
-        zero_balance = 1 if balance == 0 else 0
-        is_premium = 1 if balance > 100000 else 0
-        high_risk = 1 if (age >= 40 and age <= 60 and gender_encoded == 1 and geo_germany == 1) else 0
-        
-        geogender_france_female = geo_france * gender_encoded
-        geogender_germany_female = geo_germany * gender_encoded
-        geogender_spain_female = geo_spain * gender_encoded
-        
-        if tenure <= 2:
-            tenure_short, tenure_medium, tenure_long = 1, 0, 0
-        elif tenure <= 5:
-            tenure_short, tenure_medium, tenure_long = 0, 1, 0
-        else:
-            tenure_short, tenure_medium, tenure_long = 0, 0, 1
-        
-        engagement_score = (is_active_encoded * 2) + has_card_encoded + min(num_products, 2)
-        
-        # Créer le DataFrame avec les features dans l'ordre exact du modèle
-        feature_order = metadata['features']
-        
-        # Créer le dictionnaire avec TOUTES les features dans le bon ordre
-        client_data = {}
-        
-        # Remplir avec les valeurs numériques brutes (avant normalisation)
-        for feature in feature_order:
-            if feature == 'CreditScore':
-                client_data[feature] = credit_score
-            elif feature == 'Age':
-                client_data[feature] = age
-            elif feature == 'Tenure':
-                client_data[feature] = tenure
-            elif feature == 'Balance':
-                client_data[feature] = balance
-            elif feature == 'Num Of Products':
-                client_data[feature] = num_products
-            elif feature == 'Has Credit Card':
-                client_data[feature] = has_card_encoded
-            elif feature == 'Is Active Member':
-                client_data[feature] = is_active_encoded
-            elif feature == 'Estimated Salary':
-                client_data[feature] = estimated_salary
-            elif feature == 'Gender':
-                client_data[feature] = gender_encoded
-            elif feature == 'Geography_Germany':
-                client_data[feature] = geo_germany
-            elif feature == 'Geography_Spain':
-                client_data[feature] = geo_spain
-            elif feature == 'Balance_Salary_Ratio':
-                client_data[feature] = balance_salary_ratio
-            elif feature == 'Age_Group_Middle-aged':
-                client_data[feature] = age_group_middle
-            elif feature == 'Age_Group_Senior':
-                client_data[feature] = age_group_senior
-            elif feature == 'Age_Group_Young':
-                client_data[feature] = age_group_young
-            elif feature == 'Zero_Balance':
-                client_data[feature] = zero_balance
-            elif feature == 'Is_Premium':
-                client_data[feature] = is_premium
-            elif feature == 'High_Risk':
-                client_data[feature] = high_risk
-            elif feature == 'GeoGender_France_Female':
-                client_data[feature] = geogender_france_female
-            elif feature == 'GeoGender_Germany_Female':
-                client_data[feature] = geogender_germany_female
-            elif feature == 'GeoGender_Spain_Female':
-                client_data[feature] = geogender_spain_female
-            elif feature == 'Tenure_Group_Medium':
-                client_data[feature] = tenure_medium
-            elif feature == 'Tenure_Group_Short':
-                client_data[feature] = tenure_short
-            elif feature == 'Engagement_Score':
-                client_data[feature] = engagement_score
-            else:
-                client_data[feature] = 0
-        
-        # Créer le DataFrame avec les colonnes dans le bon ordre
-        client_df = pd.DataFrame([client_data])[feature_order]
-        
-        # Normalisation avec le scaler
-        client_df_scaled = pd.DataFrame(
-            scaler.transform(client_df),
-            columns=feature_order
-        )
-        
-        # Prédiction
-        probability = model.predict_proba(client_df_scaled)[0, 1]
-        optimal_threshold = metadata['optimal_threshold']
-        prediction = 1 if probability >= optimal_threshold else 0
-        
-        # Classification risque
-        if probability < 0.3:
-            risk_level = "Faible"
-            risk_class = "risk-low"
-            risk_color = "#00b894"
-            alert_class = "alert-success"
-        elif probability < 0.6:
-            risk_level = "Modéré"
-            risk_class = "risk-medium"
-            risk_color = "#fdcb6e"
-            alert_class = "alert-warning"
-        else:
-            risk_level = "Élevé"
-            risk_class = "risk-high"
-            risk_color = "#d63031"
-            alert_class = "alert-danger"
-        
-        # ========== AFFICHAGE RÉSULTATS ==========
-        
-        # Alert principale
+    # Profil détaillé
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Fiche Client Détaillée</h3>", unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("""
+        <div class="info-box">
+            <h4>Informations Démographiques</h4>
+            <ul>
+                <li><strong>Genre</strong> : """ + gender + """</li>
+                <li><strong>Âge</strong> : """ + str(age) + """ ans</li>
+                <li><strong>Localisation</strong> : """ + geography + """</li>
+                <li><strong>Ancienneté</strong> : """ + str(tenure) + """ année(s)</li>
+                <li><strong>Statut</strong> : """ + ('Actif' if is_active_encoded else 'Inactif') + """</li>
+                <li><strong>Profil à risque</strong> : """ + ('Oui' if high_risk else 'Non') + """</li>
+            </ul>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
         st.markdown(f"""
-        <div class="alert {alert_class}">
-            <strong>Résultat de l'Analyse</strong><br>
-            Classification : <strong>{'CHURN' if prediction == 1 else 'RÉTENTION'}</strong> • 
-            Niveau de risque : <span class="risk-badge {risk_class}">{risk_level}</span>
+        <div class="info-box">
+            <h4>Données Financières</h4>
+            <ul>
+                <li><strong>Credit Score</strong> : {credit_score}/850</li>
+                <li><strong>Solde</strong> : {balance:,.0f} €</li>
+                <li><strong>Salaire</strong> : {estimated_salary:,.0f} €</li>
+                <li><strong>Ratio Solde/Salaire</strong> : {balance_salary_ratio:.2f}</li>
+                <li><strong>Produits détenus</strong> : {num_products}</li>
+                <li><strong>Carte bancaire</strong> : {'Oui' if has_card_encoded else 'Non'}</li>
+                <li><strong>Score engagement</strong> : {engagement_score}/6</li>
+            </ul>
         </div>
         """, unsafe_allow_html=True)
-        
-        # Métriques clés
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric(
-                "Probabilité de Churn",
-                f"{probability*100:.1f}%",
-                delta=f"{(probability - optimal_threshold)*100:+.1f}% vs seuil"
-            )
-        
-        with col2:
-            confidence = abs(probability - 0.5) * 2
-            st.metric(
-                "Niveau de Confiance",
-                f"{confidence*100:.0f}%",
-                delta="Élevé" if confidence > 0.7 else "Modéré"
-            )
-        
-        with col3:
-            st.metric(
-                "Classification",
-                "CHURN" if prediction == 1 else "STABLE",
-                delta="À risque" if prediction == 1 else "Fidèle",
-                delta_color="inverse"
-            )
-        
-        # Jauge de risque
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("<h3>Évaluation du Risque</h3>", unsafe_allow_html=True)
-        
-        fig_gauge = go.Figure(go.Indicator(
-            mode="gauge+number+delta",
-            value=probability * 100,
-            domain={'x': [0, 1], 'y': [0, 1]},
-            title={'text': f"Score de Churn (Seuil optimal: {optimal_threshold:.1%})", 'font': {'size': 18}},
-            delta={'reference': optimal_threshold * 100, 'increasing': {'color': risk_color}},
-            number={'suffix': "%", 'font': {'size': 48}},
-            gauge={
-                'axis': {'range': [0, 100], 'tickwidth': 2},
-                'bar': {'color': risk_color, 'thickness': 0.7},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "#e1e8ed",
-                'steps': [
-                    {'range': [0, 30], 'color': "#f0fff4"},
-                    {'range': [30, 60], 'color': "#fffbeb"},
-                    {'range': [60, 100], 'color': "#fff5f5"}
-                ],
-                'threshold': {
-                    'line': {'color': "#1a1a2e", 'width': 3},
-                    'thickness': 0.75,
-                    'value': optimal_threshold * 100
-                }
-            }
-        ))
-        
-        fig_gauge.update_layout(
-            height=300,
-            paper_bgcolor='rgba(0,0,0,0)',
-            font={'family': "Inter", 'size': 14},
-            margin=dict(l=20, r=20, t=60, b=20)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Comparaison
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Analyse Comparative</h3>", unsafe_allow_html=True)
+    
+    comparison_data = pd.DataFrame({
+        'Indicateur': ['Âge', 'Solde (k€)', 'Credit Score', 'Ancienneté', 'Nb Produits'],
+        'Client': [age, balance/1000, credit_score, tenure, num_products],
+        'Médiane Portfolio': [39, 76, 650, 5, 2]
+    })
+    
+    fig_comp = go.Figure()
+    
+    fig_comp.add_trace(go.Bar(
+        name='Client',
+        x=comparison_data['Indicateur'],
+        y=comparison_data['Client'],
+        marker_color='#533483',
+        text=comparison_data['Client'].round(1),
+        textposition='outside'
+    ))
+    
+    fig_comp.add_trace(go.Bar(
+        name='Médiane Portfolio',
+        x=comparison_data['Indicateur'],
+        y=comparison_data['Médiane Portfolio'],
+        marker_color='#1a1a2e',
+        text=comparison_data['Médiane Portfolio'].round(1),
+        textposition='outside'
+    ))
+    
+    fig_comp.update_layout(
+        barmode='group',
+        height=400,
+        title="Position Client vs Médiane du Portfolio",
+        xaxis_title="",
+        yaxis_title="Valeur",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(family="Inter", size=12),
+        title_font=dict(size=16, color='#1a1a2e')
+    )
+    
+    st.plotly_chart(fig_comp, use_container_width=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Export
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Export de l'Analyse</h3>", unsafe_allow_html=True)
+    
+    export_df = export_frame(analysis['raw'], [probability], optimal_threshold, version, analysed_at,
+                             calibrated=[calibrated_probability],
+                             uncertainty=analysis['uncertainty'] and {
+                                 key: [value] for key, value in analysis['uncertainty'].items()})
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        csv = export_df.to_csv(index=False).encode('utf-8')
+        st.download_button(
+            label="Télécharger (CSV)",
+            data=csv,
+            file_name=f'analyse_churn_{analysed_at.strftime("%Y%m%d_%H%M%S")}.csv',
+            mime='text/csv',
+            use_container_width=True
         )
-        
-        st.plotly_chart(fig_gauge, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Recommandations
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("<h3>Plan d'Action Recommandé</h3>", unsafe_allow_html=True)
-        
-        recommendations = []
-        
-        if is_active_encoded == 0:
-            recommendations.append({
-                'title': 'Réactivation Client Prioritaire',
-                'description': 'Client inactif - risque de churn multiplié par 2. Contact personnalisé requis sous 48h.',
-                'priority': 'high'
-            })
-        
-        if geography == "Germany":
-            recommendations.append({
-                'title': 'Marché Allemand à Risque',
-                'description': 'Le marché allemand présente un taux de churn 2× supérieur (32%). Mesures de rétention spécifiques.',
-                'priority': 'high'
-            })
-        
-        if age >= 40 and age <= 60 and gender_encoded == 1:
-            recommendations.append({
-                'title': 'Segment Critique Femmes 40-60 ans',
-                'description': 'Ce segment affiche un taux de churn de 56%. Programme privilège avec gestionnaire dédié.',
-                'priority': 'high'
-            })
-        
-        if num_products >= 3:
-            recommendations.append({
-                'title': 'Optimisation Portefeuille Produits',
-                'description': f'{num_products} produits détenus. Configuration 3-4 produits corrélée au churn.',
-                'priority': 'high'
-            })
-        
-        if balance > 100000:
-            recommendations.append({
-                'title': 'Service Private Banking',
-                'description': f'Solde élevé ({balance:,.0f}€). Éligibilité au service Private Banking.',
-                'priority': 'medium'
-            })
-        
-        if credit_score < 500:
-            recommendations.append({
-                'title': 'Accompagnement Credit Score',
-                'description': f'Credit score faible ({credit_score}). Plan d\'amélioration avec conseiller financier.',
-                'priority': 'medium'
-            })
-        
-        if tenure < 2:
-            recommendations.append({
-                'title': 'Programme Onboarding',
-                'description': f'Client récent ({tenure} an). Phase critique - suivi renforcé 12 premiers mois.',
-                'priority': 'medium'
-            })
-        
-        if balance == 0:
-            recommendations.append({
-                'title': 'Alerte Compte Dormant',
-                'description': 'Solde nul - forte probabilité de dormance. Contact immédiat requis.',
-                'priority': 'high'
-            })
-        
-        if recommendations:
-            for rec in recommendations:
-                priority_class = "priority-high" if rec['priority'] == 'high' else ""
-                badge_class = "priority-high-badge" if rec['priority'] == 'high' else "priority-medium-badge"
-                badge_text = "PRIORITÉ HAUTE" if rec['priority'] == 'high' else "PRIORITÉ MOYENNE"
-                
-                st.markdown(f"""
-                <div class="recommendation {priority_class}">
-                    <h4>{rec['title']}</h4>
-                    <p>{rec['description']}</p>
-                    <span class="priority-badge {badge_class}">{badge_text}</span>
-                </div>
-                """, unsafe_allow_html=True)
-        else:
-            st.markdown("""
-            <div class="alert alert-success">
-                <strong>Profil stable</strong><br>
-                Aucune action urgente requise. Maintien du suivi standard.
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Profil détaillé
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("<h3>Fiche Client Détaillée</h3>", unsafe_allow_html=True)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.markdown("""
-            <div class="info-box">
-                <h4>Informations Démographiques</h4>
-                <ul>
-                    <li><strong>Genre</strong> : """ + gender + """</li>
-                    <li><strong>Âge</strong> : """ + str(age) + """ ans</li>
-                    <li><strong>Localisation</strong> : """ + geography + """</li>
-                    <li><strong>Ancienneté</strong> : """ + str(tenure) + """ année(s)</li>
-                    <li><strong>Statut</strong> : """ + ('Actif' if is_active_encoded else 'Inactif') + """</li>
-                    <li><strong>Profil à risque</strong> : """ + ('Oui' if high_risk else 'Non') + """</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="info-box">
-                <h4>Données Financières</h4>
-                <ul>
-                    <li><strong>Credit Score</strong> : {credit_score}/850</li>
-                    <li><strong>Solde</strong> : {balance:,.0f} €</li>
-                    <li><strong>Salaire</strong> : {estimated_salary:,.0f} €</li>
-                    <li><strong>Ratio Solde/Salaire</strong> : {balance_salary_ratio:.2f}</li>
-                    <li><strong>Produits détenus</strong> : {num_products}</li>
-                    <li><strong>Carte bancaire</strong> : {'Oui' if has_card_encoded else 'Non'}</li>
-                    <li><strong>Score engagement</strong> : {engagement_score}/5</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Comparaison
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("<h3>Analyse Comparative</h3>", unsafe_allow_html=True)
-        
-        comparison_data = pd.DataFrame({
-            'Indicateur': ['Âge', 'Solde (k€)', 'Credit Score', 'Ancienneté', 'Nb Produits'],
-            'Client': [age, balance/1000, credit_score, tenure, num_products],
-            'Médiane Portfolio': [39, 76, 650, 5, 2]
-        })
-        
-        fig_comp = go.Figure()
-        
-        fig_comp.add_trace(go.Bar(
-            name='Client',
-            x=comparison_data['Indicateur'],
-            y=comparison_data['Client'],
-            marker_color='#533483',
-            text=comparison_data['Client'].round(1),
-            textposition='outside'
-        ))
-        
-        fig_comp.add_trace(go.Bar(
-            name='Médiane Portfolio',
-            x=comparison_data['Indicateur'],
-            y=comparison_data['Médiane Portfolio'],
-            marker_color='#1a1a2e',
-            text=comparison_data['Médiane Portfolio'].round(1),
-            textposition='outside'
-        ))
-        
-        fig_comp.update_layout(
-            barmode='group',
-            height=400,
-            title="Position Client vs Médiane du Portfolio",
-            xaxis_title="",
-            yaxis_title="Valeur",
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(family="Inter", size=12),
-            title_font=dict(size=16, color='#1a1a2e')
+    
+    with col2:
+        json_str = export_df.to_json(orient='records', indent=2, date_format='iso', double_precision=6)
+        st.download_button(
+            label="Télécharger (JSON)",
+            data=json_str,
+            file_name=f'analyse_churn_{analysed_at.strftime("%Y%m%d_%H%M%S")}.json',
+            mime='application/json',
+            use_container_width=True
         )
-        
-        st.plotly_chart(fig_comp, use_container_width=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Export
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("<h3>Export de l'Analyse</h3>", unsafe_allow_html=True)
-        
-        export_data = {
-            'Date_Analyse': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'Genre': gender,
-            'Age': age,
-            'Pays': geography,
-            'Credit_Score': credit_score,
-            'Anciennete': tenure,
-            'Solde': balance,
-            'Salaire': estimated_salary,
-            'Nb_Produits': num_products,
-            'Carte_Credit': 'Oui' if has_card_encoded else 'Non',
-            'Membre_Actif': 'Oui' if is_active_encoded else 'Non',
-            'Probabilite_Churn': f"{probability:.4f}",
-            'Classification': 'CHURN' if prediction == 1 else 'RETENTION',
-            'Niveau_Risque': risk_level,
-            'Seuil_Utilise': f"{optimal_threshold:.4f}"
-        }
-        
-        export_df = pd.DataFrame([export_data])
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            csv = export_df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="Télécharger (CSV)",
-                data=csv,
-                file_name=f'analyse_churn_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                mime='text/csv',
-                use_container_width=True
-            )
-        
-        with col2:
-            json_str = export_df.to_json(orient='records', indent=2)
-            st.download_button(
-                label="Télécharger (JSON)",
-                data=json_str,
-                file_name=f'analyse_churn_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json',
-                mime='application/json',
-                use_container_width=True
-            )
-        
-        st.markdown('</div>', unsafe_allow_html=True)
     
-    else:
-        # État initial
-        st.markdown("""
-        <div class="card">
-            <div style="text-align: center; padding: 4rem 2rem;">
-                <h3 style="color: #1a1a2e; margin-bottom: 1.5rem; font-size: 2rem;">
-                    Analyse Prédictive du Risque de Churn
-                </h3>
-                <p style="font-size: 1.1rem; color: #636e72; line-height: 1.8; max-width: 700px; margin: 0 auto;">
-                    Configurez les paramètres client dans le panneau de gauche,<br>
-                    puis lancez l'analyse pour obtenir une évaluation complète du risque.
-                </p>
-            </div>
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+def render_welcome():
+    """État initial : présentation et performances du modèle"""
+    st.markdown("""
+    <div class="card">
+        <div style="text-align: center; padding: 4rem 2rem;">
+            <h3 style="color: #1a1a2e; margin-bottom: 1.5rem; font-size: 2rem;">
+                Analyse Prédictive du Risque de Churn
+            </h3>
+            <p style="font-size: 1.1rem; color: #636e72; line-height: 1.8; max-width: 700px; margin: 0 auto;">
+                Configurez les paramètres client dans le panneau de gauche,<br>
+                puis lancez l'analyse pour obtenir une évaluation complète du risque.
+            </p>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Métriques du modèle
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("<h3>Performance du Modèle</h3>", unsafe_allow_html=True)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="value">{perf['accuracy']*100:.1f}%</div>
+            <div class="label">Accuracy</div>
         </div>
         """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="value">{perf['roc_auc']:.3f}</div>
+            <div class="label">ROC-AUC</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="value">{perf_opt['recall']*100:.1f}%</div>
+            <div class="label">Recall</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="metric-card">
+            <div class="value">{perf_opt['f1_score']:.3f}</div>
+            <div class="label">F1-Score</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
+
+# ==================== LAYOUT PRINCIPAL ====================
+@st.fragment
+def analysis_panel():
+    """Formulaire + résultats : seul ce fragment est ré-exécuté lors d'une analyse"""
+    with timed("fragment_analyse"):
+        col_config, col_results = st.columns([380, 1020], gap="large")
         
-        # Métriques du modèle
-        st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("<h3>Performance du Modèle</h3>", unsafe_allow_html=True)
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="value">{perf['accuracy']*100:.1f}%</div>
-                <div class="label">Accuracy</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="value">{perf['roc_auc']:.3f}</div>
-                <div class="label">ROC-AUC</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="value">{perf_opt['recall']*100:.1f}%</div>
-                <div class="label">Recall</div>
-            </div>
-            """, unsafe_allow_html=True)
+        # ==================== COLONNE GAUCHE : CONFIGURATION ====================
+        with col_config:
+            st.markdown('<div class="config-panel">', unsafe_allow_html=True)
+            
+            st.markdown("<h2>Configuration Client</h2>", unsafe_allow_html=True)
+            
+            # Recherche par CustomerId (feature store)
+            if load_store() is not None:
+                st.markdown('<div class="form-section">', unsafe_allow_html=True)
+                st.markdown("<h3>Recherche Client</h3>", unsafe_allow_html=True)
+                st.text_input("CustomerId", key="customer_id", on_change=fill_from_store,
+                              placeholder="ex : 15634602")
+                lookup = st.session_state.get("lookup")
+                if st.session_state.get("customer_id") and lookup is None:
+                    st.caption("Client introuvable dans le feature store")
+                elif lookup is not None:
+                    st.caption(f"Dernier score : {lookup['calibrated_score']*100:.1f}% (modèle {lookup['model_version']})")
+                st.markdown('</div>', unsafe_allow_html=True)
+            
+            # Formulaire : modifier un widget ne déclenche aucune ré-exécution
+            with st.form("client_form", border=False):
+                # Section Profil
+                st.markdown('<div class="form-section">', unsafe_allow_html=True)
+                st.markdown("<h3>Profil Client</h3>", unsafe_allow_html=True)
+                
+                gender = st.selectbox("Genre", ["Homme", "Femme"], key="gender")
+                age = st.slider("Âge", 18, 100, 42, key="age")
+                geography = st.selectbox("Localisation", ["France", "Germany", "Spain"], key="geo")
+                tenure = st.slider("Ancienneté (années)", 0, 10, 5, key="tenure")
+                
+                st.markdown('</div>', unsafe_allow_html=True)
+                
+                # Section Financière
+                st.markdown('<div class="form-section">', unsafe_allow_html=True)
+                st.markdown("<h3>Données Financières</h3>", unsafe_allow_html=True)
+                
+                credit_score = st.slider("Credit Score", 350, 850, 650, 10, key="credit")
+                balance = st.number_input("Solde du compte (€)", 0.0, 300000.0, 80000.0, 5000.0, key="balance")
+                estimated_salary = st.number_input("Salaire estimé (€)", 0.0, 200000.0, 100000.0, 5000.0, key="salary")
+                
+                st.markdown('</div>', unsafe_allow_html=True)
+                
+                # Section Produits
+                st.markdown('<div class="form-section">', unsafe_allow_html=True)
+                st.markdown("<h3>Produits & Services</h3>", unsafe_allow_html=True)
+                
+                num_products = st.selectbox("Nombre de produits", [1, 2, 3, 4], index=1, key="products")
+                has_credit_card = st.radio("Carte de crédit", ["Oui", "Non"], horizontal=True, key="card")
+                is_active_member = st.radio("Membre actif", ["Oui", "Non"], horizontal=True, key="active")
+                
+                st.markdown('</div>', unsafe_allow_html=True)
+                
+                # Bouton Analyse
+                st.markdown("<br>", unsafe_allow_html=True)
+                predict_button = st.form_submit_button("ANALYSER LE RISQUE", type="primary", use_container_width=True)
+            
+            st.markdown('</div>', unsafe_allow_html=True)
         
-        with col4:
-            st.markdown(f"""
-            <div class="metric-card">
-                <div class="value">{perf_opt['f1_score']:.3f}</div>
-                <div class="label">F1-Score</div>
-            </div>
-            """, unsafe_allow_html=True)
+        # Le modèle n'est appelé qu'à la soumission du formulaire
+        if predict_button:
+            with timed("prediction"):
+                st.session_state["analysis"] = analyse_client({
+                    'gender': gender,
+                    'age': age,
+                    'geography': geography,
+                    'tenure': tenure,
+                    'credit_score': credit_score,
+                    'balance': balance,
+                    'estimated_salary': estimated_salary,
+                    'num_products': num_products,
+                    'has_credit_card': has_credit_card,
+                    'is_active_member': is_active_member,
+                })
         
-        st.markdown('</div>', unsafe_allow_html=True)
+        # ==================== COLONNE DROITE : RÉSULTATS ====================
+        with col_results:
+            analysis = st.session_state.get("analysis")
+            if analysis is not None:
+                render_results(analysis)
+            else:
+                render_welcome()
+    
+    with col_results.expander("Instrumentation serveur"):
+        st.dataframe(REGISTRY.summary().round(2), hide_index=True, use_container_width=True)
+        drift = REGISTRY.gauges('drift/psi/')
+        if not drift.empty:
+            st.caption("Dérive des clients analysés vs entraînement (PSI par feature)")
+            st.dataframe(drift.sort_values('Valeur', ascending=False).round(4),
+                         hide_index=True, use_container_width=True)
+        audit = REGISTRY.gauges('audit/')
+        if not audit.empty:
+            st.caption("Journal d'audit (échecs d'écriture, dead letter, lignes abandonnées, en attente)")
+            st.dataframe(audit, hide_index=True, use_container_width=True)
+
+
+analysis_panel()
 
 # ==================== FOOTER ====================
 st.markdown(f"""
@@ -1131,4 +1273,7 @@ st.markdown(f"""
     <strong>Projet Académique</strong> • Master ISADS • Université Paris-Saclay<br>
     Ibrahim DABRE • Aaron THEVA • Momar FALL<br>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+REGISTRY.record("script_complet", (time.perf_counter() - _script_wall) * 1000,
+                (time.thread_time() - _script_cpu) * 1000)
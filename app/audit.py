@@ -0,0 +1,354 @@
+"""
+Journal d'audit des prédictions - entrées brutes, features calculées,
+probabilité (brute et calibrée), seuil, niveau de risque et version du modèle.
+
+Le chemin de requête ne fait qu'ajouter un enregistrement à un tampon
+circulaire en mémoire ; un thread de fond le vide par lots dans une table
+SQLite en mode WAL (append-only). Si le tampon est plein, l'enregistrement
+le plus ancien est évincé et compté dans `dropped` plutôt que de bloquer la
+prédiction.
+
+Un échec d'écriture ne tue pas le thread : le lot est réécrit enregistrement
+par enregistrement. Ceux qui échouent seuls (ligne invalide) partent dans la
+table `rejected_predictions` (dead letter, contenu en JSON) ; si tout le lot
+échoue (base verrouillée, disque plein...), il reste en tête du tampon et est
+retenté au passage suivant, puis envoyé en dead letter après `max_retries`
+échecs. Seul un échec de la dead letter elle-même abandonne des
+enregistrements. Les compteurs sont publiés dans le registre
+d'instrumentation (jauges `audit/`).
+
+Benchmark : python app/audit.py --benchmark --threads 4 --rows 50000
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from feature_store import SQL_COLUMNS, SQL_TYPES
+from features import FEATURES, RAW_COLUMNS, engineer_features
+from instrumentation import REGISTRY
+from scoring import RISK_LEVELS, ROOT_DIR, classify_risk_array
+
+AUDIT_PATH = os.path.join(ROOT_DIR, 'data', 'processed', 'audit.sqlite')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS predictions (
+    logged_at TEXT NOT NULL,
+    customer_id INTEGER,
+    model_version TEXT,
+    {', '.join(f'{name} {SQL_TYPES.get(column, "INTEGER")}' for column, name in SQL_COLUMNS.items())},
+    features BLOB NOT NULL,
+    probability REAL NOT NULL,
+    threshold REAL NOT NULL,
+    prediction INTEGER NOT NULL,
+    risk_level TEXT NOT NULL,
+    calibrated_probability REAL
+)
+"""
+# Enregistrements impossibles à écrire dans predictions (conservés pour la conformité)
+DEAD_LETTER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rejected_predictions (
+    logged_at TEXT NOT NULL,
+    customer_id INTEGER,
+    model_version TEXT,
+    record TEXT NOT NULL,
+    error TEXT NOT NULL
+)
+"""
+N_COLUMNS = len(RAW_COLUMNS) + 9
+RAW_INDEX = pd.Index(RAW_COLUMNS)
+
+logger = logging.getLogger(__name__)
+
+
+class AuditLogger:
+    """Tampon circulaire en mémoire + écriture SQLite par lots en tâche de fond"""
+
+    def __init__(self, path=AUDIT_PATH, capacity=100_000, batch_size=1000, flush_interval=1.0,
+                 monitor=None, max_retries=3, registry=REGISTRY):
+        self.path = path
+        self.monitor = monitor
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.registry = registry
+        self.dropped = 0
+        self.written = 0
+        self.dead_lettered = 0
+        self.write_failures = 0
+        self.last_error = None
+        self._attempts = 0
+
+        # Verrou court (vérification de capacité, ajout, éviction, compteur dropped) partagé avec le writer
+        self._lock = threading.Lock()
+        self._buffer = deque()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(SCHEMA)
+        self._conn.execute(DEAD_LETTER_SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(predictions)")]
+        if 'calibrated_probability' not in columns:
+            self._conn.execute("ALTER TABLE predictions ADD COLUMN calibrated_probability REAL")
+
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- Chemin de requête ----------
+    def log(self, raw, probabilities, version, threshold, customer_id=None, calibrated=None):
+        """Enregistre les prédictions d'un DataFrame brut ; retourne False si un enregistrement a été évincé"""
+        logged_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        calibrated = probabilities if calibrated is None else np.asarray(calibrated, dtype=np.float64)
+        item = (logged_at, customer_id, version, float(threshold), raw, probabilities, calibrated)
+        with self._lock:
+            evicted = 0
+            while len(self._buffer) >= self.capacity:
+                evicted += len(self._buffer.popleft()[4])
+            self.dropped += evicted
+            self._buffer.append(item)
+            n_pending = len(self._buffer)
+        if n_pending >= self.batch_size:
+            self._wakeup.set()
+        return evicted == 0
+
+    def pending(self):
+        return len(self._buffer)
+
+    def close(self):
+        """Vide le tampon et ferme la base (appelé à l'arrêt du processus)"""
+        if self._thread.is_alive():
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._conn.close()
+
+    # ---------- Écriture en tâche de fond ----------
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._drain()
+        # Arrêt : chaque passage écrit le lot de tête ou le rapproche de l'abandon
+        while self._buffer:
+            self._drain()
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                items = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            if not items:
+                break
+            try:
+                self._write(items)
+                self._attempts = 0
+            except Exception as e:
+                if not self._failed(items, e):
+                    break
+        self._publish()
+
+    def _failed(self, items, error):
+        """Échec du lot : réécriture ligne à ligne ; False si tout a échoué et que le lot est remis en tête"""
+        self.write_failures += 1
+        self._record_error(error)
+        failed = []
+        for item in items:
+            try:
+                self._write([item])
+            except Exception as e:
+                failed.append((item, e))
+        if len(failed) < len(items):
+            # Le reste du lot est passé : les échecs viennent des enregistrements eux-mêmes
+            self._attempts = 0
+            self._dead_letter(failed)
+            return True
+
+        self._attempts += 1
+        logger.warning("Écriture du journal d'audit impossible (tentative %d) : %s", self._attempts, self.last_error)
+        if self._attempts > self.max_retries:
+            self._attempts = 0
+            self._dead_letter(failed)
+            return True
+        with self._lock:
+            self._buffer.extendleft(reversed(items))
+        return False
+
+    def _dead_letter(self, failed):
+        """Enregistrements en échec conservés en JSON dans rejected_predictions (abandonnés si impossible)"""
+        if not failed:
+            return
+        rows = [(item[0], item[1], item[2], _record_json(item), f"{type(error).__name__} : {error}")
+                for item, error in failed]
+        try:
+            with self._conn:
+                self._conn.executemany("INSERT INTO rejected_predictions VALUES (?, ?, ?, ?, ?)", rows)
+        except Exception as e:
+            self._record_error(e)
+            logger.error("Dead letter du journal d'audit impossible, %d enregistrement(s) perdu(s) : %s",
+                         len(failed), self.last_error)
+            with self._lock:
+                self.dropped += sum(len(item[4]) for item, _ in failed)
+            return
+        self.dead_lettered += sum(len(item[4]) for item, _ in failed)
+        logger.warning("%d enregistrement(s) d'audit en dead letter : %s", len(failed), rows[-1][-1])
+
+    def _record_error(self, error):
+        self.last_error = f"{type(error).__name__} : {error}"
+
+    def _publish(self):
+        if self.registry is None:
+            return
+        self.registry.set_gauge('audit/echecs_ecriture', float(self.write_failures), self.last_error or '')
+        self.registry.set_gauge('audit/dead_letter', float(self.dead_lettered))
+        self.registry.set_gauge('audit/abandonnees', float(self.dropped))
+        self.registry.set_gauge('audit/en_attente', float(len(self._buffer)))
+
+    def _write(self, items):
+        """Features calculées pour tout le lot en une passe, puis un seul executemany"""
+        sizes = [len(item[4]) for item in items]
+        # Empilement NumPy : pd.concat sur des milliers de DataFrames d'une ligne est bien plus lent
+        values = np.vstack([_raw_values(item[4]) for item in items])
+        raw = pd.DataFrame(values, columns=RAW_COLUMNS).infer_objects()
+        features = engineer_features(raw).to_numpy(dtype=np.float64)
+        probability = np.concatenate([item[5] for item in items])
+        threshold = np.repeat([item[3] for item in items], sizes)
+        prediction = (probability >= threshold).astype(np.int64)
+        calibrated = np.concatenate([item[6] for item in items])
+        risk = np.asarray(RISK_LEVELS)[classify_risk_array(calibrated)]
+
+        meta = [(item[0], item[1], item[2]) for item, size in zip(items, sizes) for _ in range(size)]
+        values = values.tolist()
+        blobs = features.astype(np.float32)
+        rows = (
+            (*meta[i], *values[i], blobs[i].tobytes(),
+             float(probability[i]), float(threshold[i]), int(prediction[i]), str(risk[i]),
+             float(calibrated[i]))
+            for i in range(len(raw))
+        )
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO predictions VALUES ({', '.join(['?'] * N_COLUMNS)})", rows)
+        self.written += len(raw)
+
+        # Dérive : les features du lot sont déjà calculées, hors chemin de requête. Le lot est déjà
+        # écrit : une erreur ici est journalisée sans le retenter
+        if self.monitor is not None:
+            try:
+                self.monitor.update(features, probability, [row[2] for row in meta])
+                self.monitor.publish()
+            except Exception:
+                logger.exception("Mise à jour du suivi de dérive impossible")
+
+
+def _record_json(item):
+    """Contenu d'un enregistrement en JSON (repr en dernier recours : la dead letter ne doit pas échouer)"""
+    logged_at, customer_id, version, threshold, raw, probabilities, calibrated = item
+    try:
+        rows = json.loads(raw.to_json(orient='records'))
+    except Exception:
+        rows = repr(raw)
+    return json.dumps({'threshold': threshold, 'raw': rows, 'probability': probabilities.tolist(),
+                       'calibrated': calibrated.tolist()}, default=str)
+
+
+def _raw_values(raw):
+    # Réordonne les colonnes seulement si nécessaire (la sélection par liste est coûteuse)
+    if not raw.columns.equals(RAW_INDEX):
+        raw = raw[RAW_COLUMNS]
+    return raw.to_numpy(dtype=object)
+
+
+def read_audit(path=AUDIT_PATH, limit=None):
+    """Relit le journal : (entrées et prédictions, features calculées décodées)"""
+    conn = sqlite3.connect(path)
+    query = "SELECT * FROM predictions ORDER BY rowid" + (f" LIMIT {int(limit)}" if limit else "")
+    log = pd.read_sql_query(query, conn)
+    conn.close()
+    features = np.frombuffer(b''.join(log.pop('features')), dtype=np.float32).reshape(-1, len(FEATURES))
+    return log, pd.DataFrame(features, columns=FEATURES)
+
+
+# ==================== BENCHMARK ====================
+def benchmark(n_threads=4, n_rows=50_000, batch_size=1000):
+    """Latence d'ajout côté requête (p50/p99) et débit d'écriture soutenu"""
+    from feature_store import RAW_PATH
+
+    sample = pd.read_csv(RAW_PATH, usecols=RAW_COLUMNS, nrows=1000)
+    rows = [sample.iloc[[i]].reset_index(drop=True) for i in range(len(sample))]
+    probabilities = np.random.default_rng(0).random(len(rows))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audit = AuditLogger(os.path.join(tmp, 'audit.sqlite'), capacity=n_rows, batch_size=batch_size)
+        per_thread = n_rows // n_threads
+        latencies = [np.empty(per_thread) for _ in range(n_threads)]
+
+        def produce(k):
+            for i in range(per_thread):
+                j = (k * per_thread + i) % len(rows)
+                t0 = time.perf_counter()
+                audit.log(rows[j], probabilities[j:j + 1], 'bench', 0.4758, customer_id=j)
+                latencies[k][i] = (time.perf_counter() - t0) * 1e6
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=produce, args=(k,)) for k in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        produced = time.perf_counter() - start
+        audit.close()
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(audit.path) + sum(
+            os.path.getsize(audit.path + suffix) for suffix in ('-wal',) if os.path.exists(audit.path + suffix))
+
+    latencies = np.concatenate(latencies)
+    return {
+        'n_logged': int(latencies.size),
+        'n_written': audit.written,
+        'n_dropped': audit.dropped,
+        'append_p50_us': float(np.percentile(latencies, 50)),
+        'append_p99_us': float(np.percentile(latencies, 99)),
+        'produce_s': produced,
+        'elapsed_s': elapsed,
+        'rows_per_s': audit.written / elapsed,
+        'bytes_per_row': size / max(audit.written, 1),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Journal d'audit des prédictions")
+    parser.add_argument('--benchmark', action='store_true', help="Mesure latence d'ajout et débit d'écriture")
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--tail', type=int, default=10, help="Affiche les dernières entrées du journal")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        report = benchmark(args.threads, args.rows, args.batch_size)
+        print(f"Prédictions journalisées : {report['n_logged']:,} ({args.threads} threads)")
+        print(f"Lignes écrites           : {report['n_written']:,} (abandonnées : {report['n_dropped']:,})")
+        print(f"Latence d'ajout          : p50 {report['append_p50_us']:.1f} µs, p99 {report['append_p99_us']:.1f} µs")
+        print(f"Débit soutenu            : {report['rows_per_s']:,.0f} lignes/s "
+              f"({report['elapsed_s']:.2f}s dont production {report['produce_s']:.2f}s)")
+        print(f"Taille sur disque        : {report['bytes_per_row']:.0f} octets/ligne")
+    else:
+        log, _ = read_audit()
+        print(log.tail(args.tail).to_string())
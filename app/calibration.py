@@ -0,0 +1,136 @@
+"""
+Calibration des probabilités - le modèle est entraîné sur des données
+rééquilibrées par SMOTE (50 % de churn au lieu de ~20 %) : ses sorties ne
+sont pas des probabilités calibrées.
+
+La calibration est ajustée sur des prédictions hors échantillon (validation
+croisée de cv.py sur le split d'entraînement, mêmes hyperparamètres que le
+modèle servi) : correction de prior SMOTE puis
+régression isotone (ou Platt). Elle est stockée dans les métadonnées du
+modèle sous forme de deux tableaux (x = score brut, y = probabilité
+calibrée) appliqués par np.interp (voir scoring.calibrate).
+
+Les décisions restent prises sur le score brut et `optimal_threshold` ;
+seuls les niveaux de risque et les probabilités affichées sont calibrés.
+
+Usage : python app/calibration.py [--method isotonic|platt] [--no-save]
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from pipeline import MODELS_DIR, split_features
+from registry import load_current
+from scoring import RISK_BANDS, calibrate, logit, predict_scaled
+
+SMOTE_PRIOR = 0.5
+N_GRID = 257
+
+
+def prior_shift(p, prior, train_prior=SMOTE_PRIOR):
+    """Correction de prior : probabilité sous la prévalence réelle `prior`"""
+    r1, r0 = prior / train_prior, (1 - prior) / (1 - train_prior)
+    return p * r1 / (p * r1 + (1 - p) * r0)
+
+
+def fit_calibration(model, method='isotonic', n_splits=5):
+    """Tableaux d'interpolation (score brut -> probabilité calibrée)"""
+    from cv import cross_validate
+
+    # Scores hors pli d'un clone du modèle, sur les plis en cache de cv.py
+    _, scores, y = cross_validate(model, n_splits)
+    return calibration_from_scores(scores, y, method)
+
+
+def calibration_from_scores(scores, y, method='isotonic'):
+    """Tableaux d'interpolation ajustés sur des scores bruts hors échantillon et leurs labels"""
+    prior = float(np.mean(y))
+    shifted = prior_shift(scores, prior)
+
+    if method == 'isotonic':
+        from sklearn.isotonic import IsotonicRegression
+
+        iso = IsotonicRegression(y_min=0, y_max=1, out_of_bounds='clip').fit(shifted, y)
+        # Paliers exprimés dans l'espace du score brut (la correction de prior est monotone)
+        x = prior_shift(iso.X_thresholds_, SMOTE_PRIOR, prior)
+        y_calibrated = iso.y_thresholds_
+    elif method == 'platt':
+        from sklearn.linear_model import LogisticRegression
+
+        platt = LogisticRegression(C=1e6).fit(logit(shifted)[:, None], y)
+        x = np.linspace(0, 1, N_GRID)
+        y_calibrated = platt.predict_proba(logit(prior_shift(x, prior))[:, None])[:, 1]
+    else:
+        raise ValueError(f"Méthode de calibration inconnue : {method}")
+
+    return {
+        'method': method,
+        'x': np.asarray(x, dtype=np.float64),
+        'y': np.asarray(y_calibrated, dtype=np.float64),
+        'prior': prior,
+        'train_prior': SMOTE_PRIOR,
+    }
+
+
+# ==================== ÉVALUATION ====================
+def expected_calibration_error(p, y, n_bins=10):
+    """Écart moyen |probabilité prédite - fréquence observée| pondéré par bin"""
+    bins = np.minimum((p * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    observed = np.bincount(bins, weights=y, minlength=n_bins)
+    predicted = np.bincount(bins, weights=p, minlength=n_bins)
+    filled = counts > 0
+    return float(np.abs(predicted[filled] - observed[filled]).sum() / len(p))
+
+
+def calibration_report(p, y):
+    return {
+        'brier': float(np.mean((p - y) ** 2)),
+        'ece': expected_calibration_error(p, y),
+        'mean_probability': float(p.mean()),
+        'risk_bands': np.bincount(np.searchsorted(RISK_BANDS, p, side='right'), minlength=3).tolist(),
+    }
+
+
+def save_calibration(calibration, models_dir=MODELS_DIR):
+    """Ajoute la calibration aux métadonnées du modèle (à publier ensuite dans le registre)"""
+    path = os.path.join(models_dir, 'model_metadata.pkl')
+    metadata = joblib.load(path)
+    metadata['calibration'] = calibration
+    joblib.dump(metadata, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Calibration des probabilités du modèle")
+    parser.add_argument('--method', choices=['isotonic', 'platt'], default='isotonic')
+    parser.add_argument('--no-save', action='store_true', help="N'écrit pas models/model_metadata.pkl")
+    args = parser.parse_args()
+
+    bundle = load_current()
+    _, X_test, _, y_test = split_features()
+    calibration = fit_calibration(bundle.estimator(), args.method)
+
+    y_test = y_test.astype(float)
+    raw = predict_scaled(bundle.scaler.transform(X_test), bundle.model)
+    metadata = {'calibration': calibration}
+    print(f"Calibration {args.method} : {calibration['x'].size} points, prior {calibration['prior']:.4f}")
+    print(f"Test (churn réel {y_test.mean():.3f}) :")
+    for name, p in (('brut', raw), ('calibré', calibrate(raw, metadata))):
+        report = calibration_report(p, y_test)
+        print(f"  {name:8} Brier {report['brier']:.4f}  ECE {report['ece']:.4f}  "
+              f"moyenne {report['mean_probability']:.3f}  Faible/Modéré/Élevé {report['risk_bands']}")
+
+    for n in (1, 1_000_000):
+        p = np.random.default_rng(0).random(n)
+        calibrate(p[:1], metadata)
+        start = time.perf_counter()
+        calibrate(p, metadata)
+        print(f"Coût de calibrate() sur {n:,} ligne(s) : {(time.perf_counter() - start) * 1e6:,.1f} µs")
+
+    if not args.no_save:
+        save_calibration(calibration)
+        print("Calibration enregistrée dans models/model_metadata.pkl (publier une nouvelle version du registre)")
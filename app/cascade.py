@@ -0,0 +1,141 @@
+"""
+Cascade de scoring - un petit modèle distillé (quelques arbres peu profonds,
+entraînés sur la log-odds du modèle complet) score toutes les lignes ; seules
+celles dont la probabilité tombe à moins de `margin` du seuil optimal sont
+renvoyées vers lightgbm_churn_final.pkl.
+
+Usage :
+    python app/cascade.py train [--trees 30 --depth 4]
+    python app/cascade.py report [--margins 0.05 0.1 0.15 0.2]
+"""
+
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from pipeline import MODELS_DIR, RANDOM_STATE, RAW_PATH, split_features
+from registry import load_current
+from scoring import logit, predict_scaled, transform
+
+STUDENT_PATH = os.path.join(MODELS_DIR, 'cascade_student.pkl')
+DEFAULT_MARGIN = 0.15
+
+
+# ==================== DISTILLATION ====================
+def distill(bundle, X_scaled, n_estimators=30, max_depth=4):
+    """Régression LightGBM peu profonde sur la log-odds du modèle complet"""
+    from lightgbm import LGBMRegressor
+
+    student = LGBMRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, num_leaves=2 ** max_depth,
+        learning_rate=0.3, random_state=RANDOM_STATE, n_jobs=1, verbose=-1,
+    )
+    student.fit(X_scaled, logit(predict_scaled(X_scaled, bundle.model)))
+    return student
+
+
+def train_student(bundle=None, n_estimators=30, max_depth=4, path=STUDENT_PATH):
+    """Distille le modèle servi sur le split d'entraînement"""
+    bundle = bundle or load_current()
+    X_train, _, _, _ = split_features()
+    # Lignes réelles uniquement (les points SMOTE déplacent l'élève loin des vrais clients),
+    # normalisées par le scaler du modèle servi
+    student = distill(bundle, bundle.scaler.transform(X_train), n_estimators, max_depth)
+    if path:
+        joblib.dump({'student': student, 'teacher_version': bundle.version}, path)
+    return student
+
+
+# ==================== CASCADE ====================
+class Cascade:
+    """Modèle distillé d'abord, modèle complet pour les lignes proches du seuil"""
+
+    def __init__(self, student, bundle, margin=DEFAULT_MARGIN):
+        self.student = student.booster_ if hasattr(student, 'booster_') else student
+        self.bundle = bundle
+        self.threshold = float(bundle.metadata['optimal_threshold'])
+        self.margin = margin
+
+    def predict_scaled(self, X_scaled):
+        """(probabilités, masque des lignes renvoyées au modèle complet)"""
+        X_scaled = np.atleast_2d(X_scaled)
+        probability = 1.0 / (1.0 + np.exp(-self.student.predict(X_scaled)))
+        deferred = np.abs(probability - self.threshold) < self.margin
+        if deferred.any():
+            probability[deferred] = predict_scaled(X_scaled[deferred], self.bundle.model)
+        return probability, deferred
+
+    def predict_proba(self, raw):
+        return self.predict_scaled(transform(raw, self.bundle.scaler))[0]
+
+
+def load_cascade(bundle=None, margin=DEFAULT_MARGIN, path=STUDENT_PATH):
+    """Cascade pour le modèle servi ; refuse un élève distillé d'une autre version"""
+    bundle = bundle or load_current()
+    saved = joblib.load(path)
+    if saved['teacher_version'] != bundle.version:
+        raise ValueError(f"Modèle distillé depuis {saved['teacher_version']}, "
+                         f"modèle servi {bundle.version} : relancer 'cascade.py train'")
+    return Cascade(saved['student'], bundle, margin)
+
+
+# ==================== RAPPORT ====================
+def _throughput(predict, raw, repeats):
+    predict(raw)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        predict(raw)
+    return repeats * len(raw) / (time.perf_counter() - start)
+
+
+def evaluate(cascade, raw, X_test=None, repeats=5):
+    """Part renvoyée, accord des décisions et débit bout en bout (brut -> probabilités)"""
+    model, _, scaler = cascade.bundle
+    holdout = float('nan')
+    if X_test is not None:
+        # Accord sur le split de test, jamais vu par l'élève
+        test_probability, _ = cascade.predict_scaled(X_test)
+        test_reference = predict_scaled(X_test, model)
+        holdout = float(((test_probability >= cascade.threshold) == (test_reference >= cascade.threshold)).mean())
+    reference = predict_scaled(transform(raw, scaler), model)
+    probability, deferred = cascade.predict_scaled(transform(raw, scaler))
+
+    full_rate = _throughput(lambda frame: predict_scaled(transform(frame, scaler), model), raw, repeats)
+    cascade_rate = _throughput(cascade.predict_proba, raw, repeats)
+    return {
+        'margin': cascade.margin,
+        'deferred': float(deferred.mean()),
+        'agreement': float(((probability >= cascade.threshold) == (reference >= cascade.threshold)).mean()),
+        'agreement_test': holdout,
+        'full_rows_per_s': full_rate,
+        'cascade_rows_per_s': cascade_rate,
+        'speedup': cascade_rate / full_rate,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cascade modèle distillé -> LightGBM complet")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmd = sub.add_parser('train', help="Distille le modèle servi")
+    cmd.add_argument('--trees', type=int, default=30)
+    cmd.add_argument('--depth', type=int, default=4)
+    cmd = sub.add_parser('report', help="Part renvoyée, accord et débit par marge")
+    cmd.add_argument('--margins', type=float, nargs='+', default=[0.05, 0.1, DEFAULT_MARGIN, 0.2])
+    cmd.add_argument('--raw', default=RAW_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        bundle = load_current()
+        train_student(bundle, args.trees, args.depth)
+        print(f"Modèle distillé ({args.trees} arbres, profondeur {args.depth}) -> {STUDENT_PATH}")
+    else:
+        bundle = load_current()
+        raw = pd.read_csv(args.raw)
+        X_test = bundle.scaler.transform(split_features()[1])
+        rows = [evaluate(load_cascade(bundle, margin), raw, X_test) for margin in args.margins]
+        print(f"Seuil optimal : {bundle.metadata['optimal_threshold']:.4f} - {len(raw):,} clients")
+        print(pd.DataFrame(rows).to_string(index=False, float_format=lambda x: f"{x:,.4f}"))
@@ -0,0 +1,287 @@
+"""
+Modèle compact pour le service - l'ensemble LightGBM aplati en tableaux NumPy :
+seuils et valeurs des feuilles en float32, indices de features en int8,
+enfants en int16. La normalisation est intégrée aux seuils (seuil brut =
+seuil x scale + mean) : ni LightGBM, ni sklearn, ni scaler au chargement.
+
+Option --quantize : chaque seuil devient l'indice de sa borne parmi les
+seuils distincts de sa feature ; les features sont discrétisées une fois
+par lot puis comparées en entiers.
+
+Usage :
+    python app/compact.py export [--quantize]
+    python app/compact.py report
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+COMPACT_PATH = os.path.join(os.path.dirname(APP_DIR), 'models', 'lightgbm_churn_compact.npz')
+
+
+class CompactModel:
+    """Forêt aplatie : tous les arbres dans un seul tableau de nœuds"""
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.edges = arrays.get('edges')
+        self.edge_offsets = arrays.get('edge_offsets')
+        self.meta = meta
+        self.depth = int(meta['depth'])
+        self.features = meta['features']
+        self.quantized = self.edges is not None
+
+    @property
+    def nbytes(self):
+        arrays = [self.feature, self.threshold, self.left, self.right, self.value, self.roots]
+        if self.quantized:
+            arrays += [self.edges, self.edge_offsets]
+        return sum(array.nbytes for array in arrays)
+
+    def _bins(self, X):
+        """Indice de bin par feature : x <= edges[k] <=> bin <= k"""
+        bins = np.empty(X.shape, dtype=self.threshold.dtype)
+        for j in range(X.shape[1]):
+            edges = self.edges[self.edge_offsets[j]:self.edge_offsets[j + 1]]
+            bins[:, j] = np.searchsorted(edges, X[:, j], side='left')
+        return bins
+
+    def leaf_values(self, X, roots=None):
+        """Valeur de feuille atteinte dans chaque arbre (n_lignes, n_arbres), ou dans les arbres `roots`"""
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        if self.quantized:
+            X = self._bins(X)
+        roots = self.roots if roots is None else roots
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(roots, (X.shape[0], roots.size))
+        # Parcours niveau par niveau de tous les arbres à la fois ; une feuille boucle sur elle-même
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def raw_score(self, X):
+        """Marge (log-odds) pour des features non normalisées, dans l'ordre self.features"""
+        return self.leaf_values(X).sum(axis=1, dtype=np.float64)
+
+    def predict_features(self, X):
+        return 1.0 / (1.0 + np.exp(-self.raw_score(X)))
+
+    def predict_proba(self, raw):
+        """Probabilités de churn pour un DataFrame de colonnes brutes"""
+        from features import engineer_features
+
+        return self.predict_features(engineer_features(raw).to_numpy(dtype=np.float32))
+
+
+def load_compact(path=COMPACT_PATH):
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files if key != 'meta'}
+        meta = json.loads(str(data['meta']))
+    return CompactModel(arrays, meta)
+
+
+# ==================== EXPORT ====================
+def flatten_trees(booster_dump, scaler):
+    """Nœuds de tous les arbres, seuils ramenés dans l'espace brut des features"""
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+    depth = 0
+
+    def add(node, level):
+        nonlocal depth
+        index = len(feature)
+        feature.append(0)
+        threshold.append(np.inf)
+        left.append(index)
+        right.append(index)
+        value.append(0.0)
+        if 'leaf_value' in node:
+            value[index] = node['leaf_value']
+            depth = max(depth, level)
+            return index
+        if node['decision_type'] != '<=' or node.get('missing_type', 'None') != 'None':
+            raise ValueError(f"Split non supporté : {node['decision_type']} / {node.get('missing_type')}")
+        j = node['split_feature']
+        feature[index] = j
+        threshold[index] = node['threshold'] * scaler.scale_[j] + scaler.mean_[j]
+        left[index] = add(node['left_child'], level + 1)
+        right[index] = add(node['right_child'], level + 1)
+        return index
+
+    for tree in booster_dump['tree_info']:
+        roots.append(add(tree['tree_structure'], 0))
+
+    index_type = np.int16 if len(feature) < np.iinfo(np.int16).max else np.int32
+    arrays = {
+        'feature': np.array(feature, dtype=np.int8),
+        'threshold': np.array(threshold, dtype=np.float32),
+        'left': np.array(left, dtype=index_type),
+        'right': np.array(right, dtype=index_type),
+        'value': np.array(value, dtype=np.float32),
+        'roots': np.array(roots, dtype=index_type),
+    }
+    return arrays, depth
+
+
+def _quantize(arrays, n_features):
+    """Seuils -> indices dans la table des seuils distincts de chaque feature"""
+    internal = np.isfinite(arrays['threshold'])
+    edges, offsets = [], [0]
+    for j in range(n_features):
+        values = np.unique(arrays['threshold'][internal & (arrays['feature'] == j)])
+        edges.append(values)
+        offsets.append(offsets[-1] + values.size)
+
+    max_bins = max(values.size for values in edges)
+    bin_type = np.uint8 if max_bins < np.iinfo(np.uint8).max else np.uint16
+    thresholds = np.full(arrays['threshold'].size, np.iinfo(bin_type).max, dtype=bin_type)
+    for j in range(n_features):
+        nodes = internal & (arrays['feature'] == j)
+        thresholds[nodes] = np.searchsorted(edges[j], arrays['threshold'][nodes])
+
+    return {**arrays, 'threshold': thresholds,
+            'edges': np.concatenate(edges).astype(np.float32),
+            'edge_offsets': np.array(offsets, dtype=np.int32)}
+
+
+def export_compact(bundle=None, quantize=False, path=COMPACT_PATH):
+    """Convertit le modèle servi en CompactModel et l'enregistre en .npz"""
+    from registry import load_current
+
+    bundle = bundle or load_current()
+    model, metadata, scaler = bundle
+    dump = model.booster_.dump_model()
+    if dump['objective'].split()[0] != 'binary' or dump['average_output']:
+        raise ValueError(f"Objectif non supporté : {dump['objective']}")
+
+    arrays, depth = flatten_trees(dump, scaler)
+    if quantize:
+        arrays = _quantize(arrays, len(metadata['features']))
+
+    meta = {
+        'version': bundle.version,
+        'features': list(metadata['features']),
+        'optimal_threshold': float(metadata['optimal_threshold']),
+        'depth': depth,
+        'quantized': quantize,
+    }
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+    return CompactModel(arrays, meta)
+
+
+# ==================== RAPPORT ====================
+def parity_report(compact, bundle, raw):
+    """Écart de probabilité et décisions inversées au seuil optimal, vs le modèle complet"""
+    from features import engineer_features
+    from scoring import predict_scaled
+
+    model, metadata, scaler = bundle
+    X = engineer_features(raw).to_numpy(dtype=np.float64)
+    reference = predict_scaled((X - scaler.mean_) / scaler.scale_, model)
+    probability = compact.predict_features(X)
+
+    threshold = float(metadata['optimal_threshold'])
+    delta = np.abs(probability - reference)
+    flips = (probability >= threshold) != (reference >= threshold)
+    return {
+        'n_rows': len(X),
+        'max_abs_delta': float(delta.max()),
+        'mean_abs_delta': float(delta.mean()),
+        'decision_flips': int(flips.sum()),
+        # Inversions sur des clients dont la probabilité est à l'arrondi près égale au seuil
+        'flips_at_threshold': int((flips & (np.abs(reference - threshold) <= delta)).sum()),
+    }
+
+
+# Mesure dans un processus neuf : mémoire résidente d'un worker prêt à servir
+_RSS_SCRIPT = """
+import sys
+sys.path.insert(0, {app_dir!r})
+from features import engineer_features
+from scoring import client_frame
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS'):
+                return int(line.split()[1]) / 1024
+
+frame = client_frame(**{{'CreditScore': 650, 'Geography': 'France', 'Gender': 'Female', 'Age': 42,
+                        'Tenure': 5, 'Balance': 50000.0, 'Num Of Products': 1, 'Has Credit Card': 1,
+                        'Is Active Member': 0, 'Estimated Salary': 80000.0}})
+engineer_features(frame)
+base = rss_mb()
+if {compact!r}:
+    from compact import load_compact
+    model = load_compact({path!r})
+    model.predict_proba(frame)
+else:
+    from scoring import load_artifacts, predict_proba
+    model, metadata, scaler = load_artifacts()
+    predict_proba(frame, model, scaler)
+print(base, rss_mb())
+"""
+
+
+def worker_rss(compact, path=COMPACT_PATH):
+    """(RSS de base, RSS prêt à servir) en Mo d'un processus qui charge le modèle"""
+    script = _RSS_SCRIPT.format(app_dir=APP_DIR, compact=compact, path=path)
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    base, loaded = map(float, output.stdout.split()[-2:])
+    return base, loaded
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Modèle compact (float32 / quantifié) pour le service")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmd = sub.add_parser('export', help="Exporte le modèle servi au format compact")
+    cmd.add_argument('--quantize', action='store_true', help="Seuils stockés en indices de bins")
+    cmd.add_argument('--output', default=COMPACT_PATH)
+    sub.add_parser('report', help="Parité et mémoire : float32 et quantifié vs modèle complet")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    from pipeline import RAW_PATH
+    from registry import load_current
+
+    bundle = load_current()
+    raw = pd.read_csv(RAW_PATH)
+
+    if args.command == 'export':
+        compact = export_compact(bundle, args.quantize, args.output)
+        report = parity_report(compact, bundle, raw)
+        print(f"Modèle compact : {args.output} ({os.path.getsize(args.output) / 1024:.0f} Ko, "
+              f"{compact.nbytes / 1024:.0f} Ko en mémoire)")
+        print(f"Parité sur {report['n_rows']:,} clients : écart max {report['max_abs_delta']:.2e}, "
+              f"décisions inversées {report['decision_flips']} (dont {report['flips_at_threshold']} au seuil exact)")
+    else:
+        rows = []
+        for quantize in (False, True):
+            compact = export_compact(bundle, quantize, path=None)
+            rows.append({'variante': 'quantifié' if quantize else 'float32', 'octets': compact.nbytes,
+                         **parity_report(compact, bundle, raw)})
+        print(pd.DataFrame(rows).to_string(index=False))
+
+        # Variante quantifiée mesurée depuis un fichier temporaire : l'artefact servi reste intact
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            quantized_path = os.path.join(tmp_dir, 'compact_quantized.npz')
+            export_compact(bundle, quantize=True, path=quantized_path)
+            base, full = worker_rss(compact=False)
+            _, light = worker_rss(compact=True, path=quantized_path)
+        print(f"\nRSS worker (base pandas/numpy {base:.0f} Mo) : "
+              f"modèle complet {full:.0f} Mo (+{full - base:.0f}), compact {light:.0f} Mo (+{light - base:.0f})")
@@ -0,0 +1,145 @@
+"""
+Comparaison des modèles candidats - entraînement concurrent sous un budget CPU
+commun, métriques, courbes ROC, temps de fit/predict et taille des modèles.
+
+Usage : python app/compare_models.py --cpus 4
+        python app/compare_models.py --cv 5      # validation croisée (cv.py)
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from pipeline import (CACHE_PATH, PROCESSED_DIR, RANDOM_STATE, compute_metrics,
+                      prepare_datasets, roc_points)
+
+OUTPUT_PATH = os.path.join(PROCESSED_DIR, 'model_comparison.json')
+
+CANDIDATES = ['Logistic Regression', 'Random Forest', 'XGBoost', 'LightGBM']
+
+
+# ==================== MODÈLES ====================
+def build_model(name, n_jobs=1):
+    """Instancie un modèle candidat avec les hyperparamètres du notebook"""
+    if name == 'Logistic Regression':
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(random_state=RANDOM_STATE, max_iter=1000)
+    if name == 'Random Forest':
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(
+            n_estimators=100, max_depth=10, min_samples_split=10, min_samples_leaf=4,
+            random_state=RANDOM_STATE, n_jobs=n_jobs
+        )
+    if name == 'XGBoost':
+        from xgboost import XGBClassifier
+        return XGBClassifier(
+            n_estimators=100, max_depth=6, learning_rate=0.1, subsample=0.8,
+            colsample_bytree=0.8, random_state=RANDOM_STATE, eval_metric='logloss',
+            n_jobs=n_jobs
+        )
+    if name == 'LightGBM':
+        from lightgbm import LGBMClassifier
+        return LGBMClassifier(
+            n_estimators=100, max_depth=6, learning_rate=0.1, subsample=0.8,
+            colsample_bytree=0.8, random_state=RANDOM_STATE, verbose=-1, n_jobs=n_jobs
+        )
+    raise ValueError(f"Modèle inconnu : {name}")
+
+
+def evaluate_candidate(name, n_jobs, cache_path=CACHE_PATH):
+    """Entraîne et évalue un modèle (exécuté dans un processus worker)"""
+    data = prepare_datasets(cache_path=cache_path)
+    model = build_model(name, n_jobs=n_jobs)
+
+    start = time.perf_counter()
+    model.fit(data['X_train_balanced'], data['y_train_balanced'])
+    fit_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_proba = model.predict_proba(data['X_test'])[:, 1]
+    predict_time = time.perf_counter() - start
+
+    fpr, tpr = roc_points(data['y_test'], y_proba)
+    metrics = {key: float(value) for key, value in compute_metrics(data['y_test'], y_proba).items()}
+
+    return {
+        'model': name,
+        **metrics,
+        'fit_time_s': fit_time,
+        'predict_time_ms': predict_time * 1000,
+        'predict_us_per_row': predict_time * 1e6 / len(y_proba),
+        'model_size_kb': len(pickle.dumps(model)) / 1024,
+        'n_jobs': n_jobs,
+        'roc': {'fpr': fpr, 'tpr': tpr},
+    }
+
+
+# ==================== HARNESS ====================
+def compare_models(candidates=CANDIDATES, cpus=None, output_path=OUTPUT_PATH):
+    """Entraîne les candidats en parallèle et écrit le tableau comparatif"""
+    cpus = cpus or os.cpu_count() or 1
+
+    # Les tableaux sont préparés une seule fois puis relus depuis le cache par les workers
+    prepare_datasets()
+
+    n_workers = max(1, min(len(candidates), cpus))
+    threads_per_model = max(1, cpus // n_workers)
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(evaluate_candidate, name, threads_per_model) for name in candidates]
+        results = [future.result() for future in futures]
+
+    table = pd.DataFrame([{k: v for k, v in r.items() if k != 'roc'} for r in results])
+    table = table.sort_values('roc_auc', ascending=False).reset_index(drop=True)
+
+    if output_path:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, 'w') as f:
+            json.dump({
+                'cpu_budget': cpus,
+                'generated_at': pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'models': results,
+            }, f, indent=2)
+        table.to_csv(os.path.splitext(output_path)[0] + '.csv', index=False)
+
+    return table, results
+
+
+def compare_models_cv(candidates=CANDIDATES, n_splits=5, cpus=None):
+    """ROC-AUC et F1 moyens en validation croisée (plis en cache, un worker par pli)"""
+    from cv import cross_validate, tune_threshold
+
+    rows = []
+    for name in candidates:
+        scores, oof, y = cross_validate(build_model(name), n_splits, n_workers=cpus)
+        threshold, f1 = tune_threshold(y, oof)
+        rows.append({
+            'model': name,
+            'cv_roc_auc': scores['roc_auc'].mean(),
+            'cv_roc_auc_std': scores['roc_auc'].std(ddof=0),
+            'cv_f1_score': scores['f1_score'].mean(),
+            'f1_threshold': threshold,
+            'f1_at_threshold': f1,
+            'fit_time_s': scores['fit_time_s'].sum(),
+        })
+    return pd.DataFrame(rows).sort_values('cv_roc_auc', ascending=False, ignore_index=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Comparaison parallèle des modèles candidats")
+    parser.add_argument('--cpus', type=int, default=None, help="Budget CPU total (défaut : tous les coeurs)")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="Fichier JSON de sortie")
+    parser.add_argument('--cv', type=int, metavar='PLIS', help="Compare en validation croisée plutôt que sur le test")
+    args = parser.parse_args()
+
+    if args.cv:
+        print(compare_models_cv(n_splits=args.cv, cpus=args.cpus).round(4).to_string(index=False))
+    else:
+        table, _ = compare_models(cpus=args.cpus, output_path=args.output)
+        print(table.round(4).to_string(index=False))
+        print(f"\nRésultats sauvegardés : {args.output}")
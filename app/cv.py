@@ -0,0 +1,216 @@
+"""
+Validation croisée parallèle - les plis sont calculés une fois et mis en
+cache sur disque (un .npy par tableau et par pli : train normalisé puis
+rééquilibré par SMOTE, validation normalisée). Les workers les ouvrent en
+mmap_mode='r' : les pages sont partagées par le cache du système, sans copie
+ni sérialisation entre processus.
+
+Contrairement au notebook (CV sur les données déjà rééquilibrées), la
+normalisation et SMOTE sont ajustés dans chaque pli et la validation porte
+sur des clients réels uniquement.
+
+Réutilisé par compare_models.py (--cv), la recherche d'hyperparamètres
+(grid_search) et le réglage du seuil (tune_threshold).
+
+Usage :
+    python app/cv.py [--model LightGBM] [--folds 5] [--workers 2]
+    python app/cv.py --grid                 # recherche sur la grille du notebook
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from pipeline import PROCESSED_DIR, RANDOM_STATE, RAW_PATH, compute_metrics, split_features
+
+CV_DIR = os.path.join(PROCESSED_DIR, 'cv_folds')
+FOLD_ARRAYS = ['X_train', 'y_train', 'X_valid', 'y_valid']
+
+# Grille du notebook 02 (GridSearchCV LightGBM)
+PARAM_GRID = {
+    'n_estimators': [100, 200],
+    'max_depth': [4, 6, 8],
+    'learning_rate': [0.01, 0.1, 0.2],
+    'subsample': [0.7, 0.8, 0.9],
+    'colsample_bytree': [0.7, 0.8, 0.9],
+}
+
+
+# ==================== CACHE DES PLIS ====================
+def _fingerprint(X, y, n_splits):
+    digest = hashlib.sha256(np.ascontiguousarray(X).tobytes())
+    digest.update(np.ascontiguousarray(y).tobytes())
+    digest.update(f"{n_splits}/{RANDOM_STATE}".encode())
+    return digest.hexdigest()[:16]
+
+
+def prepare_folds(n_splits=5, raw_path=RAW_PATH, cache_dir=CV_DIR, refresh=False):
+    """Écrit les tableaux de chaque pli (une seule fois) et retourne le manifest"""
+    from imblearn.over_sampling import SMOTE
+    from sklearn.model_selection import StratifiedKFold
+    from sklearn.preprocessing import StandardScaler
+
+    X, _, y, _ = split_features(raw_path)
+    fingerprint = _fingerprint(X, y, n_splits)
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    if not refresh and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest['fingerprint'] == fingerprint:
+            return manifest
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(cache_dir)
+    folds = StratifiedKFold(n_splits, shuffle=True, random_state=RANDOM_STATE)
+    valid_index = np.empty(len(y), dtype=np.int8)
+
+    for k, (train_idx, valid_idx) in enumerate(folds.split(X, y)):
+        scaler = StandardScaler().fit(X[train_idx])
+        X_train, y_train = SMOTE(random_state=RANDOM_STATE).fit_resample(scaler.transform(X[train_idx]), y[train_idx])
+        arrays = {
+            'X_train': X_train, 'y_train': y_train.astype(np.int8),
+            'X_valid': scaler.transform(X[valid_idx]), 'y_valid': y[valid_idx],
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(cache_dir, f'fold{k}_{name}.npy'), np.ascontiguousarray(array))
+        valid_index[valid_idx] = k
+
+    # Pli de validation de chaque ligne du train (pour reconstituer les prédictions hors pli)
+    np.save(os.path.join(cache_dir, 'valid_fold.npy'), valid_index)
+    manifest = {'fingerprint': fingerprint, 'n_splits': n_splits, 'n_rows': len(y),
+                'random_state': RANDOM_STATE}
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_fold(k, cache_dir=CV_DIR):
+    """Tableaux du pli k, projetés en mémoire (lecture seule)"""
+    return {name: np.load(os.path.join(cache_dir, f'fold{k}_{name}.npy'), mmap_mode='r')
+            for name in FOLD_ARRAYS}
+
+
+# ==================== ENTRAÎNEMENT ====================
+def _fit_fold(estimator, params, k, cache_dir, columns=None):
+    """Entraîne un clone de l'estimateur sur le pli k (exécuté dans un worker)"""
+    from sklearn.base import clone
+
+    fold = load_fold(k, cache_dir)
+    X_train, X_valid = fold['X_train'], fold['X_valid']
+    if columns is not None:
+        # Sous-ensemble de features (les points SMOTE restent des interpolations valides)
+        X_train, X_valid = X_train[:, columns], X_valid[:, columns]
+    model = clone(estimator).set_params(**params)
+    start = time.perf_counter()
+    model.fit(X_train, fold['y_train'])
+    fit_time = time.perf_counter() - start
+    y_proba = model.predict_proba(X_valid)[:, 1]
+    return k, y_proba, fit_time
+
+
+def _run(tasks, n_workers, cache_dir, columns=None):
+    """Exécute les (estimateur, paramètres, pli) dans un pool de processus"""
+    if n_workers <= 1:
+        return [_fit_fold(*task, cache_dir, columns) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(_fit_fold, *task, cache_dir, columns) for task in tasks]
+        return [future.result() for future in futures]
+
+
+def _collect(results, cache_dir):
+    """Métriques par pli + probabilités hors pli dans l'ordre du train"""
+    valid_fold = np.load(os.path.join(cache_dir, 'valid_fold.npy'))
+    oof = np.empty(valid_fold.size)
+    rows = []
+    for k, y_proba, fit_time in sorted(results, key=lambda result: result[0]):
+        y_valid = np.load(os.path.join(cache_dir, f'fold{k}_y_valid.npy'))
+        oof[valid_fold == k] = y_proba
+        rows.append({'fold': k, **compute_metrics(y_valid, y_proba), 'fit_time_s': fit_time})
+    return pd.DataFrame(rows), oof
+
+
+def cross_validate(estimator, n_splits=5, n_workers=None, cache_dir=CV_DIR, params=None, columns=None):
+    """Validation croisée : (métriques par pli, probabilités hors pli, y du train) ; columns = indices de features"""
+    prepare_folds(n_splits, cache_dir=cache_dir)
+    n_workers = n_workers or min(n_splits, os.cpu_count() or 1)
+    tasks = [(estimator, params or {}, k) for k in range(n_splits)]
+    scores, oof = _collect(_run(tasks, n_workers, cache_dir, columns), cache_dir)
+    return scores, oof, train_labels(cache_dir)
+
+
+def train_labels(cache_dir=CV_DIR):
+    """Cible du train reconstituée depuis les plis (même ordre que les prédictions hors pli)"""
+    valid_fold = np.load(os.path.join(cache_dir, 'valid_fold.npy'))
+    y = np.empty(valid_fold.size, dtype=np.int8)
+    for k in range(int(valid_fold.max()) + 1):
+        y[valid_fold == k] = np.load(os.path.join(cache_dir, f'fold{k}_y_valid.npy'))
+    return y
+
+
+def grid_search(estimator, param_grid=PARAM_GRID, n_splits=5, n_workers=None, cache_dir=CV_DIR):
+    """ROC-AUC moyen par combinaison ; toutes les (combinaison, pli) partagent un seul pool"""
+    prepare_folds(n_splits, cache_dir=cache_dir)
+    n_workers = n_workers or os.cpu_count() or 1
+    combinations = [dict(zip(param_grid, values)) for values in itertools.product(*param_grid.values())]
+    tasks = [(estimator, params, k) for params in combinations for k in range(n_splits)]
+    results = _run(tasks, n_workers, cache_dir)
+
+    y = train_labels(cache_dir)
+    valid_fold = np.load(os.path.join(cache_dir, 'valid_fold.npy'))
+    rows = []
+    for i, params in enumerate(combinations):
+        fold_results = results[i * n_splits:(i + 1) * n_splits]
+        aucs = [compute_metrics(y[valid_fold == k], y_proba)['roc_auc'] for k, y_proba, _ in fold_results]
+        rows.append({**params, 'mean_roc_auc': np.mean(aucs), 'std_roc_auc': np.std(aucs),
+                     'fit_time_s': sum(result[2] for result in fold_results)})
+    return pd.DataFrame(rows).sort_values('mean_roc_auc', ascending=False, ignore_index=True)
+
+
+def tune_threshold(y_true, y_proba):
+    """Seuil maximisant le F1 (critère du notebook), calculé en une passe triée"""
+    y_true = np.asarray(y_true).astype(bool)
+    order = np.argsort(-y_proba, kind='mergesort')
+    thresholds = y_proba[order]
+    tp = np.cumsum(y_true[order])
+    fp = np.arange(1, tp.size + 1) - tp
+    f1 = 2 * tp / (tp + fp + y_true.sum())
+    # Un seuil n'est valide qu'à la dernière occurrence d'une valeur ex-aequo
+    last = np.r_[thresholds[1:] != thresholds[:-1], True]
+    best = np.argmax(np.where(last, f1, -1))
+    return float(thresholds[best]), float(f1[best])
+
+
+if __name__ == '__main__':
+    from compare_models import CANDIDATES, build_model
+
+    parser = argparse.ArgumentParser(description="Validation croisée parallèle sur plis en cache")
+    parser.add_argument('--model', choices=CANDIDATES, default='LightGBM')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--grid', action='store_true', help="Recherche sur la grille du notebook (LightGBM)")
+    parser.add_argument('--refresh', action='store_true', help="Recalcule les plis en cache")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    prepare_folds(args.folds, refresh=args.refresh)
+    print(f"Plis prêts en {time.perf_counter() - start:.2f}s -> {CV_DIR}")
+
+    start = time.perf_counter()
+    if args.grid:
+        table = grid_search(build_model('LightGBM'), n_splits=args.folds, n_workers=args.workers)
+        print(table.head(10).round(4).to_string(index=False))
+    else:
+        scores, oof, y = cross_validate(build_model(args.model), args.folds, args.workers)
+        threshold, f1 = tune_threshold(y, oof)
+        print(scores.round(4).to_string(index=False))
+        print(f"\nROC-AUC moyen : {scores['roc_auc'].mean():.4f} ± {scores['roc_auc'].std(ddof=0):.4f}")
+        print(f"Seuil F1 optimal hors pli : {threshold:.4f} (F1 {f1:.4f})")
+    print(f"Durée : {time.perf_counter() - start:.2f}s")
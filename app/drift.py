@@ -0,0 +1,233 @@
+"""
+Surveillance de la dérive des données - compare les clients scorés à la
+distribution d'entraînement, feature par feature (espace non normalisé)
+et sur le score du modèle.
+
+La référence (bornes de quantiles et proportions par intervalle) est calculée
+une fois sur le jeu d'entraînement. Le moniteur n'accumule que des comptages
+par intervalle : des millions de lignes peuvent être traitées par chunks sans
+les garder en mémoire. PSI et KS (sur les intervalles) sont publiés comme
+jauges dans l'instrumentation.
+
+La distribution du score n'a de sens que pour le modèle de la référence :
+les scores d'une autre version (challenger, nouvelle version publiée) ne sont
+pas comptés, seules les features le sont. Après une publication, reconstruire
+la référence (--build-reference) pour suivre à nouveau le score.
+
+Usage :
+    python app/drift.py --build-reference
+    python app/drift.py data/raw/bank_churn.csv [--chunksize 100000]
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURES, RAW_COLUMNS, engineer_features
+from instrumentation import REGISTRY
+from pipeline import PROCESSED_DIR, RAW_PATH, split_features
+from registry import load_current
+from scoring import predict_scaled
+
+REFERENCE_PATH = os.path.join(PROCESSED_DIR, 'drift_reference.npz')
+SCORE = 'Score_Modele'
+N_BINS = 10
+EPSILON = 1e-4
+
+# Seuils usuels du PSI
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+
+
+def psi_status(psi):
+    if np.isnan(psi):
+        return "Non mesuré"
+    if psi >= PSI_ALERT:
+        return "Dérive"
+    elif psi >= PSI_WARNING:
+        return "À surveiller"
+    return "Stable"
+
+
+# ==================== RÉFÉRENCE ====================
+def build_reference(X, scores, model_version, n_bins=N_BINS, path=REFERENCE_PATH):
+    """Bornes de quantiles et proportions de référence (X non normalisé, une colonne par feature)"""
+    values = np.column_stack([X, scores])
+    names = FEATURES + [SCORE]
+
+    # Bornes internes par colonne ; les ex-aequo (features binaires) réduisent le nombre d'intervalles
+    quantiles = np.quantile(values, np.linspace(0, 1, n_bins + 1)[1:-1], axis=0).T
+    edges = np.full((len(names), n_bins - 1), np.inf)
+    n_edges = np.zeros(len(names), dtype=np.int64)
+    for j, column_edges in enumerate(quantiles):
+        column_edges = np.unique(column_edges)
+        edges[j, :column_edges.size] = column_edges
+        n_edges[j] = column_edges.size
+
+    reference = {'names': np.array(names), 'edges': edges, 'n_edges': n_edges,
+                 'model_version': np.array(model_version)}
+    reference['counts'] = bin_counts(values, reference)
+
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(path, **reference)
+    return reference
+
+
+def build_reference_from_training(raw_path=RAW_PATH, path=REFERENCE_PATH):
+    """Référence calculée sur le split d'entraînement du pipeline (avant SMOTE)"""
+    bundle = load_current()
+    # Features non normalisées : dénormaliser X_train introduirait des erreurs d'arrondi
+    # sur les features binaires
+    X_train, _, _, _ = split_features(raw_path)
+    scores = predict_scaled((X_train - bundle.scaler.mean_) / bundle.scaler.scale_, bundle.model)
+    return build_reference(X_train, scores, bundle.version, path=path)
+
+
+def load_reference(path=REFERENCE_PATH):
+    with np.load(path) as reference:
+        return {key: reference[key] for key in reference.files}
+
+
+def bin_counts(values, reference):
+    """Comptages (n_colonnes, N_BINS) de toutes les colonnes en un seul bincount"""
+    edges, n_edges = reference['edges'], reference['n_edges']
+    n_rows, n_columns = values.shape
+    n_bins = edges.shape[1] + 1
+
+    bins = np.empty((n_rows, n_columns), dtype=np.int64)
+    for j in range(n_columns):
+        bins[:, j] = np.searchsorted(edges[j, :n_edges[j]], values[:, j], side='right')
+    # Décalage par colonne : un seul histogramme à plat pour toute la matrice
+    bins += np.arange(n_columns) * n_bins
+    return np.bincount(bins.ravel(), minlength=n_columns * n_bins).reshape(n_columns, n_bins)
+
+
+# ==================== INDICATEURS ====================
+def psi(expected_counts, actual_counts):
+    """Population Stability Index par ligne (une ligne = une feature)"""
+    expected = expected_counts / expected_counts.sum(axis=1, keepdims=True)
+    actual = actual_counts / np.maximum(actual_counts.sum(axis=1, keepdims=True), 1)
+    expected, actual = np.maximum(expected, EPSILON), np.maximum(actual, EPSILON)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def ks(expected_counts, actual_counts):
+    """Statistique de Kolmogorov-Smirnov évaluée aux bornes des intervalles"""
+    expected = np.cumsum(expected_counts, axis=1) / expected_counts.sum(axis=1, keepdims=True)
+    actual = np.cumsum(actual_counts, axis=1) / np.maximum(actual_counts.sum(axis=1, keepdims=True), 1)
+    return np.abs(actual - expected).max(axis=1)
+
+
+class DriftMonitor:
+    """Comptages cumulés des lignes scorées, comparés à la référence d'entraînement"""
+
+    def __init__(self, reference=None):
+        self.reference = reference if reference is not None else load_reference()
+        self.names = [str(name) for name in self.reference['names']]
+        self.model_version = str(self.reference['model_version'])
+        # Bornes de la seule colonne du score (dernière colonne de la référence)
+        self._score_reference = {'edges': self.reference['edges'][-1:], 'n_edges': self.reference['n_edges'][-1:]}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = np.zeros_like(self.reference['counts'])
+            self.n_rows = 0
+            self.n_other_version = 0
+
+    def update(self, X, scores, versions=None):
+        """Ajoute un lot (features non normalisées dans l'ordre FEATURES + scores du modèle)
+
+        versions : version du modèle ayant produit les scores (une pour le lot ou une par ligne) ;
+        seuls les scores de la version de référence entrent dans la distribution du score.
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        values = np.column_stack([np.asarray(X, dtype=np.float64), scores])
+        counts = bin_counts(values, self.reference)
+        n_other = 0
+        if versions is not None:
+            same = np.broadcast_to(np.asarray(versions, dtype=object) == self.model_version, scores.shape)
+            n_other = int(same.size - same.sum())
+            if n_other:
+                counts[-1] = bin_counts(scores[same][:, None], self._score_reference)[0]
+        with self._lock:
+            self.counts += counts
+            self.n_rows += len(values)
+            self.n_other_version += n_other
+
+    def update_raw(self, raw, scores, versions=None):
+        """Ajoute un lot de clients au format brut du CSV"""
+        self.update(engineer_features(raw).to_numpy(dtype=np.float64), scores, versions)
+
+    def report(self):
+        """PSI et KS par feature (et sur le score), triés par PSI décroissant ; NaN sans ligne comptée"""
+        with self._lock:
+            counts, n_rows, n_other = self.counts.copy(), self.n_rows, self.n_other_version
+        empty = counts.sum(axis=1) == 0
+        values = np.where(empty, np.nan, psi(self.reference['counts'], counts))
+        report = pd.DataFrame({
+            'Feature': self.names,
+            'PSI': values,
+            'KS': np.where(empty, np.nan, ks(self.reference['counts'], counts)),
+            'Statut': [psi_status(value) for value in values],
+        })
+        report.attrs['n_rows'] = n_rows
+        report.attrs['n_other_version'] = n_other
+        return report.sort_values('PSI', ascending=False, ignore_index=True, na_position='last')
+
+    def publish(self, registry=REGISTRY):
+        """Publie PSI/KS dans l'instrumentation (jauges drift/...)"""
+        report = self.report()
+        registry.set_gauge('drift/lignes', float(report.attrs['n_rows']))
+        registry.set_gauge('drift/scores_autre_version', float(report.attrs['n_other_version']),
+                           f"référence {self.model_version}")
+        for row in report.itertuples(index=False):
+            registry.set_gauge(f'drift/psi/{row.Feature}', float(row.PSI), row.Statut)
+            registry.set_gauge(f'drift/ks/{row.Feature}', float(row.KS))
+        return report
+
+
+def monitor_csv(raw_path=RAW_PATH, chunksize=100_000, reference=None, bundle=None):
+    """Parcourt un CSV client par chunks : features, score et comptages (mémoire bornée)"""
+    bundle = bundle or load_current()
+    model, _, scaler = bundle
+    monitor = DriftMonitor(reference)
+
+    for chunk in pd.read_csv(raw_path, usecols=RAW_COLUMNS, chunksize=chunksize):
+        X = engineer_features(chunk).to_numpy(dtype=np.float64)
+        scores = predict_scaled((X - scaler.mean_) / scaler.scale_, model)
+        monitor.update(X, scores, bundle.version)
+    return monitor
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dérive des données par rapport à l'entraînement")
+    parser.add_argument('raw', nargs='?', default=RAW_PATH, help="Extraction CSV à comparer")
+    parser.add_argument('--build-reference', action='store_true', help="Recalcule la référence d'entraînement")
+    parser.add_argument('--reference', default=REFERENCE_PATH)
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.build_reference or not os.path.exists(args.reference):
+        reference = build_reference_from_training(path=args.reference)
+        print(f"Référence enregistrée : {args.reference} (modèle {reference['model_version']})")
+    reference = load_reference(args.reference)
+
+    bundle = load_current()
+    start = time.perf_counter()
+    monitor = monitor_csv(args.raw, args.chunksize, reference, bundle)
+    elapsed = time.perf_counter() - start
+    report = monitor.publish()
+
+    print(f"{report.attrs['n_rows']:,} lignes analysées en {elapsed:.2f}s "
+          f"({report.attrs['n_rows'] / elapsed:,.0f} lignes/s)")
+    if report.attrs['n_other_version']:
+        print(f"Score non suivi : modèle {bundle_version} différent de la référence "
+              f"({monitor.model_version}), reconstruire avec --build-reference")
+    print(report.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
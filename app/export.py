@@ -0,0 +1,232 @@
+"""
+Export des résultats de scoring - écriture en flux, chunk par chunk, en
+Parquet, CSV gzip ou JSON lignes (NDJSON, éventuellement gzip).
+
+Les colonnes ont des types compacts : probabilités brute et calibrée en float32,
+Classification / Niveau_Risque / Version_Modele en catégories (dictionnaire
+en Parquet). La mémoire reste bornée par la taille d'un chunk.
+
+Usage : python app/export.py data/raw/bank_churn.csv exports/scores.parquet
+        python app/export.py data/raw/bank_churn.csv exports/scores.csv.gz
+        python app/export.py data/raw/bank_churn.csv exports/scores.ndjson.gz
+        python app/export.py data/raw/bank_churn.csv exports/scores.parquet --uncertainty
+"""
+
+import argparse
+import gzip
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from features import ID_COLUMN, RAW_COLUMNS, engineer_features
+from registry import load_current
+from schema import QUARANTINE_PATH, SCHEMA, Quarantine, split_valid
+from scoring import RISK_LEVELS, calibrate, classify_risk_array, predict_scaled, transform
+
+CLASSES = ['RETENTION', 'CHURN']
+
+# Incertitude de l'ensemble bootstrap (uncertainty.py), exportée si demandée
+UNCERTAINTY_COLUMNS = {
+    'std': 'Incertitude',
+    'low': 'Intervalle_Bas',
+    'high': 'Intervalle_Haut',
+    'agreement': 'Accord_Modeles',
+}
+
+# Colonnes brutes -> colonnes exportées (mêmes libellés que l'export de l'application)
+EXPORT_COLUMNS = {
+    'Gender': 'Genre',
+    'Age': 'Age',
+    'Geography': 'Pays',
+    'CreditScore': 'Credit_Score',
+    'Tenure': 'Anciennete',
+    'Balance': 'Solde',
+    'Estimated Salary': 'Salaire',
+    'Num Of Products': 'Nb_Produits',
+    'Has Credit Card': 'Carte_Credit',
+    'Is Active Member': 'Membre_Actif',
+}
+YES_NO = pd.CategoricalDtype(['Non', 'Oui'])
+
+
+def export_frame(raw, probabilities, threshold, version, analysed_at=None, calibrated=None, uncertainty=None):
+    """Résultats typés d'un lot de clients (DataFrame au format brut du CSV)"""
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    calibrated = probabilities if calibrated is None else np.asarray(calibrated, dtype=np.float32)
+    analysed_at = analysed_at or datetime.now()
+    n = len(raw)
+
+    frame = {'Date_Analyse': np.full(n, np.datetime64(analysed_at.replace(microsecond=0), 's'))}
+    if ID_COLUMN in raw.columns:
+        frame['CustomerId'] = raw[ID_COLUMN].to_numpy(dtype=np.int64)
+    for column, name in EXPORT_COLUMNS.items():
+        frame[name] = raw[column].to_numpy()
+
+    frame['Genre'] = pd.Categorical.from_codes(
+        (raw['Gender'].to_numpy() == 'Female').astype(np.int8), ['Homme', 'Femme'])
+    frame['Pays'] = pd.Categorical(frame['Pays'])
+    for name in ('Carte_Credit', 'Membre_Actif'):
+        frame[name] = pd.Categorical.from_codes(frame[name].astype(np.int8), dtype=YES_NO)
+
+    frame['Probabilite_Churn'] = probabilities
+    frame['Probabilite_Calibree'] = calibrated
+    frame['Classification'] = pd.Categorical.from_codes(
+        (probabilities >= threshold).astype(np.int8), CLASSES)
+    frame['Niveau_Risque'] = pd.Categorical.from_codes(
+        classify_risk_array(calibrated).astype(np.int8), RISK_LEVELS, ordered=True)
+    frame['Seuil_Utilise'] = np.full(n, threshold, dtype=np.float32)
+    frame['Version_Modele'] = pd.Categorical.from_codes(np.zeros(n, dtype=np.int8), [str(version)])
+    if uncertainty is not None:
+        for key, name in UNCERTAINTY_COLUMNS.items():
+            frame[name] = np.asarray(uncertainty[key], dtype=np.float32)
+    return pd.DataFrame(frame)
+
+
+# ==================== ÉCRITURE EN FLUX ====================
+class ParquetExport:
+    """Un row group Parquet par chunk (colonnes catégorielles encodées en dictionnaire)"""
+
+    def __init__(self, path, compression='zstd'):
+        self.path = path
+        self.compression = compression
+        self._writer = None
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        else:
+            # Les dictionnaires diffèrent d'un chunk à l'autre : on aligne sur le schéma initial
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class CsvExport:
+    """CSV (gzip si le chemin se termine par .gz), en-tête écrit une seule fois"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) if path.endswith('.gz') \
+            else open(path, 'w', encoding='utf-8', newline='')
+        self._header = True
+
+    def write(self, frame):
+        frame.to_csv(self._file, index=False, header=self._header, date_format='%Y-%m-%d %H:%M:%S')
+        self._header = False
+
+    def close(self):
+        self._file.close()
+
+
+class NdjsonExport(CsvExport):
+    """Un objet JSON par ligne (gzip si le chemin se termine par .gz)"""
+
+    def write(self, frame):
+        frame.to_json(self._file, orient='records', lines=True, date_format='iso', double_precision=6)
+
+
+WRITERS = {'parquet': ParquetExport, 'csv': CsvExport, 'ndjson': NdjsonExport}
+
+
+def export_format(path):
+    """Format déduit de l'extension (.parquet, .csv[.gz], .ndjson[.gz] / .jsonl[.gz])"""
+    name = path[:-3] if path.endswith('.gz') else path
+    extension = os.path.splitext(name)[1].lstrip('.')
+    fmt = {'jsonl': 'ndjson', 'json': 'ndjson'}.get(extension, extension)
+    if fmt not in WRITERS:
+        raise ValueError(f"Format d'export inconnu : {path}")
+    return fmt
+
+
+def export_scores(raw_path, output_path, chunksize=100_000, bundle=None, cascade=None,
+                  quarantine_path=QUARANTINE_PATH, ensemble=None):
+    """Score un CSV client par chunks et écrit chaque chunk dès qu'il est prêt (lignes invalides en quarantaine)"""
+    bundle = cascade.bundle if cascade is not None else bundle or load_current()
+    model, metadata, scaler = bundle
+    threshold = float(metadata['optimal_threshold'])
+    analysed_at = datetime.now()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    writer = WRITERS[export_format(output_path)](output_path)
+    quarantine = Quarantine(quarantine_path)
+    n_rows = 0
+    start = time.perf_counter()
+    try:
+        for chunk in pd.read_csv(raw_path, usecols=[ID_COLUMN] + RAW_COLUMNS, chunksize=chunksize):
+            chunk, rejected, reasons = split_valid(chunk)
+            quarantine.add(rejected, reasons)
+            if chunk.empty:
+                continue
+            X_scaled = transform(chunk, scaler)
+            if cascade is not None:
+                probabilities, _ = cascade.predict_scaled(X_scaled)
+            else:
+                probabilities = predict_scaled(X_scaled, model)
+            uncertainty = None
+            if ensemble is not None:
+                X = engineer_features(chunk).to_numpy(dtype=np.float32)
+                uncertainty = ensemble.uncertainty(X, probabilities, metadata)
+            writer.write(export_frame(chunk, probabilities, threshold, bundle.version, analysed_at,
+                                      calibrated=calibrate(probabilities, metadata), uncertainty=uncertainty))
+            n_rows += len(chunk)
+        if n_rows == 0:
+            # Aucune ligne valide (ou entrée vide) : le fichier existe quand même, avec son schéma
+            kinds = {'int': np.int64, 'float': np.float64, 'category': object}
+            empty = pd.DataFrame({column: np.empty(0, dtype=kinds[SCHEMA[column]['kind']])
+                                  for column in [ID_COLUMN] + RAW_COLUMNS})
+            uncertainty = {key: np.empty(0) for key in UNCERTAINTY_COLUMNS} if ensemble is not None else None
+            writer.write(export_frame(empty, np.empty(0), threshold, bundle.version, analysed_at,
+                                      uncertainty=uncertainty))
+    finally:
+        writer.close()
+
+    return {
+        'n_rows': n_rows,
+        'elapsed_s': time.perf_counter() - start,
+        'bytes': os.path.getsize(output_path),
+        'model_version': bundle.version,
+        **quarantine.report(),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Export en flux des scores de churn")
+    parser.add_argument('raw', help="CSV client à scorer")
+    parser.add_argument('output', help="Fichier de sortie (.parquet, .csv.gz, .ndjson.gz, ...)")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--cascade', type=float, metavar='MARGE',
+                        help="Score via la cascade distillée (modèle complet à moins de MARGE du seuil)")
+    parser.add_argument('--quarantine', default=QUARANTINE_PATH, help="CSV des lignes rejetées par le schéma (horodaté par exécution)")
+    parser.add_argument('--uncertainty', action='store_true', help="Ajoute l'incertitude de l'ensemble bootstrap")
+    args = parser.parse_args()
+
+    cascade = None
+    if args.cascade is not None:
+        from cascade import load_cascade
+
+        cascade = load_cascade(margin=args.cascade)
+    bundle, ensemble = None, None
+    if args.uncertainty:
+        from uncertainty import load_ensemble
+
+        bundle = cascade.bundle if cascade is not None else load_current()
+        ensemble = load_ensemble(bundle.version)
+        if ensemble is None:
+            raise SystemExit("Ensemble absent ou périmé : lancer 'python app/uncertainty.py train'")
+    report = export_scores(args.raw, args.output, args.chunksize, bundle, cascade, args.quarantine, ensemble)
+    print(f"{report['n_rows']:,} clients exportés en {report['elapsed_s']:.2f}s "
+          f"(modèle {report['model_version']})")
+    if report['n_quarantined']:
+        print(f"{report['n_quarantined']:,} lignes en quarantaine -> {report['quarantine_path']} : {report['reasons']}")
+    print(f"{args.output} : {report['bytes'] / 1e6:.1f} Mo "
+          f"({report['bytes'] / max(report['n_rows'], 1):.1f} octets/client)")
@@ -0,0 +1,197 @@
+"""
+Feature store local - features normalisées précalculées et dernier score,
+indexés par CustomerId dans SQLite (clé primaire entière = B-tree).
+
+Construction : python app/feature_store.py --build
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURES, ID_COLUMN, RAW_COLUMNS
+from registry import load_current
+from scoring import ROOT_DIR, client_frame, predict_scaled, transform
+
+STORE_PATH = os.path.join(ROOT_DIR, 'data', 'processed', 'feature_store.sqlite')
+RAW_PATH = os.path.join(ROOT_DIR, 'data', 'raw', 'bank_churn.csv')
+
+# Colonnes SQL (noms sans espaces) <-> colonnes brutes du CSV
+SQL_COLUMNS = {column: column.replace(' ', '_') for column in RAW_COLUMNS}
+SQL_TYPES = {'Geography': 'TEXT', 'Gender': 'TEXT', 'Balance': 'REAL', 'Estimated Salary': 'REAL'}
+NUMERIC_COLUMNS = [column for column in RAW_COLUMNS if column not in ('Geography', 'Gender')]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id INTEGER PRIMARY KEY,
+    {', '.join(f'{name} {SQL_TYPES.get(column, "INTEGER")}' for column, name in SQL_COLUMNS.items())},
+    features BLOB NOT NULL,
+    score REAL,
+    model_version TEXT,
+    updated_at TEXT,
+    row_hash INTEGER
+)
+"""
+META_SCHEMA = "CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value REAL)"
+
+
+class FeatureStore:
+    """Accès en lecture/écriture au feature store SQLite"""
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(SCHEMA)
+        self.conn.execute(META_SCHEMA)
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(customers)")]
+        if 'row_hash' not in columns:
+            self.conn.execute("ALTER TABLE customers ADD COLUMN row_hash INTEGER")
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- Écriture ----------
+    def upsert(self, raw, X_scaled, scores=None, version=None, hashes=None):
+        """Insère ou remplace un chunk de clients (features en float32)"""
+        X_scaled = np.ascontiguousarray(X_scaled, dtype=np.float32)
+        ids = raw[ID_COLUMN].to_numpy(dtype=np.int64)
+        values = [raw[column].tolist() for column in RAW_COLUMNS]
+        scores = [None] * len(ids) if scores is None else np.asarray(scores, dtype=float).tolist()
+        hashes = row_hashes(raw) if hashes is None else hashes
+        hashes = np.asarray(hashes, dtype=np.int64).tolist()
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        rows = (
+            (int(ids[i]), *(column[i] for column in values), X_scaled[i].tobytes(),
+             scores[i], version, now, hashes[i])
+            for i in range(len(ids))
+        )
+        placeholders = ', '.join(['?'] * (len(RAW_COLUMNS) + 6))
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO customers VALUES ({placeholders})", rows)
+
+    def update_scores(self, customer_ids, scores, version):
+        """Met à jour le dernier score d'une liste de clients"""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE customers SET score = ?, model_version = ? WHERE customer_id = ?",
+                zip(np.asarray(scores, dtype=float).tolist(), [version] * len(scores),
+                    np.asarray(customer_ids, dtype=np.int64).tolist())
+            )
+
+    def set_meta(self, key, value):
+        """Enregistre une mesure associée au store (ex. coût de scoring par ligne)"""
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO store_meta VALUES (?, ?)", (key, float(value)))
+
+    # ---------- Lecture ----------
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def get(self, customer_id):
+        """Retourne un client (attributs bruts, features normalisées, dernier score) ou None"""
+        row = self.conn.execute(
+            "SELECT * FROM customers WHERE customer_id = ?", (int(customer_id),)
+        ).fetchone()
+        if row is None:
+            return None
+
+        n_raw = len(RAW_COLUMNS)
+        return {
+            'customer_id': row[0],
+            'raw': dict(zip(RAW_COLUMNS, row[1:1 + n_raw])),
+            'features': np.frombuffer(row[1 + n_raw], dtype=np.float32),
+            'score': row[2 + n_raw],
+            'model_version': row[3 + n_raw],
+            'updated_at': row[4 + n_raw],
+        }
+
+    def score(self, customer_id, bundle):
+        """Score d'un client : dernier score stocké si à jour, sinon features recalculées avec le scaler du bundle"""
+        record = self.get(customer_id)
+        if record is None:
+            return None
+        if record['score'] is None or record['model_version'] != bundle.version:
+            # Les features stockées sont normalisées par le scaler de leur version : on repart des attributs bruts
+            X_scaled = transform(client_frame(**record['raw']), bundle.scaler, bundle.metadata['features'])
+            record['features'] = X_scaled[0].astype(np.float32)
+            record['score'] = float(predict_scaled(X_scaled, bundle.model)[0])
+            record['model_version'] = bundle.version
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE customers SET features = ?, score = ?, model_version = ? WHERE customer_id = ?",
+                    (record['features'].tobytes(), record['score'], bundle.version, int(customer_id)))
+        return record
+
+    def hash_snapshot(self, version):
+        """CustomerId triés et empreintes des clients déjà scorés avec cette version du modèle"""
+        rows = self.conn.execute(
+            "SELECT customer_id, row_hash FROM customers "
+            "WHERE model_version = ? AND score IS NOT NULL AND row_hash IS NOT NULL "
+            "ORDER BY customer_id", (version,)
+        ).fetchall()
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        snapshot = np.array(rows, dtype=np.int64)
+        return snapshot[:, 0], snapshot[:, 1]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+
+
+def row_hashes(raw):
+    """Empreinte 64 bits des attributs bruts de chaque ligne (stockable en INTEGER SQLite)"""
+    # Types canoniques : read_csv peut inférer int64 ou float64 selon le chunk
+    canonical = raw[RAW_COLUMNS].astype({column: np.float64 for column in NUMERIC_COLUMNS})
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy().view(np.int64)
+
+
+# ==================== CONSTRUCTION ====================
+def build_store(raw_path=RAW_PATH, store_path=STORE_PATH, chunksize=100_000, with_scores=True):
+    """Construit le feature store à partir du CSV client, chunk par chunk"""
+    bundle = load_current()
+    model, metadata, scaler = bundle
+    assert metadata['features'] == FEATURES, "Features du modèle incompatibles avec features.py"
+    version = bundle.version
+
+    store = FeatureStore(store_path)
+    n_rows = 0
+    for chunk in pd.read_csv(raw_path, usecols=[ID_COLUMN] + RAW_COLUMNS, chunksize=chunksize):
+        X_scaled = transform(chunk, scaler)
+        scores = predict_scaled(X_scaled, model) if with_scores else None
+        store.upsert(chunk, X_scaled, scores, version if with_scores else None)
+        n_rows += len(chunk)
+
+    return store, n_rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Feature store clients indexé par CustomerId")
+    parser.add_argument('--build', action='store_true', help="(Re)construit le store depuis le CSV brut")
+    parser.add_argument('--raw', default=RAW_PATH)
+    parser.add_argument('--store', default=STORE_PATH)
+    parser.add_argument('--lookup', type=int, help="CustomerId à afficher")
+    args = parser.parse_args()
+
+    if args.build:
+        start = time.perf_counter()
+        store, n_rows = build_store(args.raw, args.store)
+        print(f"{n_rows:,} clients indexés en {time.perf_counter() - start:.1f}s -> {args.store}")
+    else:
+        store = FeatureStore(args.store)
+
+    if args.lookup:
+        start = time.perf_counter()
+        record = store.get(args.lookup)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(record if record else "Client introuvable")
+        print(f"Lookup : {elapsed:.3f} ms")
+    store.close()
@@ -0,0 +1,86 @@
+"""
+Feature engineering vectorisé - reproduit le pipeline du notebook 02
+(sections 2 et 3) sur des DataFrames de n'importe quelle taille.
+"""
+
+import numpy as np
+import pandas as pd
+
+# ==================== SCHÉMA ====================
+# Colonnes brutes de data/raw/bank_churn.csv utilisées par le modèle
+RAW_COLUMNS = [
+    'CreditScore', 'Geography', 'Gender', 'Age', 'Tenure', 'Balance',
+    'Num Of Products', 'Has Credit Card', 'Is Active Member', 'Estimated Salary'
+]
+ID_COLUMN = 'CustomerId'
+TARGET = 'Churn'
+
+# Ordre exact des features attendu par le scaler et le modèle
+FEATURES = [
+    'CreditScore', 'Gender', 'Age', 'Tenure', 'Balance', 'Num Of Products',
+    'Has Credit Card', 'Is Active Member', 'Estimated Salary', 'Age_Group',
+    'Balance_Salary_Ratio', 'Is_Premium', 'High_Risk', 'Tenure_Group',
+    'Engagement_Score', 'Zero_Balance', 'Geography_Germany', 'Geography_Spain',
+    'GeoGender_France_Male', 'GeoGender_Germany_Female', 'GeoGender_Germany_Male',
+    'GeoGender_Spain_Female', 'GeoGender_Spain_Male'
+]
+
+# Bornes des pd.cut du notebook (intervalles fermés à droite)
+AGE_BINS = np.array([30, 40, 50, 60])
+TENURE_BINS = np.array([2, 5])
+
+# Quantile 75% du solde sur le dataset d'entraînement (seuil Is_Premium)
+PREMIUM_BALANCE_THRESHOLD = 127644.24
+
+# LabelEncoder du notebook : Female = 0, Male = 1
+GENDER_CODES = {'Female': 0, 'Male': 1}
+
+
+# ==================== FEATURE ENGINEERING ====================
+def engineer_features(raw, premium_threshold=PREMIUM_BALANCE_THRESHOLD, features=FEATURES):
+    """Construit la matrice des features (ordre `features`, FEATURES par défaut) à partir des colonnes brutes
+
+    Seules les features demandées sont calculées (jeu de features élagué).
+    """
+
+    age = raw['Age'].to_numpy()
+    tenure = raw['Tenure'].to_numpy()
+    balance = raw['Balance'].to_numpy(dtype=float)
+    salary = raw['Estimated Salary'].to_numpy(dtype=float)
+    active = raw['Is Active Member'].to_numpy()
+    card = raw['Has Credit Card'].to_numpy()
+    products = raw['Num Of Products'].to_numpy()
+    geography = raw['Geography'].to_numpy()
+    male = (raw['Gender'].to_numpy() == 'Male').astype(np.int64)
+
+    germany = geography == 'Germany'
+    spain = geography == 'Spain'
+    france = geography == 'France'
+
+    builders = {
+        'CreditScore': lambda: raw['CreditScore'].to_numpy(),
+        'Gender': lambda: male,
+        'Age': lambda: age,
+        'Tenure': lambda: tenure,
+        'Balance': lambda: balance,
+        'Num Of Products': lambda: products,
+        'Has Credit Card': lambda: card,
+        'Is Active Member': lambda: active,
+        'Estimated Salary': lambda: salary,
+        'Age_Group': lambda: np.searchsorted(AGE_BINS, age, side='left'),
+        'Balance_Salary_Ratio': lambda: balance / (salary + 1),
+        'Is_Premium': lambda: (balance > premium_threshold).astype(np.int64),
+        'High_Risk': lambda: ((age > 40) & (age < 60) & (active == 0)).astype(np.int64),
+        'Tenure_Group': lambda: np.searchsorted(TENURE_BINS, tenure, side='left'),
+        'Engagement_Score': lambda: active * 3 + card + (products >= 2) * 2,
+        'Zero_Balance': lambda: (balance == 0).astype(np.int64),
+        'Geography_Germany': lambda: germany.astype(np.int64),
+        'Geography_Spain': lambda: spain.astype(np.int64),
+        'GeoGender_France_Male': lambda: (france & (male == 1)).astype(np.int64),
+        'GeoGender_Germany_Female': lambda: (germany & (male == 0)).astype(np.int64),
+        'GeoGender_Germany_Male': lambda: (germany & (male == 1)).astype(np.int64),
+        'GeoGender_Spain_Female': lambda: (spain & (male == 0)).astype(np.int64),
+        'GeoGender_Spain_Male': lambda: (spain & (male == 1)).astype(np.int64),
+    }
+
+    return pd.DataFrame({name: builders[name]() for name in features}, index=raw.index)
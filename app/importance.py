@@ -0,0 +1,220 @@
+"""
+Importance par permutation et élagage des features.
+
+Le test n'intervient qu'à la fin : l'importance est mesurée sur une part de
+validation du train, scorée par la recette du modèle servi réentraînée sur
+le reste. Cette validation est scorée une seule fois par le modèle compact
+(valeur de feuille de chaque arbre). Permuter une feature ne change que les
+arbres qui la testent : chaque permutation ne reparcourt que ceux-là et
+corrige la marge de référence. Les features, la cible et les feuilles de
+référence sont écrites en .npy et ouvertes en mmap_mode='r' par les workers
+(une tâche par feature, un tampon de permutation par worker).
+
+Les features dont la permutation ne coûte presque rien en ROC-AUC sont
+proposées à l'élagage ; le jeu élagué est validé en validation croisée
+(plis en cache de cv.py), réentraîné, puis évalué une seule fois sur le test
+et comparé en temps de service.
+
+Usage : python app/importance.py [--repeats 5] [--workers 2]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from compact import export_compact, load_compact
+from features import engineer_features
+from pipeline import PROCESSED_DIR, RANDOM_STATE, RAW_PATH, roc_auc, split_features
+
+IMPORTANCE_DIR = os.path.join(PROCESSED_DIR, 'importance')
+PRUNING_PATH = os.path.join(PROCESSED_DIR, 'feature_pruning.json')
+N_REPEATS = 5
+VALID_SHARE = 0.2
+# Perte d'AUC par permutation en dessous de laquelle une feature est candidate à l'élagage
+IMPORTANCE_FLOOR = 0.0005
+# Perte d'AUC (validation croisée) acceptée pour le jeu élagué
+TOLERANCE = 0.002
+
+_shared = {}
+
+
+# ==================== RÉFÉRENCE PARTAGÉE ====================
+def prepare_baseline(bundle, cache_dir=IMPORTANCE_DIR, valid_share=VALID_SHARE):
+    """Validation tirée du train, modèle compact réentraîné sur le reste et feuilles de référence sur disque ;
+    ROC-AUC de référence (validation)"""
+    from sklearn.model_selection import train_test_split
+
+    from registry import ModelBundle
+    from retrain import full_retrain
+
+    os.makedirs(cache_dir, exist_ok=True)
+    X_train, _, y_train, _ = split_features()
+    X_fit, X_valid, y_fit, y_valid = train_test_split(
+        X_train, y_train, test_size=valid_share, random_state=RANDOM_STATE, stratify=y_train)
+    model, scaler = full_retrain(bundle, X_fit, y_fit)
+    reference = ModelBundle(bundle.version, model, bundle.metadata, scaler)
+    compact = export_compact(reference, path=os.path.join(cache_dir, 'model.npz'))
+    leaves = compact.leaf_values(X_valid)
+    np.save(os.path.join(cache_dir, 'X.npy'), X_valid.astype(np.float32))
+    np.save(os.path.join(cache_dir, 'y.npy'), y_valid)
+    np.save(os.path.join(cache_dir, 'leaves.npy'), leaves)
+    return roc_auc(y_valid, leaves.sum(axis=1, dtype=np.float64))
+
+
+def _load_shared(cache_dir):
+    """Initialisation d'un worker : tableaux projetés en mémoire, arbres utilisant chaque feature"""
+    model = load_compact(os.path.join(cache_dir, 'model.npz'))
+    leaves = np.load(os.path.join(cache_dir, 'leaves.npy'), mmap_mode='r')
+    internal = np.isfinite(model.threshold)
+    tree_of_node = np.searchsorted(model.roots, np.arange(model.feature.size), side='right') - 1
+    _shared.update(
+        model=model,
+        X=np.load(os.path.join(cache_dir, 'X.npy'), mmap_mode='r'),
+        y=np.load(os.path.join(cache_dir, 'y.npy'), mmap_mode='r'),
+        leaves=leaves,
+        margin=leaves.sum(axis=1, dtype=np.float64),
+        trees={j: np.unique(tree_of_node[internal & (model.feature == j)]) for j in range(len(model.features))},
+        buffer=None,
+    )
+
+
+def _permute(j, n_repeats):
+    """Pertes de ROC-AUC en permutant la feature j (seuls les arbres qui la testent sont reparcourus)"""
+    model, X, y, trees = _shared['model'], _shared['X'], _shared['y'], _shared['trees'][j]
+    if trees.size == 0:
+        return j, np.zeros(n_repeats), 0
+    baseline = roc_auc(y, _shared['margin'])
+    margin = _shared['margin'] - _shared['leaves'][:, trees].sum(axis=1, dtype=np.float64)
+    rng = np.random.default_rng(RANDOM_STATE + j)
+    # Tampon copié une fois par worker ; seule la colonne j est réécrite puis restaurée
+    if _shared['buffer'] is None:
+        _shared['buffer'] = np.array(X)
+    buffer, column = _shared['buffer'], X[:, j]
+    drops = np.empty(n_repeats)
+    for r in range(n_repeats):
+        buffer[:, j] = rng.permutation(column)
+        permuted = margin + model.leaf_values(buffer, roots=model.roots[trees]).sum(axis=1, dtype=np.float64)
+        drops[r] = baseline - roc_auc(y, permuted)
+    buffer[:, j] = column
+    return j, drops, trees.size
+
+
+def permutation_importance(bundle, n_repeats=N_REPEATS, n_workers=None, cache_dir=IMPORTANCE_DIR):
+    """Perte moyenne de ROC-AUC (validation) par feature (une tâche par feature dans un pool de processus)"""
+    baseline = prepare_baseline(bundle, cache_dir)
+    features = list(bundle.metadata['features'])
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers <= 1:
+        _load_shared(cache_dir)
+        results = [_permute(j, n_repeats) for j in range(len(features))]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_load_shared, initargs=(cache_dir,)) as executor:
+            results = list(executor.map(_permute, range(len(features)), [n_repeats] * len(features)))
+
+    split_counts = bundle.model.booster_.feature_importance('split')
+    table = pd.DataFrame([{
+        'feature': features[j],
+        'importance': drops.mean(),
+        'importance_std': drops.std(),
+        'trees': n_trees,
+        'splits': int(split_counts[j]),
+    } for j, drops, n_trees in results])
+    return table.sort_values('importance', ascending=False, ignore_index=True), baseline
+
+
+# ==================== ÉLAGAGE ====================
+def propose_pruning(table, bundle, floor=IMPORTANCE_FLOOR, tolerance=TOLERANCE, n_workers=None):
+    """Features conservées : candidates retirées tant que l'AUC en validation croisée reste dans la tolérance"""
+    from cv import cross_validate
+
+    features = list(bundle.metadata['features'])
+    cv_auc = lambda kept: cross_validate(bundle.estimator(), n_workers=n_workers,
+                                         columns=[features.index(name) for name in kept])[0]['roc_auc'].mean()
+    full_auc = cv_auc(features)
+    # Candidates de la moins importante à la plus importante ; on réintègre les plus importantes si besoin
+    dropped = list(table.loc[table['importance'] < floor, 'feature'][::-1])
+    while True:
+        kept = [name for name in features if name not in dropped]
+        pruned_auc = cv_auc(kept)
+        if full_auc - pruned_auc <= tolerance or not dropped:
+            break
+        dropped.pop()
+    return kept, dropped, full_auc, pruned_auc
+
+
+def _median_ms(functions, repeats):
+    """Temps médians (ms) des fonctions, mesurées en alternance (machine partagée, mesures bruitées)"""
+    for function in functions:
+        function()
+    timings = np.empty((repeats, len(functions)))
+    for r in range(repeats):
+        for i, function in enumerate(functions):
+            start = time.perf_counter()
+            function()
+            timings[r, i] = time.perf_counter() - start
+    return np.median(timings, axis=0) * 1000
+
+
+def evaluate_pruned(bundle, kept, raw):
+    """ROC-AUC test (seule utilisation du test) du modèle réentraîné sur les features conservées et temps de
+    service (1 client, lot)"""
+    from retrain import full_retrain
+    from scoring import predict_proba, predict_scaled, transform
+
+    features = list(bundle.metadata['features'])
+    columns = [features.index(name) for name in kept]
+    X_train, X_test, y_train, y_test = split_features()
+    model, scaler = full_retrain(bundle, X_train[:, columns], y_train)
+
+    report = {
+        'test_auc_full': roc_auc(y_test, predict_scaled(bundle.scaler.transform(X_test), bundle.model)),
+        'test_auc_pruned': roc_auc(y_test, predict_scaled(scaler.transform(X_test[:, columns]), model)),
+    }
+    for name, frame, repeats in (('single', raw.iloc[:1], 500), ('batch', raw, 15)):
+        features_full, features_pruned, total_full, total_pruned = _median_ms([
+            lambda: engineer_features(frame),
+            lambda: engineer_features(frame, features=kept),
+            lambda: predict_proba(frame, bundle.model, bundle.scaler),
+            lambda: predict_scaled(transform(frame, scaler, kept), model),
+        ], repeats)
+        report.update({f'{name}_features_ms_full': features_full, f'{name}_features_ms_pruned': features_pruned,
+                       f'{name}_total_ms_full': total_full, f'{name}_total_ms_pruned': total_pruned})
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Importance par permutation et élagage des features")
+    parser.add_argument('--repeats', type=int, default=N_REPEATS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--floor', type=float, default=IMPORTANCE_FLOOR, help="Perte d'AUC sous laquelle élaguer")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="Perte d'AUC CV acceptée")
+    args = parser.parse_args()
+
+    from registry import load_current
+
+    bundle = load_current()
+    start = time.perf_counter()
+    table, baseline = permutation_importance(bundle, args.repeats, args.workers)
+    print(f"ROC-AUC de référence (validation) : {baseline:.4f} - permutations en {time.perf_counter() - start:.2f}s")
+    print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+
+    kept, dropped, full_auc, pruned_auc = propose_pruning(table, bundle, args.floor, args.tolerance, args.workers)
+    raw = pd.read_csv(RAW_PATH)
+    report = evaluate_pruned(bundle, kept, raw)
+    print(f"\nÉlaguées ({len(dropped)}) : {', '.join(dropped) or '-'}")
+    print(f"ROC-AUC CV : {full_auc:.4f} -> {pruned_auc:.4f} ; test : "
+          f"{report['test_auc_full']:.4f} -> {report['test_auc_pruned']:.4f}")
+    for name, label in (('single', '1 client'), ('batch', f'lot de {len(raw):,}')):
+        print(f"Service {label} (ms médian) : features {report[f'{name}_features_ms_full']:.3f} -> "
+              f"{report[f'{name}_features_ms_pruned']:.3f}, bout en bout {report[f'{name}_total_ms_full']:.3f} -> "
+              f"{report[f'{name}_total_ms_pruned']:.3f}")
+
+    with open(PRUNING_PATH, 'w') as f:
+        json.dump({'kept': kept, 'dropped': dropped, 'cv_auc_full': full_auc, 'cv_auc_pruned': pruned_auc,
+                   'importance': table.to_dict(orient='records'), **report}, f, indent=2)
+    print(f"Proposition enregistrée : {PRUNING_PATH}")
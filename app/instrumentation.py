@@ -0,0 +1,71 @@
+"""
+Instrumentation - temps d'exécution (mur et CPU) et indicateurs (jauges)
+partagés par toutes les sessions
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class Registry:
+    """Dernières mesures par nom, en mémoire et thread-safe"""
+
+    def __init__(self, maxlen=1000):
+        self._lock = threading.Lock()
+        self._timings = defaultdict(lambda: deque(maxlen=maxlen))
+        self._gauges = {}
+
+    def record(self, name, wall_ms, cpu_ms):
+        with self._lock:
+            self._timings[name].append((wall_ms, cpu_ms))
+
+    def set_gauge(self, name, value, status=''):
+        """Dernière valeur d'un indicateur (ex : PSI d'une feature)"""
+        with self._lock:
+            self._gauges[name] = (value, status, datetime.now().strftime('%H:%M:%S'))
+
+    def gauges(self, prefix=''):
+        """Tableau des indicateurs dont le nom commence par prefix"""
+        with self._lock:
+            snapshot = sorted(item for item in self._gauges.items() if item[0].startswith(prefix))
+        return pd.DataFrame(
+            [{'Indicateur': name, 'Valeur': value, 'Statut': status, 'Mis à jour': updated}
+             for name, (value, status, updated) in snapshot],
+            columns=['Indicateur', 'Valeur', 'Statut', 'Mis à jour'],
+        )
+
+    def summary(self):
+        """Tableau récapitulatif : nombre d'appels, temps mur p50/p95, CPU p50"""
+        with self._lock:
+            snapshot = {name: np.array(values) for name, values in self._timings.items()}
+
+        rows = []
+        for name, values in sorted(snapshot.items()):
+            rows.append({
+                'Mesure': name,
+                'Appels': len(values),
+                'Mur p50 (ms)': np.percentile(values[:, 0], 50),
+                'Mur p95 (ms)': np.percentile(values[:, 0], 95),
+                'CPU p50 (ms)': np.percentile(values[:, 1], 50),
+                'Dernier (ms)': values[-1, 0],
+            })
+        return pd.DataFrame(rows)
+
+
+REGISTRY = Registry()
+
+
+@contextmanager
+def timed(name, registry=REGISTRY):
+    """Mesure le temps mur et le temps CPU du thread courant (une session Streamlit = un thread)"""
+    wall, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        registry.record(name, (time.perf_counter() - wall) * 1000, (time.thread_time() - cpu) * 1000)
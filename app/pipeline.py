@@ -0,0 +1,117 @@
+"""
+Pipeline d'entraînement - split, normalisation et SMOTE du notebook 02,
+avec mise en cache des tableaux NumPy prêts à l'emploi.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from features import TARGET, engineer_features
+
+RANDOM_STATE = 42
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAW_PATH = os.path.join(ROOT_DIR, 'data', 'raw', 'bank_churn.csv')
+PROCESSED_DIR = os.path.join(ROOT_DIR, 'data', 'processed')
+MODELS_DIR = os.path.join(ROOT_DIR, 'models')
+CACHE_PATH = os.path.join(PROCESSED_DIR, 'train_test_arrays.npz')
+
+
+# ==================== DONNÉES ====================
+def split_features(raw_path=RAW_PATH):
+    """Features non normalisées et cible, split 80/20 stratifié du notebook 02"""
+    df = pd.read_csv(raw_path)
+    X = engineer_features(df).to_numpy(dtype=np.float64)
+    y = df[TARGET].to_numpy(dtype=np.int8)
+    return train_test_split(X, y, test_size=0.2, random_state=RANDOM_STATE, stratify=y)
+
+
+def prepare_datasets(raw_path=RAW_PATH, cache_path=CACHE_PATH, refresh=False):
+    """Retourne les tableaux train/test (normalisés, train rééquilibré par SMOTE)
+
+    Le résultat est mis en cache dans un .npz : les appels suivants ne refont
+    ni le feature engineering, ni le split, ni le SMOTE.
+    """
+    if cache_path and not refresh and os.path.exists(cache_path):
+        if os.path.getmtime(cache_path) >= os.path.getmtime(raw_path):
+            with np.load(cache_path) as cached:
+                return {key: cached[key] for key in cached.files}
+
+    from imblearn.over_sampling import SMOTE
+
+    X_train, X_test, y_train, y_test = split_features(raw_path)
+
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    smote = SMOTE(random_state=RANDOM_STATE)
+    X_train_balanced, y_train_balanced = smote.fit_resample(X_train_scaled, y_train)
+
+    arrays = {
+        'X_train': X_train_scaled,
+        'y_train': y_train,
+        'X_train_balanced': X_train_balanced,
+        'y_train_balanced': y_train_balanced.astype(np.int8),
+        'X_test': X_test_scaled,
+        'y_test': y_test,
+        'scaler_mean': scaler.mean_,
+        'scaler_scale': scaler.scale_,
+    }
+
+    if cache_path:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.savez(cache_path, **arrays)
+
+    return arrays
+
+
+# ==================== MÉTRIQUES ====================
+def compute_metrics(y_true, y_proba, threshold=0.5):
+    """Accuracy, precision, recall, F1 et ROC-AUC en une seule passe vectorisée"""
+    y_true = np.asarray(y_true).astype(bool)
+    y_proba = np.asarray(y_proba, dtype=np.float64)
+    y_pred = y_proba >= threshold
+
+    tp = np.count_nonzero(y_pred & y_true)
+    fp = np.count_nonzero(y_pred & ~y_true)
+    fn = np.count_nonzero(~y_pred & y_true)
+    tn = y_true.size - tp - fp - fn
+
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    return {
+        'accuracy': (tp + tn) / y_true.size,
+        'precision': precision,
+        'recall': recall,
+        'f1_score': f1,
+        'roc_auc': roc_auc(y_true, y_proba),
+    }
+
+
+def roc_auc(y_true, y_proba):
+    """ROC-AUC via la statistique de Mann-Whitney (rangs moyens pour les ex-aequo)"""
+    y_true = np.asarray(y_true).astype(bool)
+    ranks = pd.Series(y_proba).rank(method='average').to_numpy()
+    n_pos = np.count_nonzero(y_true)
+    n_neg = y_true.size - n_pos
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    return (ranks[y_true].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg)
+
+
+def roc_points(y_true, y_proba, max_points=200):
+    """Courbe ROC (FPR, TPR) sous-échantillonnée pour l'export"""
+    y_true = np.asarray(y_true).astype(bool)
+    order = np.argsort(-np.asarray(y_proba), kind='mergesort')
+    hits = y_true[order]
+    tpr = np.concatenate([[0.0], np.cumsum(hits) / max(hits.sum(), 1)])
+    fpr = np.concatenate([[0.0], np.cumsum(~hits) / max((~hits).sum(), 1)])
+    keep = np.unique(np.linspace(0, tpr.size - 1, min(max_points, tpr.size)).astype(int))
+    return fpr[keep].tolist(), tpr[keep].tolist()
@@ -0,0 +1,262 @@
+"""
+Registre de modèles versionné - un dossier par version (modèle, scaler,
+métadonnées, manifest avec empreintes SHA-256) et un pointeur CURRENT.
+
+Les processus de service surveillent CURRENT en tâche de fond et remplacent
+le triplet (modèle, scaler, métadonnées) d'un seul bloc : une prédiction en
+cours garde la version qu'elle a lue au départ.
+
+Usage :
+    python app/registry.py publish [--version v2]
+    python app/registry.py activate v1
+    python app/registry.py list
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import joblib
+
+from scoring import DEFAULT_MODELS_DIR, load_artifacts, model_version
+
+REGISTRY_DIR = os.path.join(DEFAULT_MODELS_DIR, 'registry')
+CURRENT_FILE = 'CURRENT'
+ARTIFACTS = ['lightgbm_churn_final.pkl', 'scaler.pkl', 'model_metadata.pkl']
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Version immuable du modèle servi"""
+    version: str
+    model: object
+    metadata: dict
+    scaler: object
+
+    def __iter__(self):
+        # Permet : model, metadata, scaler = bundle
+        return iter((self.model, self.metadata, self.scaler))
+
+    def estimator(self):
+        """Estimateur non entraîné selon la recette d'entraînement (celle d'avant un réentraînement incrémental)"""
+        from sklearn.base import clone
+
+        return clone(self.model).set_params(**self.metadata.get('recipe', {}))
+
+
+# ==================== PUBLICATION ====================
+def file_sha256(path, block_size=1 << 20):
+    """Empreinte SHA-256 d'un fichier"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    """Écrit un fichier texte via un fichier temporaire + os.replace (atomique)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp_')
+    with os.fdopen(fd, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def publish(source_dir=DEFAULT_MODELS_DIR, version=None, registry_dir=REGISTRY_DIR, activate=True):
+    """Copie les artefacts de source_dir dans une nouvelle version du registre"""
+    os.makedirs(registry_dir, exist_ok=True)
+    version = version or datetime.now().strftime('v%Y%m%d-%H%M%S')
+    target = os.path.join(registry_dir, version)
+    if os.path.exists(target):
+        raise FileExistsError(f"Version déjà publiée : {version}")
+
+    # Copie dans un dossier temporaire puis renommage : une version est complète ou absente
+    staging = tempfile.mkdtemp(dir=registry_dir, prefix='.staging_')
+    try:
+        for name in ARTIFACTS:
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(staging, name))
+
+        metadata = joblib.load(os.path.join(staging, 'model_metadata.pkl'))
+        manifest = {
+            'version': version,
+            'published_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'checksums': {name: file_sha256(os.path.join(staging, name)) for name in ARTIFACTS},
+            'model_name': metadata.get('model_name'),
+            'training_date': metadata.get('training_date'),
+            'optimal_threshold': float(metadata['optimal_threshold']),
+            'roc_auc': float(metadata['performance']['roc_auc']),
+        }
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, target)
+    finally:
+        # Publication interrompue : pas de dossier .staging_* orphelin
+        if os.path.isdir(staging):
+            shutil.rmtree(staging, ignore_errors=True)
+
+    if activate:
+        activate_version(version, registry_dir)
+    return version
+
+
+def activate_version(version, registry_dir=REGISTRY_DIR):
+    """Fait pointer CURRENT sur une version publiée (promotion ou rollback)"""
+    if not os.path.exists(os.path.join(registry_dir, version, 'manifest.json')):
+        raise FileNotFoundError(f"Version inconnue : {version}")
+    _write_atomic(os.path.join(registry_dir, CURRENT_FILE), version)
+
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Version active, ou None si le registre est vide"""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Manifests de toutes les versions publiées"""
+    if not os.path.isdir(registry_dir):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(registry_dir)):
+        path = os.path.join(registry_dir, name, 'manifest.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                manifests.append(json.load(f))
+    return manifests
+
+
+# ==================== CHARGEMENT ====================
+def load_bundle(version, registry_dir=REGISTRY_DIR):
+    """Charge une version après vérification des empreintes"""
+    version_dir = os.path.join(registry_dir, version)
+    with open(os.path.join(version_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+
+    for name, expected in manifest['checksums'].items():
+        if file_sha256(os.path.join(version_dir, name)) != expected:
+            raise ValueError(f"Empreinte invalide pour {version}/{name}")
+
+    model, metadata, scaler = load_artifacts(version_dir)
+    metadata = {**metadata, 'version': version}
+    return ModelBundle(version, model, metadata, scaler)
+
+
+def load_current(registry_dir=REGISTRY_DIR):
+    """Version active du registre, ou artefacts historiques de models/ si le registre est vide"""
+    version = current_version(registry_dir)
+    if version is not None:
+        return load_bundle(version, registry_dir)
+
+    model, metadata, scaler = load_artifacts()
+    return ModelBundle(model_version(metadata), model, metadata, scaler)
+
+
+class FixedRegistry:
+    """Version servie figée (workers pré-forkés de serve.py : pas de rechargement à chaud)"""
+
+    def __init__(self, bundle, registry_dir=REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self._bundle = bundle
+
+    def current(self):
+        return self._bundle
+
+
+class ModelRegistry:
+    """Modèle servi + surveillance du registre et rechargement à chaud en tâche de fond"""
+
+    def __init__(self, registry_dir=REGISTRY_DIR, poll_interval=2.0, retry_interval=60.0):
+        self.registry_dir = registry_dir
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.last_error = None
+        self._failed_version = None
+        self._failed_at = 0.0
+        self._bundle = load_current(registry_dir)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def current(self):
+        """Version servie : simple lecture d'attribut, jamais bloquante"""
+        return self._bundle
+
+    def start(self):
+        """Démarre le thread de surveillance (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._watch, name='model-registry-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self):
+        """Recharge le modèle si CURRENT désigne une autre version ; retourne True en cas de bascule"""
+        version = current_version(self.registry_dir)
+        if version is None or version == self._bundle.version:
+            return False
+        # Version invalide : retentée après retry_interval (fichiers corrigés sur place entre-temps)
+        if version == self._failed_version and time.monotonic() - self._failed_at < self.retry_interval:
+            return False
+        try:
+            bundle = load_bundle(version, self.registry_dir)
+        except Exception as e:
+            # La version servie reste en place si la nouvelle est invalide
+            self._failed_version = version
+            self._failed_at = time.monotonic()
+            self.last_error = f"{version} : {e}"
+            logger.warning("Rechargement du modèle impossible (%s)", self.last_error)
+            return False
+
+        # Remplacement atomique de la référence : les requêtes en cours gardent l'ancien bundle
+        self._bundle = bundle
+        self._failed_version = None
+        self.last_error = None
+        logger.info("Modèle %s chargé", version)
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Registre de modèles versionné")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    cmd = sub.add_parser('publish', help="Publie les artefacts de models/ comme nouvelle version")
+    cmd.add_argument('--source', default=DEFAULT_MODELS_DIR)
+    cmd.add_argument('--version')
+    cmd.add_argument('--no-activate', action='store_true')
+
+    cmd = sub.add_parser('activate', help="Active une version publiée")
+    cmd.add_argument('version')
+
+    sub.add_parser('list', help="Liste les versions publiées")
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        version = publish(args.source, args.version, activate=not args.no_activate)
+        print(f"Version publiée : {version}")
+    elif args.command == 'activate':
+        activate_version(args.version)
+        print(f"Version active : {args.version}")
+    else:
+        active = current_version()
+        for manifest in list_versions():
+            flag = '*' if manifest['version'] == active else ' '
+            print(f"{flag} {manifest['version']:20} ROC-AUC {manifest['roc_auc']:.4f}  "
+                  f"seuil {manifest['optimal_threshold']:.4f}  publié le {manifest['published_at']}")
@@ -0,0 +1,241 @@
+"""
+Optimisation des actions de rétention sur un portefeuille - chaque client à
+risque est rescoré sous chaque intervention candidate (un seul appel au
+modèle par chunk), puis le budget est réparti sur tout le portefeuille :
+sac à dos à choix multiples résolu de façon gloutonne, par baisse de
+probabilité (calibrée) par euro.
+
+Pour chaque client, seules les interventions de la frontière efficace
+(enveloppe concave coût / gain) sont retenues : passer d'une intervention à
+la suivante est un incrément de coût et de gain dont le rendement décroît.
+Les incréments de tout le portefeuille sont triés une fois et pris dans
+l'ordre tant que le budget le permet.
+
+Usage : python app/retention.py data/raw/bank_churn.csv --budget 50000 [--output exports/plan.parquet]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from features import ID_COLUMN, RAW_COLUMNS
+from registry import load_current
+from schema import Quarantine, split_valid
+from scoring import RISK_BANDS, calibrate, predict_scaled, transform
+from whatif import LEVERS
+
+# Interventions : valeurs cibles des colonnes brutes (appliquées seulement si elles augmentent la
+# valeur actuelle) ; coût = écart x coût unitaire du levier dans whatif.LEVERS
+INTERVENTIONS = {
+    'activation': {'label': "Programme d'activation", 'changes': {'Is Active Member': 1}},
+    'second_produit': {'label': "Second produit", 'changes': {'Num Of Products': 2}},
+    'onboarding': {'label': "Accompagnement nouveaux clients", 'changes': {'Tenure': 2}},
+    'activation_produit': {'label': "Activation + second produit",
+                           'changes': {'Is Active Member': 1, 'Num Of Products': 2}},
+}
+MIN_PROBABILITY = RISK_BANDS[0]
+
+
+# ==================== SCORING DES INTERVENTIONS ====================
+def intervention_costs(raw, interventions=INTERVENTIONS):
+    """Coût (n_clients, n_interventions) ; NaN si l'intervention ne change rien"""
+    costs = np.zeros((len(raw), len(interventions)))
+    for k, intervention in enumerate(interventions.values()):
+        for column, target in intervention['changes'].items():
+            costs[:, k] += np.maximum(target - raw[column].to_numpy(dtype=np.float64), 0) * LEVERS[column]['unit_cost']
+    costs[costs == 0] = np.nan
+    return costs
+
+
+def score_interventions(raw, bundle, base=None, interventions=INTERVENTIONS):
+    """Probabilités calibrées (actuelle, sous chaque intervention) : un seul predict pour tout le chunk"""
+    model, metadata, scaler = bundle
+    costs = intervention_costs(raw, interventions)
+    rows, options = np.nonzero(~np.isnan(costs))
+
+    # Variantes applicables (et lignes de base si elles ne sont pas déjà scorées) empilées
+    n_base = 0 if base is not None else len(raw)
+    variants = raw.iloc[np.concatenate([np.arange(n_base), rows])].reset_index(drop=True)
+    for k, intervention in enumerate(interventions.values()):
+        selected = n_base + np.flatnonzero(options == k)
+        for column, target in intervention['changes'].items():
+            position = variants.columns.get_loc(column)
+            variants.iloc[selected, position] = np.maximum(variants.iloc[selected, position], target)
+
+    probability = calibrate(predict_scaled(transform(variants, scaler), model), metadata)
+    if base is None:
+        base = probability[:n_base]
+    scored = np.full(costs.shape, np.nan)
+    scored[rows, options] = probability[n_base:]
+    return base, scored, costs
+
+
+# ==================== FRONTIÈRE EFFICACE ====================
+def efficient_frontier(gains, costs):
+    """Incréments (client, option, coût, gain) de l'enveloppe concave de chaque client, rendement décroissant"""
+    n, n_options = gains.shape
+    valid = ~np.isnan(costs) & (gains > 0)
+    gains = np.where(valid, gains, 0.0)
+    costs = np.where(valid, costs, np.inf)
+    rows = np.arange(n)
+    current_cost, current_gain = np.zeros(n), np.zeros(n)
+
+    segments = []
+    for _ in range(n_options):
+        # Option suivante : meilleur rendement marginal parmi les options plus chères et plus efficaces
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = (gains - current_gain[:, None]) / (costs - current_cost[:, None])
+        ratio[~((costs > current_cost[:, None]) & (gains > current_gain[:, None]))] = -np.inf
+        best = ratio.argmax(axis=1)
+        active = np.isfinite(ratio[rows, best])
+        if not active.any():
+            break
+        active_rows, option = rows[active], best[active]
+        segments.append((active_rows, option,
+                         costs[active_rows, option] - current_cost[active],
+                         gains[active_rows, option] - current_gain[active]))
+        current_cost[active] = costs[active_rows, option]
+        current_gain[active] = gains[active_rows, option]
+
+    if not segments:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int8), empty, empty
+    customer, option, cost, gain = (np.concatenate(parts) for parts in zip(*segments))
+    # Regroupement par client, dans l'ordre de la frontière (tri stable)
+    order = np.argsort(customer, kind='stable')
+    return customer[order], option[order].astype(np.int8), cost[order], gain[order]
+
+
+# ==================== ALLOCATION DU BUDGET ====================
+def allocate(customer, cost, gain, budget):
+    """Masque des incréments retenus : glouton par gain par euro sous contrainte de budget
+
+    Les incréments d'un même client sont contigus et à rendement décroissant :
+    le tri global les place déjà après leurs prédécesseurs. Quand le prochain
+    incrément ne tient plus dans le budget, une nouvelle passe reprend avec les
+    incréments restants qui tiennent (et dont les prédécesseurs sont pris).
+    """
+    ratio = gain / cost
+    order = np.lexsort((np.arange(ratio.size), -ratio))
+    taken = np.zeros(ratio.size, dtype=bool)
+    first = np.r_[True, customer[1:] != customer[:-1]] if customer.size else np.empty(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(first, np.arange(customer.size), 0))
+    remaining = float(budget)
+
+    while True:
+        # Incrément viable : ni lui ni un prédécesseur non pris ne dépasse le budget restant
+        blocked = np.cumsum(~taken & (cost > remaining))
+        blocked_before = np.where(first, 0, np.r_[0, blocked[:-1]] - np.r_[0, blocked][group_start])
+        viable = ~taken & (cost <= remaining) & (blocked_before == 0)
+        candidates = order[viable[order]]
+        if candidates.size == 0:
+            break
+        spent = np.cumsum(cost[candidates])
+        selected = candidates[spent <= remaining]
+        taken[selected] = True
+        remaining -= cost[selected].sum()
+    return taken
+
+
+# ==================== PLAN DE RÉTENTION ====================
+def optimize_retention(raw_path, budget, chunksize=100_000, bundle=None, min_probability=MIN_PROBABILITY,
+                       interventions=INTERVENTIONS, quarantine_path=None):
+    """Plan de rétention du portefeuille : une intervention (au plus) par client, budget total respecté"""
+    bundle = bundle or load_current()
+    names = list(interventions)
+    ids, base, parts = [], [], []
+    offset = 0
+    n_rows = 0
+    start = time.perf_counter()
+
+    quarantine = Quarantine(quarantine_path)
+    for chunk in pd.read_csv(raw_path, usecols=[ID_COLUMN] + RAW_COLUMNS, chunksize=chunksize):
+        n_rows += len(chunk)
+        chunk, rejected, reasons = split_valid(chunk)
+        quarantine.add(rejected, reasons)
+        if chunk.empty:
+            continue
+        probability = calibrate(predict_scaled(transform(chunk, bundle.scaler), bundle.model), bundle.metadata)
+        at_risk = probability >= min_probability
+        if not at_risk.any():
+            continue
+        chunk = chunk[at_risk]
+        current, scored, costs = score_interventions(chunk, bundle, probability[at_risk], interventions)
+        customer, option, cost, gain = efficient_frontier(current[:, None] - scored, costs)
+        ids.append(chunk[ID_COLUMN].to_numpy())
+        base.append(current)
+        parts.append((customer + offset, option, cost, gain))
+        offset += len(chunk)
+    scoring_s = time.perf_counter() - start
+
+    ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+    base = np.concatenate(base) if base else np.empty(0)
+    customer, option, cost, gain = (np.concatenate(arrays) for arrays in zip(*parts)) if parts else \
+        (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int8), np.empty(0), np.empty(0))
+
+    start = time.perf_counter()
+    taken = allocate(customer, cost, gain, budget)
+    allocation_s = time.perf_counter() - start
+
+    # Dernier incrément pris de chaque client = intervention retenue ; coût et gain cumulés
+    treated, last = np.unique(customer[taken][::-1], return_index=True)
+    last = np.flatnonzero(taken)[::-1][last]
+    total_cost = np.bincount(customer[taken], weights=cost[taken], minlength=ids.size)[treated]
+    total_gain = np.bincount(customer[taken], weights=gain[taken], minlength=ids.size)[treated]
+
+    plan = pd.DataFrame({
+        ID_COLUMN: ids[treated],
+        'Intervention': pd.Categorical.from_codes(option[last], categories=names),
+        'Cout': total_cost.astype(np.float32),
+        'Probabilite_Avant': base[treated].astype(np.float32),
+        'Probabilite_Apres': (base[treated] - total_gain).astype(np.float32),
+        'Gain_Par_Euro': (total_gain / total_cost).astype(np.float32),
+    }).sort_values('Gain_Par_Euro', ascending=False, ignore_index=True)
+
+    return plan, {
+        'n_rows': n_rows,
+        'n_at_risk': int(ids.size),
+        'n_treated': len(plan),
+        'budget': float(budget),
+        'spent': float(total_cost.sum()),
+        'expected_churn_avoided': float(total_gain.sum()),
+        'scoring_s': scoring_s,
+        'allocation_s': allocation_s,
+        'model_version': bundle.version,
+        **quarantine.report(),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Allocation d'un budget de rétention sur le portefeuille")
+    parser.add_argument('raw', help="CSV client à traiter")
+    parser.add_argument('--budget', type=float, required=True, help="Budget total (€)")
+    parser.add_argument('--output', default=None, help="Plan de rétention (.parquet ou .csv)")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--min-probability', type=float, default=MIN_PROBABILITY,
+                        help="Probabilité calibrée minimale pour être ciblé")
+    parser.add_argument('--quarantine', default=None, help="CSV des lignes rejetées par le schéma (horodaté par exécution)")
+    args = parser.parse_args()
+
+    plan, report = optimize_retention(args.raw, args.budget, args.chunksize, min_probability=args.min_probability,
+                                      quarantine_path=args.quarantine)
+    if report['n_quarantined']:
+        print(f"{report['n_quarantined']:,} lignes invalides écartées : {report['reasons']}"
+              f"{' -> ' + report['quarantine_path'] if report['quarantine_path'] else ''}")
+    print(f"{report['n_rows']:,} clients, {report['n_at_risk']:,} à risque - scoring {report['scoring_s']:.2f}s, "
+          f"allocation {report['allocation_s']:.2f}s (modèle {report['model_version']})")
+    print(f"Budget {report['budget']:,.0f} € : {report['spent']:,.0f} € dépensés, {report['n_treated']:,} clients "
+          f"traités, {report['expected_churn_avoided']:,.1f} départs évités (espérance)")
+    print(plan.groupby('Intervention', observed=False).agg(
+        clients=('Cout', 'size'), cout=('Cout', 'sum'), gain_moyen=('Gain_Par_Euro', 'mean')).to_string())
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        if args.output.endswith('.parquet'):
+            plan.to_parquet(args.output, index=False)
+        else:
+            plan.to_csv(args.output, index=False)
+        print(f"Plan : {args.output}")
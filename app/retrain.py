@@ -0,0 +1,259 @@
+"""
+Réentraînement incrémental - poursuit le boosting du modèle servi sur les
+clients du mois (init_model LightGBM) au lieu de refaire tout le notebook 02.
+
+- Scaler : moyenne / variance mises à jour en continu avec les nouvelles
+  lignes (StandardScaler.partial_fit). Les seuils des arbres existants sont
+  réexprimés dans le nouvel espace normalisé : leurs décisions ne changent pas.
+- Arbres : quelques itérations de boosting ajoutées sur les nouvelles lignes
+  (normalisées puis rééquilibrées par SMOTE comme à l'entraînement complet),
+  avec un pas d'apprentissage réduit.
+- Seuil et calibration : re-réglés (F1 maximal, calibration de même méthode)
+  sur une part réservée des nouvelles lignes ; les performances des
+  métadonnées sont mesurées sur une autre part réservée.
+- Publication : le feature store, s'il existe, est rescoré avec le nouveau
+  modèle et son scaler.
+
+L'estimateur publié décrit les arbres qu'il contient ; la recette
+d'entraînement d'origine (nombre d'arbres, pas) reste dans
+metadata['recipe'], utilisée par ModelBundle.estimator() pour tout
+réentraînement (cv, calibration, ensemble, réentraînement complet).
+
+Usage :
+    python app/retrain.py nouveaux_clients.csv [--trees 20] [--output models/staging] [--publish]
+    python app/retrain.py --simulate [--new-share 0.2]   # comparaison avec un réentraînement complet
+"""
+
+import argparse
+import copy
+import os
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from cv import tune_threshold
+from features import TARGET, engineer_features
+from pipeline import MODELS_DIR, RANDOM_STATE, compute_metrics, split_features
+from registry import ARTIFACTS, ModelBundle, load_current, publish
+from scoring import predict_scaled
+
+STAGING_DIR = os.path.join(MODELS_DIR, 'staging')
+N_TREES = 20
+VALID_SHARE = 0.2
+# Part réservée coupée en deux : réglage du seuil / mesure des performances
+HOLDOUT_SHARE = 0.5
+# Pas réduit et feuilles plus peuplées : un mois de données suffit à sur-apprendre au pas de 0.1
+LEARNING_RATE = 0.02
+MIN_CHILD_SAMPLES = 50
+# Paramètres modifiés par le réentraînement incrémental (recette d'origine conservée dans les métadonnées)
+RECIPE_PARAMS = ('n_estimators', 'learning_rate', 'min_child_samples')
+
+
+# ==================== SCALER ET ARBRES ====================
+def update_scaler(scaler, X_new):
+    """Copie du scaler dont moyenne et variance intègrent les nouvelles lignes"""
+    scaler = copy.deepcopy(scaler)
+    return scaler.partial_fit(X_new)
+
+
+def rescale_booster(booster, old_scaler, new_scaler):
+    """Booster dont les seuils sont réexprimés dans l'espace du nouveau scaler (mêmes décisions)"""
+    from lightgbm import Booster
+
+    # x_brut = x_ancien x scale_ancien + mean_ancien = x_nouveau x scale_nouveau + mean_nouveau
+    factor = old_scaler.scale_ / new_scaler.scale_
+    shift = (old_scaler.mean_ - new_scaler.mean_) / new_scaler.scale_
+
+    lines = []
+    split_feature = None
+    for line in booster.model_to_string().splitlines():
+        if line.startswith('tree_sizes='):
+            # Tailles en octets de chaque arbre : invalides une fois les seuils réécrits
+            continue
+        if line.startswith('split_feature='):
+            split_feature = np.array(line.split('=', 1)[1].split(), dtype=np.int64)
+        elif line.startswith('threshold='):
+            thresholds = np.array(line.split('=', 1)[1].split(), dtype=np.float64)
+            thresholds = thresholds * factor[split_feature] + shift[split_feature]
+            line = 'threshold=' + ' '.join(repr(float(value)) for value in thresholds)
+        elif line.startswith('feature_infos='):
+            infos = []
+            for j, info in enumerate(line.split('=', 1)[1].split()):
+                if info.startswith('['):
+                    low, high = (float(value) * factor[j] + shift[j] for value in info[1:-1].split(':'))
+                    info = f'[{low!r}:{high!r}]'
+                infos.append(info)
+            line = 'feature_infos=' + ' '.join(infos)
+        lines.append(line)
+    return Booster(model_str='\n'.join(lines) + '\n')
+
+
+# ==================== ENTRAÎNEMENT ====================
+def reserve(X, y, valid_share=VALID_SHARE):
+    """(X_fit, X_tune, X_holdout, y_fit, y_tune, y_holdout) : entraînement, réglage du seuil, mesure"""
+    from sklearn.model_selection import train_test_split
+
+    X_fit, X_valid, y_fit, y_valid = train_test_split(
+        X, y, test_size=valid_share, random_state=RANDOM_STATE, stratify=y)
+    X_tune, X_holdout, y_tune, y_holdout = train_test_split(
+        X_valid, y_valid, test_size=HOLDOUT_SHARE, random_state=RANDOM_STATE, stratify=y_valid)
+    return X_fit, X_tune, X_holdout, y_fit, y_tune, y_holdout
+
+
+def _balanced(X_scaled, y):
+    from imblearn.over_sampling import SMOTE
+
+    return SMOTE(random_state=RANDOM_STATE).fit_resample(X_scaled, y)
+
+
+def continue_training(bundle, X_new, y_new, n_trees=N_TREES, learning_rate=LEARNING_RATE, valid_share=VALID_SHARE):
+    """(modèle, scaler, métadonnées) : boosting poursuivi sur X_new (features non normalisées)"""
+    from sklearn.base import clone
+
+    from calibration import calibration_from_scores
+
+    X_fit, X_tune, X_holdout, y_fit, y_tune, y_holdout = reserve(X_new, y_new, valid_share)
+
+    # Lignes d'entraînement seulement : les parts réservées restent hors échantillon
+    scaler = update_scaler(bundle.scaler, X_fit)
+    init_model = rescale_booster(bundle.model.booster_, bundle.scaler, scaler)
+    X_balanced, y_balanced = _balanced(scaler.transform(X_fit), y_fit)
+    model = clone(bundle.model).set_params(n_estimators=n_trees, learning_rate=learning_rate,
+                                           min_child_samples=MIN_CHILD_SAMPLES)
+    model.fit(X_balanced, y_balanced, init_model=init_model)
+    model.set_params(n_estimators=model.booster_.num_trees())
+    recipe = bundle.metadata.get('recipe') or {key: bundle.model.get_params()[key] for key in RECIPE_PARAMS}
+
+    tune_scores = predict_scaled(scaler.transform(X_tune), model)
+    threshold, _ = tune_threshold(y_tune, tune_scores)
+    calibration = bundle.metadata.get('calibration')
+    if calibration is not None:
+        # Les nouveaux arbres déplacent les scores bruts : l'ancienne correspondance ne vaut plus
+        calibration = calibration_from_scores(tune_scores, y_tune, calibration['method'])
+    # Performances sur des lignes qui n'ont servi ni à l'entraînement ni au réglage du seuil
+    y_proba = predict_scaled(scaler.transform(X_holdout), model)
+    metadata = {
+        **bundle.metadata,
+        'optimal_threshold': threshold,
+        'calibration': calibration,
+        'recipe': recipe,
+        'hyperparameters': {**bundle.metadata['hyperparameters'], 'n_estimators': model.booster_.num_trees()},
+        'performance': compute_metrics(y_holdout, y_proba),
+        'performance_optimal_threshold': compute_metrics(y_holdout, y_proba, threshold),
+        'training_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'n_train_samples': int(bundle.metadata.get('n_train_samples', 0)) + len(y_fit),
+        'incremental': {
+            'base_version': bundle.version,
+            'new_samples': len(y_new),
+            'trees_added': n_trees,
+            'learning_rate': learning_rate,
+            'threshold_samples': len(y_tune),
+            'holdout_samples': len(y_holdout),
+        },
+    }
+    metadata.pop('version', None)
+    return model, scaler, metadata
+
+
+def full_retrain(bundle, X, y):
+    """Réentraînement complet (scaler, SMOTE, tous les arbres) avec la recette du modèle servi"""
+    from sklearn.preprocessing import StandardScaler
+
+    scaler = StandardScaler().fit(X)
+    X_balanced, y_balanced = _balanced(scaler.transform(X), y)
+    model = bundle.estimator().fit(X_balanced, y_balanced)
+    return model, scaler
+
+
+def save_artifacts(model, scaler, metadata, output_dir=STAGING_DIR):
+    """Écrit le triplet au format de models/ (publiable avec registry.publish)"""
+    os.makedirs(output_dir, exist_ok=True)
+    for name, artifact in zip(ARTIFACTS, (model, scaler, metadata)):
+        joblib.dump(artifact, os.path.join(output_dir, name))
+    return output_dir
+
+
+# ==================== COMPARAISON ====================
+def simulate(bundle=None, new_share=0.2, n_trees=N_TREES, learning_rate=LEARNING_RATE):
+    """Modèle « du mois dernier » sur une partie du train, puis incrémental vs complet ; évaluation sur le test"""
+    from sklearn.model_selection import train_test_split
+
+    bundle = bundle or load_current()
+    X_train, X_test, y_train, y_test = split_features()
+    X_old, X_new, y_old, y_new = train_test_split(
+        X_train, y_train, test_size=new_share, random_state=RANDOM_STATE, stratify=y_train)
+    # Les lignes réservées (seuil, mesure) sont exclues des deux entraînements
+    X_new_fit, X_tune, _, y_new_fit, y_tune, _ = reserve(X_new, y_new)
+
+    model, scaler = full_retrain(bundle, X_old, y_old)
+    base = ModelBundle('base', model, {**bundle.metadata, 'n_train_samples': len(y_old)}, scaler)
+
+    start = time.perf_counter()
+    model, scaler, metadata = continue_training(base, X_new, y_new, n_trees, learning_rate)
+    incremental_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    full_model, full_scaler = full_retrain(bundle, np.vstack([X_old, X_new_fit]), np.r_[y_old, y_new_fit])
+    full_threshold, _ = tune_threshold(y_tune, predict_scaled(full_scaler.transform(X_tune), full_model))
+    full_s = time.perf_counter() - start
+
+    rows = []
+    for name, (m, s, threshold, elapsed) in {
+        'base (mois précédent)': (base.model, base.scaler, None, float('nan')),
+        'incrémental': (model, scaler, metadata['optimal_threshold'], incremental_s),
+        'complet': (full_model, full_scaler, full_threshold, full_s),
+    }.items():
+        threshold = bundle.metadata['optimal_threshold'] if threshold is None else threshold
+        y_proba = predict_scaled(s.transform(X_test), m)
+        metrics = compute_metrics(y_test, y_proba, threshold)
+        rows.append({'modèle': name, 'arbres': m.booster_.num_trees(), 'seuil': threshold,
+                     'roc_auc': metrics['roc_auc'], 'f1_score': metrics['f1_score'], 'durée_s': elapsed})
+    return pd.DataFrame(rows), {'old_rows': len(y_old), 'new_rows': len(y_new)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Réentraînement incrémental du modèle servi")
+    parser.add_argument('raw', nargs='?', help="CSV des nouveaux clients (avec la colonne Churn)")
+    parser.add_argument('--trees', type=int, default=N_TREES, help="Arbres ajoutés")
+    parser.add_argument('--learning-rate', type=float, default=LEARNING_RATE, help="Pas des arbres ajoutés")
+    parser.add_argument('--output', default=STAGING_DIR, help="Dossier des artefacts produits")
+    parser.add_argument('--publish', action='store_true', help="Publie et active la nouvelle version du registre")
+    parser.add_argument('--simulate', action='store_true', help="Compare incrémental et complet sur le split de test")
+    parser.add_argument('--new-share', type=float, default=0.2, help="Part du train jouant les nouveaux clients")
+    args = parser.parse_args()
+
+    if args.simulate:
+        table, sizes = simulate(new_share=args.new_share, n_trees=args.trees, learning_rate=args.learning_rate)
+        print(f"Base : {sizes['old_rows']:,} clients, nouveaux : {sizes['new_rows']:,} clients")
+        print(table.to_string(index=False, float_format=lambda x: f"{x:.4f}"))
+        incremental_s, full_s = table['durée_s'].iloc[1:]
+        print(f"Temps gagné : {full_s - incremental_s:.2f}s ({full_s / incremental_s:.1f}x plus rapide)")
+    else:
+        if not args.raw:
+            parser.error("CSV des nouveaux clients requis (ou --simulate)")
+        from schema import split_valid
+
+        bundle = load_current()
+        raw, rejected, _ = split_valid(pd.read_csv(args.raw))
+        if len(rejected):
+            print(f"{len(rejected):,} lignes invalides ignorées")
+        start = time.perf_counter()
+        model, scaler, metadata = continue_training(
+            bundle, engineer_features(raw).to_numpy(dtype=np.float64), raw[TARGET].to_numpy(dtype=np.int8),
+            args.trees, args.learning_rate)
+        print(f"{len(raw):,} nouveaux clients, +{args.trees} arbres en {time.perf_counter() - start:.2f}s - "
+              f"seuil {bundle.metadata['optimal_threshold']:.4f} -> {metadata['optimal_threshold']:.4f}")
+        save_artifacts(model, scaler, metadata, args.output)
+        print(f"Artefacts : {args.output}")
+        if args.publish:
+            print(f"Version publiée et activée : {publish(args.output)}")
+            # Les features du store sont normalisées par l'ancien scaler : rescoring complet (version changée)
+            from feature_store import STORE_PATH
+            from incremental import rescore_incremental
+
+            if os.path.exists(STORE_PATH):
+                report = rescore_incremental(bundle=load_current())
+                print(f"Feature store rescoré : {report['n_rescored']:,} clients")
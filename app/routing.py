@@ -0,0 +1,281 @@
+"""
+Routage champion / challenger autour de l'étape de prédiction.
+
+- mode 'shadow' : le champion répond, le challenger score les mêmes lignes
+  en tâche de fond, par lots (hors chemin critique) ;
+- mode 'ab' : une fraction du trafic est servie par le challenger, l'autre
+  modèle score les mêmes lignes en tâche de fond.
+
+Les deux probabilités sont écrites dans un journal bufferisé, analysé hors
+ligne par compare_log(). Latences journalisées : par requête (ms_*, chemin
+critique, modèle servi) et par ligne d'un même lot scoré par les deux
+modèles (ms_*_batch, hors chemin critique) ; seules les latences d'un même
+type sont comparées.
+
+Configuration (variables d'environnement) :
+    CHALLENGER_VERSION   version du registre à évaluer (désactivé si absente)
+    CHALLENGER_MODE      shadow (défaut) ou ab
+    CHALLENGER_FRACTION  part du trafic servie par le challenger en mode ab (défaut 0.1)
+
+Usage : python app/routing.py compare [data/processed/shadow_log*.csv]
+"""
+
+import argparse
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from registry import load_bundle
+from scoring import ROOT_DIR, predict_bundle
+
+SHADOW_LOG_PATH = os.path.join(ROOT_DIR, 'data', 'processed', 'shadow_log.csv')
+
+
+def _timed_proba(bundle, raw):
+    """Probabilités + latence (ms) pour un bundle"""
+    start = time.perf_counter()
+    probability = predict_bundle(bundle, raw)
+    return probability, (time.perf_counter() - start) * 1000
+
+
+def challenger_from_env(registry_dir):
+    """Bundle désigné par CHALLENGER_VERSION, ou None"""
+    version = os.environ.get('CHALLENGER_VERSION')
+    return load_bundle(version, registry_dir) if version else None
+
+
+# ==================== JOURNAL ====================
+class ShadowLog:
+    """Journal des prédictions champion/challenger, écrit en CSV par lots"""
+
+    def __init__(self, path=SHADOW_LOG_PATH, batch_size=500):
+        self.path = path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = []
+        self._n_pending = 0
+
+    def append(self, records):
+        """Ajoute un DataFrame d'enregistrements ; retourne True si un lot est prêt"""
+        with self._lock:
+            self._pending.append(records)
+            self._n_pending += len(records)
+            return self._n_pending >= self.batch_size
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._n_pending = self._pending, [], 0
+        if not pending:
+            return
+        batch = pd.concat(pending, ignore_index=True)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            # Journal écrit avec d'autres colonnes (ancienne version) : mis de côté plutôt que mélangé
+            with open(self.path) as f:
+                header = f.readline().rstrip('\n')
+            if header != ','.join(batch.columns):
+                os.replace(self.path, self.path.replace('.csv', f"-{datetime.now():%Y%m%d%H%M%S}.csv"))
+        batch.to_csv(self.path, mode='a', index=False, header=not os.path.exists(self.path))
+
+
+# ==================== ROUTEUR ====================
+class Router:
+    """Envoie chaque requête au champion et/ou au challenger selon le mode"""
+
+    def __init__(self, registry, challenger=None, mode='shadow', fraction=0.1,
+                 log=None, max_pending=10_000, batch_size=64, max_delay=0.5):
+        if mode not in ('shadow', 'ab'):
+            raise ValueError(f"Mode de routage inconnu : {mode}")
+        self.registry = registry
+        self.challenger = challenger
+        self.mode = mode
+        self.fraction = fraction
+        self.log = log or ShadowLog()
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.dropped = 0
+
+        # File bornée consommée par un thread de fond : scoring shadow par lots et
+        # écritures disque hors du thread de requête
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        if challenger is not None:
+            self._thread = threading.Thread(target=self._run, name='shadow-scoring', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    @classmethod
+    def from_env(cls, registry, challenger=None, log=None):
+        """Routeur configuré par les variables CHALLENGER_* (challenger déjà chargé possible)"""
+        if challenger is None:
+            challenger = challenger_from_env(registry.registry_dir)
+        return cls(
+            registry, challenger,
+            mode=os.environ.get('CHALLENGER_MODE', 'shadow'),
+            fraction=float(os.environ.get('CHALLENGER_FRACTION', 0.1)),
+            log=log,
+        )
+
+    def score(self, raw, key=None):
+        """Retourne (bundle ayant servi, probabilités)"""
+        champion = self.registry.current()
+        if self.challenger is None:
+            return champion, predict_bundle(champion, raw)
+
+        # Le modèle qui n'a pas servi score les mêmes lignes plus tard, par lots : journal toujours apparié
+        if self.mode == 'ab' and self._to_challenger(key):
+            probability, ms = _timed_proba(self.challenger, raw)
+            self._enqueue({'key': key, 'raw': raw, 'champion': champion, 'served': self.challenger.version,
+                           'p_challenger': probability, 'ms_challenger': ms})
+            return self.challenger, probability
+
+        probability, ms = _timed_proba(champion, raw)
+        self._enqueue({'key': key, 'raw': raw, 'champion': champion, 'served': champion.version,
+                       'p_champion': probability, 'ms_champion': ms})
+        return champion, probability
+
+    def close(self):
+        """Vide la file et le journal (appelé à l'arrêt du processus)"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self.log.flush()
+
+    # ---------- Interne ----------
+    def _to_challenger(self, key):
+        # Affectation stable par clé (ex : CustomerId), aléatoire sinon
+        if key is None:
+            return random.random() < self.fraction
+        return zlib.crc32(str(key).encode()) / 2**32 < self.fraction
+
+    def _enqueue(self, item):
+        # Au-delà de max_pending, l'enregistrement est abandonné plutôt que de ralentir le service
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            if item is None:
+                break
+            items = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(items) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
+            self._process(items)
+
+    def _process(self, items):
+        """Score en un lot le modèle qui n'a pas servi (l'autre est re-chronométré sur le même lot) puis journalise"""
+        # Lots homogènes : même champion, même probabilité à compléter
+        groups = {}
+        for item in items:
+            missing = 'p_challenger' if 'p_champion' in item else 'p_champion'
+            groups.setdefault((item['champion'].version, missing), []).append(item)
+
+        for (_, missing), group in groups.items():
+            raw = pd.concat([item['raw'] for item in group], ignore_index=True)
+            # Les deux modèles sur les mêmes lignes : seules latences comparables entre eux
+            p_champion, ms_champion = _timed_proba(group[-1]['champion'], raw)
+            p_challenger, ms_challenger = _timed_proba(self.challenger, raw)
+            probability = p_challenger if missing == 'p_challenger' else p_champion
+            offset = 0
+            for item in group:
+                n = len(item['raw'])
+                item[missing] = probability[offset:offset + n]
+                item['ms_champion_batch'] = ms_champion / len(raw)
+                item['ms_challenger_batch'] = ms_challenger / len(raw)
+                offset += n
+
+        if self.log.append(pd.concat([self._records(item) for item in items], ignore_index=True)):
+            self.log.flush()
+
+    def _records(self, item):
+        n = len(item['raw'])
+        champion = item['champion']
+        return pd.DataFrame({
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+            'key': item['key'],
+            'mode': self.mode,
+            'served': item['served'],
+            'champion_version': champion.version,
+            'challenger_version': self.challenger.version,
+            'p_champion': item['p_champion'],
+            'p_challenger': item['p_challenger'],
+            # Latence de la requête (modèle servi seulement) répartie sur ses lignes
+            'ms_champion': item.get('ms_champion', np.nan) / n,
+            'ms_challenger': item.get('ms_challenger', np.nan) / n,
+            # Latence par ligne du lot de fond, mesurée pour les deux modèles
+            'ms_champion_batch': item['ms_champion_batch'],
+            'ms_challenger_batch': item['ms_challenger_batch'],
+            'threshold_champion': float(champion.metadata['optimal_threshold']),
+            'threshold_challenger': float(self.challenger.metadata['optimal_threshold']),
+        }, index=range(n))
+
+
+# ==================== COMPARAISON HORS LIGNE ====================
+def compare_log(paths=(SHADOW_LOG_PATH,)):
+    """Accord des décisions, bascules de seuil et latence par modèle (par requête et par lot séparément)"""
+    paths = [paths] if isinstance(paths, str) else paths
+    log = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    both = log.dropna(subset=['p_champion', 'p_challenger'])
+
+    decision_champion = both['p_champion'] >= both['threshold_champion']
+    decision_challenger = both['p_challenger'] >= both['threshold_challenger']
+
+    report = {
+        'n_records': len(log),
+        'n_paired': len(both),
+        'agreement': float((decision_champion == decision_challenger).mean()) if len(both) else float('nan'),
+        'flips_to_churn': int((~decision_champion & decision_challenger).sum()),
+        'flips_to_retention': int((decision_champion & ~decision_challenger).sum()),
+        'mean_abs_delta': float((both['p_champion'] - both['p_challenger']).abs().mean()),
+        'served': log['served'].value_counts().to_dict(),
+    }
+
+    latency = {}
+    for kind, suffix in (('requête', ''), ('lot', '_batch')):
+        for model in ('champion', 'challenger'):
+            values = log.get(f'ms_{model}{suffix}', pd.Series(dtype=float)).dropna()
+            if len(values):
+                latency.setdefault(kind, {})[model] = {'p50_ms': float(values.quantile(0.5)),
+                                                      'p95_ms': float(values.quantile(0.95))}
+    report['latency'] = latency
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Analyse du journal champion/challenger")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmd = sub.add_parser('compare')
+    cmd.add_argument('paths', nargs='*', default=[SHADOW_LOG_PATH], help="Journaux (un par worker de serve.py)")
+    args = parser.parse_args()
+
+    report = compare_log(args.paths)
+    print(f"Enregistrements        : {report['n_records']:,} (dont {report['n_paired']:,} appariés)")
+    print(f"Accord des décisions   : {report['agreement']:.2%}")
+    print(f"Bascules -> churn      : {report['flips_to_churn']:,}")
+    print(f"Bascules -> rétention  : {report['flips_to_retention']:,}")
+    print(f"Écart moyen |p1 - p2|  : {report['mean_abs_delta']:.4f}")
+    print(f"Répartition du service : {report['served']}")
+    for kind, models in report['latency'].items():
+        for model, stats in models.items():
+            print(f"Latence {model:10} ({kind:7}) : p50 {stats['p50_ms']:.3f} ms/ligne, "
+                  f"p95 {stats['p95_ms']:.3f} ms/ligne")
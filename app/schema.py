@@ -0,0 +1,241 @@
+"""
+Schéma des entrées en masse - contrôle déclaratif des colonnes de
+data/raw/bank_churn.csv, appliqué à des chunks entiers par masques vectorisés.
+
+Chaque ligne reçoit un masque de bits (un bit par couple colonne / motif) :
+0 = ligne valide. Les lignes rejetées partent en quarantaine avec leurs
+codes motif (`Age:hors_bornes`, `Geography:valeur_inconnue`, ...) et le
+reste du chunk est scoré normalement. Les bornes reprennent celles des
+widgets de l'application.
+
+Chaque exécution écrit son propre fichier de quarantaine, horodaté
+(exports/quarantine-AAAAMMJJ-HHMMSS.csv) : les rejets des exécutions
+précédentes sont conservés.
+
+Usage : python app/schema.py data/raw/bank_churn.csv [--quarantine exports/quarantine.csv]
+        python app/schema.py /tmp/clients.csv --benchmark
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from features import ID_COLUMN, RAW_COLUMNS
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+QUARANTINE_PATH = os.path.join(os.path.dirname(APP_DIR), 'exports', 'quarantine.csv')
+REASON_COLUMN = 'Motifs_Rejet'
+
+# kind : int / float / category ; bornes incluses ; values = valeurs autorisées
+SCHEMA = {
+    ID_COLUMN: {'kind': 'int', 'min': 0, 'required': False},
+    'CreditScore': {'kind': 'int', 'min': 350, 'max': 850},
+    'Geography': {'kind': 'category', 'values': ['France', 'Germany', 'Spain']},
+    'Gender': {'kind': 'category', 'values': ['Female', 'Male']},
+    'Age': {'kind': 'int', 'min': 18, 'max': 100},
+    'Tenure': {'kind': 'int', 'min': 0, 'max': 10},
+    'Balance': {'kind': 'float', 'min': 0, 'max': 300_000},
+    'Num Of Products': {'kind': 'int', 'min': 1, 'max': 4},
+    'Has Credit Card': {'kind': 'int', 'values': [0, 1]},
+    'Is Active Member': {'kind': 'int', 'values': [0, 1]},
+    'Estimated Salary': {'kind': 'float', 'min': 0, 'max': 200_000},
+}
+REASONS = ['manquant', 'type', 'hors_bornes', 'valeur_inconnue']
+
+
+def reason_codes(schema=SCHEMA):
+    """Codes motif dans l'ordre des bits"""
+    return [f"{column}:{reason}" for column in schema for reason in REASONS]
+
+
+# ==================== VALIDATION ====================
+def _check_column(series, spec):
+    """Masques (manquant, type, hors_bornes, valeur_inconnue) et valeurs numériques converties"""
+    if spec['kind'] == 'category':
+        # Comparaisons directes (isin / isna sur des objets sont plus lents) ; isna sur les seules lignes rejetées
+        values = series.to_numpy()
+        known = np.zeros(values.size, dtype=bool)
+        for value in spec['values']:
+            known |= values == value
+        unknown = ~known
+        missing = np.zeros(values.size, dtype=bool)
+        missing[unknown] = pd.isna(values[unknown])
+        return (missing, np.zeros_like(missing), np.zeros_like(missing), unknown & ~missing), None
+
+    if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+        values = series.to_numpy(dtype=np.float64)
+        wrong_type = np.zeros(values.size, dtype=bool)
+        converted = None
+    else:
+        # Colonne lue en objet (texte parasite) : conversion, les valeurs non numériques sont des erreurs de type
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64)
+        wrong_type = np.isnan(values) & series.notna().to_numpy()
+        converted = values
+
+    missing = np.isnan(values) & ~wrong_type
+    if spec['kind'] == 'int':
+        wrong_type |= ~missing & ~wrong_type & (values != np.round(values))
+        if converted is None and not pd.api.types.is_integer_dtype(series.dtype):
+            converted = values
+    with np.errstate(invalid='ignore'):
+        out_of_range = np.zeros(values.size, dtype=bool)
+        if 'min' in spec:
+            out_of_range |= values < spec['min']
+        if 'max' in spec:
+            out_of_range |= values > spec['max']
+    unknown = ~np.isin(values, spec['values']) & ~missing & ~wrong_type if 'values' in spec \
+        else np.zeros(values.size, dtype=bool)
+    return (missing, wrong_type, out_of_range & ~wrong_type, unknown), converted
+
+
+def validate(raw, schema=SCHEMA):
+    """(motifs de rejet par ligne en masque de bits, colonnes numériques converties)"""
+    missing_columns = [column for column, spec in schema.items()
+                       if spec.get('required', True) and column not in raw.columns]
+    if missing_columns:
+        raise ValueError(f"Colonnes manquantes : {missing_columns}")
+
+    reasons = np.zeros(len(raw), dtype=np.int64)
+    converted = {}
+    for i, (column, spec) in enumerate(schema.items()):
+        if column not in raw.columns:
+            continue
+        masks, values = _check_column(raw[column], spec)
+        for j, mask in enumerate(masks):
+            reasons |= mask.astype(np.int64) << (i * len(REASONS) + j)
+        if values is not None:
+            converted[column] = values
+    return reasons, converted
+
+
+def reason_labels(reasons, schema=SCHEMA):
+    """Codes motif lisibles (séparés par '|'), calculés une fois par combinaison distincte"""
+    codes = reason_codes(schema)
+    unique, inverse = np.unique(reasons, return_inverse=True)
+    labels = np.array(['|'.join(code for bit, code in enumerate(codes) if mask >> bit & 1) for mask in unique.tolist()],
+                      dtype=object)
+    return labels[inverse]
+
+
+def reason_counts(reasons, schema=SCHEMA):
+    """Nombre de lignes par code motif (codes absents omis)"""
+    counts = {}
+    for bit, code in enumerate(reason_codes(schema)):
+        n = int(np.count_nonzero(reasons >> bit & 1))
+        if n:
+            counts[code] = n
+    return counts
+
+
+def split_valid(raw, schema=SCHEMA):
+    """(lignes valides aux types du schéma, lignes rejetées avec leurs motifs, masques de bits)"""
+    reasons, converted = validate(raw, schema)
+    valid = reasons == 0
+    if valid.all() and not converted:
+        return raw, raw.iloc[:0].assign(**{REASON_COLUMN: pd.Series(dtype=object)}), reasons
+
+    rejected = raw[~valid].assign(**{REASON_COLUMN: reason_labels(reasons[~valid], schema)})
+    clean = raw[valid].copy() if converted else raw[valid]
+    for column, values in converted.items():
+        kind = schema[column]['kind']
+        clean[column] = values[valid].astype(np.int64 if kind == 'int' else np.float64)
+    return clean, rejected, reasons
+
+
+# ==================== QUARANTAINE ====================
+def run_path(path, started=None):
+    """Fichier de quarantaine d'une exécution : <nom>-AAAAMMJJ-HHMMSS<ext> (suffixe -2, -3... si déjà pris)"""
+    stem, extension = os.path.splitext(path)
+    stem = f"{stem}-{(started or datetime.now()):%Y%m%d-%H%M%S}"
+    candidate, k = stem + extension, 1
+    while os.path.exists(candidate):
+        k += 1
+        candidate = f"{stem}-{k}{extension}"
+    return candidate
+
+
+class Quarantine:
+    """Lignes rejetées ajoutées en CSV au fil des chunks (un fichier par exécution), comptées par motif"""
+
+    def __init__(self, path=QUARANTINE_PATH, schema=SCHEMA):
+        self.base_path = path
+        self.path = None
+        self.started = datetime.now()
+        self.schema = schema
+        self.n_rows = 0
+        self.counts = {}
+
+    def add(self, rejected, reasons):
+        """Écrit les lignes rejetées d'un chunk (reasons = masques de bits du chunk entier)"""
+        if rejected.empty:
+            return
+        for code, n in reason_counts(reasons, self.schema).items():
+            self.counts[code] = self.counts.get(code, 0) + n
+        if self.base_path:
+            if self.path is None:
+                # Fichier créé au premier rejet seulement
+                os.makedirs(os.path.dirname(os.path.abspath(self.base_path)), exist_ok=True)
+                self.path = run_path(self.base_path, self.started)
+            rejected.to_csv(self.path, mode='a', header=self.n_rows == 0, index=False)
+        self.n_rows += len(rejected)
+
+    def report(self):
+        return {'n_quarantined': self.n_rows, 'quarantine_path': self.path,
+                'reasons': dict(sorted(self.counts.items(), key=lambda item: -item[1]))}
+
+
+def _benchmark(raw_path, chunksize, repeats=3):
+    """Débit du scoring par chunks, avec et sans validation (meilleur de `repeats`)"""
+    from registry import load_current
+    from scoring import predict_scaled, transform
+
+    bundle = load_current()
+    chunks = list(pd.read_csv(raw_path, usecols=[ID_COLUMN] + RAW_COLUMNS, chunksize=chunksize))
+    n_rows = sum(len(chunk) for chunk in chunks)
+
+    def run(validated):
+        start = time.perf_counter()
+        for chunk in chunks:
+            if validated:
+                chunk, _, _ = split_valid(chunk)
+            predict_scaled(transform(chunk, bundle.scaler), bundle.model)
+        return time.perf_counter() - start
+
+    plain = min(run(False) for _ in range(repeats))
+    checked = min(run(True) for _ in range(repeats))
+    start = time.perf_counter()
+    for chunk in chunks:
+        validate(chunk)
+    validation = time.perf_counter() - start
+    return {'n_rows': n_rows, 'plain_rows_per_s': n_rows / plain, 'validated_rows_per_s': n_rows / checked,
+            'validate_rows_per_s': n_rows / validation, 'overhead': checked / plain - 1}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validation d'un CSV client contre le schéma")
+    parser.add_argument('raw', help="CSV client à valider")
+    parser.add_argument('--quarantine', default=QUARANTINE_PATH, help="CSV des lignes rejetées (horodaté par exécution)")
+    parser.add_argument('--chunksize', type=int, default=100_000)
+    parser.add_argument('--benchmark', action='store_true', help="Surcoût de la validation sur le scoring")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        report = _benchmark(args.raw, args.chunksize)
+        print(f"{report['n_rows']:,} lignes : scoring seul {report['plain_rows_per_s']:,.0f} lignes/s, "
+              f"avec validation {report['validated_rows_per_s']:,.0f} lignes/s "
+              f"(surcoût {report['overhead']:+.1%}) ; validation seule {report['validate_rows_per_s']:,.0f} lignes/s")
+    else:
+        quarantine = Quarantine(args.quarantine)
+        n_rows = 0
+        for chunk in pd.read_csv(args.raw, chunksize=args.chunksize):
+            _, rejected, reasons = split_valid(chunk)
+            quarantine.add(rejected, reasons)
+            n_rows += len(chunk)
+        report = quarantine.report()
+        print(f"{n_rows:,} lignes, {report['n_quarantined']:,} rejetées -> {report['quarantine_path'] or '-'}")
+        for code, n in report['reasons'].items():
+            print(f"  {code:32} {n:,}")
@@ -0,0 +1,95 @@
+"""
+Scoring - chargement des artefacts et prédiction vectorisée (unitaire ou batch)
+"""
+
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from features import FEATURES, RAW_COLUMNS, engineer_features
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODELS_DIR = os.path.join(ROOT_DIR, 'models')
+
+
+# ==================== ARTEFACTS ====================
+def load_artifacts(models_dir=DEFAULT_MODELS_DIR):
+    """Charge le modèle LightGBM, ses métadonnées et le scaler"""
+    if not os.path.exists(os.path.join(models_dir, 'lightgbm_churn_final.pkl')):
+        raise FileNotFoundError("Dossier models/ introuvable")
+
+    model = joblib.load(os.path.join(models_dir, 'lightgbm_churn_final.pkl'))
+    metadata = joblib.load(os.path.join(models_dir, 'model_metadata.pkl'))
+    scaler = joblib.load(os.path.join(models_dir, 'scaler.pkl'))
+
+    return model, metadata, scaler
+
+
+def model_version(metadata):
+    """Identifiant de version du modèle (date d'entraînement à défaut)"""
+    return str(metadata.get('version', metadata.get('training_date')))
+
+
+# ==================== PRÉDICTION ====================
+def transform(raw, scaler, features=FEATURES):
+    """Feature engineering + normalisation -> matrice float64 dans l'ordre du modèle"""
+    X = engineer_features(raw, features=features).to_numpy(dtype=np.float64)
+    return (X - scaler.mean_) / scaler.scale_
+
+
+def predict_scaled(X_scaled, model):
+    """Probabilités de churn à partir de features déjà normalisées"""
+    return model.predict_proba(np.atleast_2d(X_scaled))[:, 1]
+
+
+def predict_proba(raw, model, scaler):
+    """Probabilités de churn pour un DataFrame de colonnes brutes"""
+    return predict_scaled(transform(raw, scaler), model)
+
+
+def predict_bundle(bundle, raw):
+    """Probabilités d'un bundle ; scaler None = modèle compact (normalisation intégrée aux seuils)"""
+    model, _, scaler = bundle
+    if scaler is None:
+        return model.predict_proba(raw)
+    return predict_proba(raw, model, scaler)
+
+
+def logit(p, eps=1e-6):
+    """Log-odds d'une probabilité (bornée à [eps, 1 - eps])"""
+    p = np.clip(p, eps, 1 - eps)
+    return np.log(p / (1 - p))
+
+
+def calibrate(probabilities, metadata):
+    """Probabilités calibrées (np.interp sur les tableaux de metadata['calibration'])"""
+    calibration = metadata.get('calibration')
+    if calibration is None:
+        return np.asarray(probabilities, dtype=np.float64)
+    return np.interp(probabilities, calibration['x'], calibration['y'])
+
+
+def client_frame(**attributes):
+    """DataFrame d'une ligne au format brut du CSV (noms de colonnes d'origine)"""
+    return pd.DataFrame([attributes])[RAW_COLUMNS]
+
+
+# ==================== CLASSIFICATION ====================
+RISK_BANDS = [0.3, 0.6]
+RISK_LEVELS = ["Faible", "Modéré", "Élevé"]
+
+
+def classify_risk(probability):
+    """Niveau de risque affiché (Faible / Modéré / Élevé)"""
+    if probability < RISK_BANDS[0]:
+        return RISK_LEVELS[0]
+    elif probability < RISK_BANDS[1]:
+        return RISK_LEVELS[1]
+    return RISK_LEVELS[2]
+
+
+def classify_risk_array(probabilities):
+    """Version vectorisée de classify_risk (codes 0/1/2 vers RISK_LEVELS)"""
+    return np.searchsorted(RISK_BANDS, probabilities, side='right')
@@ -0,0 +1,305 @@
+"""
+Service pré-forké - les artefacts sont chargés une seule fois dans le
+processus parent, puis N workers sont forkés et partagent ces pages en
+copie sur écriture (au lieu d'un load_model() par processus).
+
+- Modèle compact (compact.py) : la forêt tient dans quelques tableaux NumPy.
+  Un worker ne touche que les compteurs de référence de leurs en-têtes ;
+  les pages de nœuds, jamais écrites, restent partagées.
+- gc.freeze() avant le fork : le ramasse-miettes des workers ne parcourt
+  plus (donc ne réécrit plus) les objets hérités du parent.
+- Un thread OpenMP / LightGBM par worker (OMP_NUM_THREADS, n_jobs=1) : le
+  parallélisme vient des workers, sans sursouscription des cœurs.
+
+Le socket d'écoute est ouvert dans le parent ; chaque worker accepte les
+connexions sur ce socket partagé. Les prédictions passent par le routeur
+champion / challenger (routing.py, variables CHALLENGER_*) : le challenger
+est chargé dans le parent, le thread shadow et le journal sont propres à
+chaque worker (data/processed/shadow_log-<pid>.csv). Une nouvelle version du
+registre est prise en compte au redémarrage du lanceur.
+
+Usage :
+    python app/serve.py serve --workers 4 [--port 8000] [--lightgbm]
+    python app/serve.py benchmark [--workers 1 2 4] [--requests 1000] [--batch 1]
+
+    curl -X POST localhost:8000/predict -d '[{"CreditScore": 650, "Geography": "France", ...}]'
+"""
+
+import os
+
+# Un thread de calcul par processus : OpenMP (LightGBM) et les BLAS lisent ces variables au chargement de
+# leur bibliothèque, donc avant le premier import de NumPy (valeur déjà fixée dans l'environnement conservée)
+THREAD_VARIABLES = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']
+for _variable in THREAD_VARIABLES:
+    os.environ.setdefault(_variable, '1')
+
+import argparse  # noqa: E402
+import gc  # noqa: E402
+import json  # noqa: E402
+import multiprocessing  # noqa: E402
+import signal  # noqa: E402
+import time  # noqa: E402
+from http.server import BaseHTTPRequestHandler, HTTPServer  # noqa: E402
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from features import ID_COLUMN, RAW_COLUMNS  # noqa: E402
+
+HOST = '127.0.0.1'
+PORT = 8000
+
+# Artefacts du processus (hérités par fork, rechargés par un worker 'spawn')
+_state = {}
+
+
+# ==================== ARTEFACTS PARTAGÉS ====================
+def serving_bundle(bundle, lightgbm=False):
+    """Bundle servi : LightGBM mono-thread, ou modèle compact (scaler None, booster non référencé)"""
+    from compact import COMPACT_PATH, export_compact, load_compact
+    from registry import ModelBundle
+
+    if lightgbm:
+        bundle.model.set_params(n_jobs=1)
+        return bundle
+    model = load_compact() if os.path.exists(COMPACT_PATH) else None
+    if model is None or model.meta['version'] != bundle.version:
+        model = export_compact(bundle, path=None)
+    # Le booster LightGBM n'est plus référencé : il n'est pas hérité par les workers
+    return ModelBundle(bundle.version, model, bundle.metadata, None)
+
+
+def load_state(lightgbm=False, challenger=False):
+    """Bundle servi (modèle compact par défaut) et, avec challenger=True, celui de CHALLENGER_VERSION"""
+    from pipeline import RAW_PATH
+    from registry import REGISTRY_DIR, load_current
+    from routing import challenger_from_env
+    from scoring import predict_bundle
+
+    state = {'bundle': serving_bundle(load_current(), lightgbm), 'challenger': None}
+    if challenger:
+        bundle = challenger_from_env(REGISTRY_DIR)
+        state['challenger'] = serving_bundle(bundle, lightgbm) if bundle is not None else None
+
+    # Préchauffage dans le parent : les initialisations paresseuses sont faites une fois et partagées
+    raw = pd.read_csv(RAW_PATH, usecols=RAW_COLUMNS, nrows=1)
+    for bundle in (state['bundle'], state['challenger']):
+        if bundle is not None:
+            predict_bundle(bundle, raw)
+    return state
+
+
+def score(state, raw, key=None):
+    """Probabilités brutes et calibrées, décisions au seuil optimal (via le routeur du worker s'il existe)"""
+    from scoring import calibrate, predict_bundle
+
+    router = state.get('router')
+    if router is None:
+        bundle, probabilities = state['bundle'], predict_bundle(state['bundle'], raw)
+    else:
+        bundle, probabilities = router.score(raw, key=key)
+    metadata = bundle.metadata
+    return {
+        'version': bundle.version,
+        'probabilities': probabilities,
+        'calibrated': calibrate(probabilities, metadata),
+        'churn': probabilities >= float(metadata['optimal_threshold']),
+    }
+
+
+def freeze():
+    """Objets du parent sortis du suivi du ramasse-miettes (pages non réécrites par les workers)"""
+    gc.collect()
+    gc.freeze()
+
+
+def memory_kb(pid='self'):
+    """(RSS, PSS) en Ko d'un processus ; PSS répartit chaque page partagée entre ses processus"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in ('Rss', 'Pss'):
+                values[key] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+
+# ==================== SERVICE HTTP ====================
+class PredictionHandler(BaseHTTPRequestHandler):
+    """POST /predict (liste de clients au format brut ; les lignes invalides sont renvoyées à part) ; GET /health"""
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._reply(404, {'error': f"Route inconnue : {self.path}"})
+        self._reply(200, {'version': _state['bundle'].version, 'pid': os.getpid()})
+
+    def do_POST(self):
+        from schema import REASON_COLUMN, split_valid
+
+        if self.path != '/predict':
+            return self._reply(404, {'error': f"Route inconnue : {self.path}"})
+        try:
+            records = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            raw = pd.DataFrame(records if isinstance(records, list) else [records])
+            clean, rejected, _ = split_valid(raw)
+        except ValueError as error:
+            return self._reply(400, {'error': str(error)})
+        # Comme l'export en masse : les lignes valides sont scorées, les rejetées renvoyées avec leurs motifs
+        payload = {'rejected': [{'index': int(index), 'reasons': reasons}
+                                for index, reasons in rejected[REASON_COLUMN].items()]}
+        if clean.empty:
+            return self._reply(422, payload)
+
+        # Affectation A/B stable par CustomerId pour une requête d'un seul client
+        key = int(clean[ID_COLUMN].iloc[0]) if len(clean) == 1 and ID_COLUMN in clean else None
+        result = score(_state, clean[RAW_COLUMNS], key)
+        self._reply(200, {'version': result.pop('version'), 'index': clean.index.tolist(),
+                          **{name: values.tolist() for name, values in result.items()}, **payload})
+
+    def log_message(self, format, *args):
+        # Pas de ligne stderr par requête
+        pass
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _serve_worker(server):
+    from registry import FixedRegistry
+    from routing import SHADOW_LOG_PATH, Router, ShadowLog
+
+    # Thread shadow et journal créés après le fork : propres à chaque worker
+    log = ShadowLog(SHADOW_LOG_PATH.replace('.csv', f'-{os.getpid()}.csv'))
+    _state['router'] = Router.from_env(FixedRegistry(_state['bundle']), _state['challenger'], log=log)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _state['router'].close()
+
+
+def serve(n_workers, host=HOST, port=PORT, lightgbm=False):
+    """Charge les artefacts, ouvre le socket puis forke les workers ; bloque jusqu'à SIGINT / SIGTERM"""
+    _state.update(load_state(lightgbm, challenger=True))
+    server = HTTPServer((host, port), PredictionHandler)
+    freeze()
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_serve_worker, args=(server,), daemon=True) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    challenger = _state['challenger']
+    print(f"{n_workers} workers sur http://{host}:{port} (modèle {_state['bundle'].version}, "
+          f"{'LightGBM' if lightgbm else 'compact'}"
+          f"{f', challenger {challenger.version}' if challenger is not None else ''})")
+
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # SIGTERM : chaque worker vide la file shadow et son journal avant de sortir
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+        server.server_close()
+
+
+# ==================== MESURES ====================
+# Ordre : les lancements 'spawn' d'abord, avant que le parent ne charge lui-même un modèle
+MODES = {
+    'indépendants (LightGBM)': ('spawn', True),
+    'pré-forkés (LightGBM)': ('fork', True),
+    'pré-forkés (compact)': ('fork', False),
+}
+
+
+def _bench_worker(lightgbm, requests, barrier, done, release):
+    """Worker de mesure : requêtes de `requests` (liste de DataFrames) après le départ commun"""
+    if not _state:
+        # Lancement 'spawn' : chaque processus charge ses propres artefacts, comme un load_model() isolé
+        _state.update(load_state(lightgbm))
+    barrier.wait()
+    for raw in requests:
+        score(_state, raw)
+    done.put(os.getpid())
+    release.wait()
+
+
+def benchmark(worker_counts, n_requests=1000, batch=1, modes=MODES):
+    """Mémoire totale (RSS, PSS) et débit (lignes/s) par mode de lancement et nombre de workers"""
+    from pipeline import RAW_PATH
+
+    raw = pd.read_csv(RAW_PATH, usecols=RAW_COLUMNS, nrows=n_requests * batch)
+    requests = [raw.iloc[start:start + batch] for start in range(0, len(raw), batch)]
+    rows = []
+    for mode, (method, lightgbm) in modes.items():
+        context = multiprocessing.get_context(method)
+        if method == 'fork':
+            _state.update(load_state(lightgbm))
+            freeze()
+        for n_workers in worker_counts:
+            barrier, done, release = context.Barrier(n_workers + 1), context.Queue(), context.Event()
+            workers = [context.Process(target=_bench_worker, args=(lightgbm, requests, barrier, done, release))
+                       for _ in range(n_workers)]
+            for worker in workers:
+                worker.start()
+            barrier.wait()
+            start = time.perf_counter()
+            pids = [done.get() for _ in workers]
+            elapsed = time.perf_counter() - start
+
+            # Mesure pendant que tous les workers sont vivants (pages partagées réparties entre eux)
+            memory = np.array([memory_kb(pid) for pid in pids])
+            _, parent_pss = memory_kb()
+            release.set()
+            for worker in workers:
+                worker.join()
+            rows.append({
+                'mode': mode,
+                'workers': n_workers,
+                'rss_workers_mo': memory[:, 0].sum() / 1024,
+                'pss_total_mo': (memory[:, 1].sum() + parent_pss) / 1024,
+                'lignes_par_s': n_workers * len(raw) / elapsed,
+            })
+        if method == 'fork':
+            gc.unfreeze()
+            _state.clear()
+            gc.collect()
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Service multi-workers pré-forké (mémoire du modèle partagée)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmd = sub.add_parser('serve', help="Lance le service HTTP")
+    cmd.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    cmd.add_argument('--host', default=HOST)
+    cmd.add_argument('--port', type=int, default=PORT)
+    cmd.add_argument('--lightgbm', action='store_true', help="Modèle LightGBM complet au lieu du modèle compact")
+    cmd = sub.add_parser('benchmark', help="Mémoire et débit selon le mode de lancement et le nombre de workers")
+    cmd.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    cmd.add_argument('--requests', type=int, default=1000, help="Requêtes par worker")
+    cmd.add_argument('--batch', type=int, default=1, help="Clients par requête")
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        serve(args.workers, args.host, args.port, args.lightgbm)
+    else:
+        table = benchmark(args.workers, args.requests, args.batch)
+        print(f"{os.cpu_count()} cœur(s) ; {args.requests:,} requêtes de {args.batch} client(s) par worker")
+        print(table.to_string(index=False, float_format=lambda x: f"{x:,.1f}"))
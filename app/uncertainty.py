@@ -0,0 +1,212 @@
+"""
+Incertitude des prédictions - ensemble bootstrap de modèles LightGBM
+(mêmes hyperparamètres que le modèle servi, chacun entraîné sur un
+rééchantillonnage du train SMOTE avec sa propre graine ; le train est
+normalisé par le scaler du modèle servi, dont les seuils sont ramenés
+dans l'espace brut), entraînés en
+parallèle puis aplatis dans un seul CompactModel : tous les membres sont
+évalués en un parcours vectorisé, sans LightGBM au chargement.
+
+Pour chaque client : dispersion des probabilités calibrées des membres
+(écart-type, intervalle 10 % - 90 %) et part des membres qui prennent la
+même décision que le modèle servi au seuil optimal.
+
+Usage :
+    python app/uncertainty.py train [--members 10] [--workers 2]
+    python app/uncertainty.py report
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from compact import CompactModel, flatten_trees
+from pipeline import MODELS_DIR, RANDOM_STATE, split_features
+from scoring import calibrate
+
+ENSEMBLE_PATH = os.path.join(MODELS_DIR, 'lightgbm_churn_ensemble.npz')
+N_MEMBERS = 10
+INTERVAL = (0.1, 0.9)
+BLOCK_ROWS = 5000
+
+
+class Ensemble(CompactModel):
+    """Membres de l'ensemble aplatis bout à bout ; member_offsets = premier arbre de chaque membre"""
+
+    def __init__(self, arrays, meta):
+        super().__init__(arrays, meta)
+        self.member_offsets = arrays['member_offsets']
+
+    @property
+    def nbytes(self):
+        return super().nbytes + self.member_offsets.nbytes
+
+    @property
+    def n_members(self):
+        return self.member_offsets.size
+
+    def member_probabilities(self, X):
+        """Probabilité de chaque membre (n_lignes, n_membres), par blocs de BLOCK_ROWS lignes"""
+        X = np.atleast_2d(X)
+        scores = np.empty((X.shape[0], self.n_members))
+        for start in range(0, X.shape[0], BLOCK_ROWS):
+            leaves = self.leaf_values(X[start:start + BLOCK_ROWS])
+            scores[start:start + BLOCK_ROWS] = np.add.reduceat(leaves, self.member_offsets, axis=1, dtype=np.float64)
+        return 1.0 / (1.0 + np.exp(-scores))
+
+    def uncertainty(self, X, probabilities, metadata):
+        """Dispersion (sur l'échelle calibrée) et accord des membres avec le modèle servi"""
+        members = self.member_probabilities(X)
+        threshold = float(metadata['optimal_threshold'])
+        decision = np.asarray(probabilities)[:, None] >= threshold
+        calibrated = calibrate(members, metadata)
+        low, high = np.quantile(calibrated, INTERVAL, axis=1)
+        return {
+            'std': calibrated.std(axis=1),
+            'low': low,
+            'high': high,
+            'agreement': ((members >= threshold) == decision).mean(axis=1),
+        }
+
+
+def load_ensemble(version=None, path=ENSEMBLE_PATH):
+    """Ensemble enregistré ; None s'il est absent ou construit pour une autre version du modèle"""
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files if key != 'meta'}
+        meta = json.loads(str(data['meta']))
+    if version is not None and meta['version'] != version:
+        return None
+    return Ensemble(arrays, meta)
+
+
+# ==================== ENTRAÎNEMENT ====================
+def balanced_train(scaler):
+    """Train normalisé par le scaler du modèle servi puis rééquilibré par SMOTE"""
+    from imblearn.over_sampling import SMOTE
+
+    X_train, _, y_train, _ = split_features()
+    return SMOTE(random_state=RANDOM_STATE).fit_resample(scaler.transform(X_train), y_train)
+
+
+def _fit_member(estimator, X, y, seed):
+    """Entraîne un membre sur un bootstrap du train SMOTE (exécuté dans un worker)"""
+    from sklearn.base import clone
+
+    sample = np.random.default_rng(seed).integers(0, len(y), len(y))
+    model = clone(estimator).set_params(random_state=seed, n_jobs=1)
+    model.fit(X[sample], y[sample])
+    return model.booster_.dump_model()
+
+
+def train_ensemble(bundle=None, n_members=N_MEMBERS, n_workers=None, path=ENSEMBLE_PATH):
+    """Entraîne les membres en parallèle et les enregistre en un seul tableau de nœuds"""
+    from registry import load_current
+
+    bundle = bundle or load_current()
+    seeds = [RANDOM_STATE + 1 + k for k in range(n_members)]
+    n_workers = n_workers or min(n_members, os.cpu_count() or 1)
+    X, y = balanced_train(bundle.scaler)
+    if n_workers <= 1:
+        dumps = [_fit_member(bundle.estimator(), X, y, seed) for seed in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            dumps = list(executor.map(_fit_member, [bundle.estimator()] * n_members,
+                                      [X] * n_members, [y] * n_members, seeds))
+
+    # Concaténation des arbres de tous les membres (indices décalés par membre)
+    arrays, n_trees, depth = None, [], 0
+    for dump in dumps:
+        member, member_depth = flatten_trees(dump, bundle.scaler)
+        n_trees.append(member['roots'].size)
+        depth = max(depth, member_depth)
+        if arrays is None:
+            arrays = {key: [value] for key, value in member.items()}
+            continue
+        offset = sum(part.size for part in arrays['feature'])
+        for key in ('left', 'right', 'roots'):
+            member[key] = member[key].astype(np.int32) + offset
+        for key, value in member.items():
+            arrays[key].append(value)
+
+    n_nodes = sum(part.size for part in arrays['feature'])
+    index_type = np.int16 if n_nodes < np.iinfo(np.int16).max else np.int32
+    arrays = {key: np.concatenate(parts).astype(index_type if key in ('left', 'right', 'roots') else parts[0].dtype)
+              for key, parts in arrays.items()}
+    arrays['member_offsets'] = np.r_[0, np.cumsum(n_trees)[:-1]].astype(np.int32)
+    meta = {
+        'version': bundle.version,
+        'features': list(bundle.metadata['features']),
+        'depth': depth,
+        'n_members': n_members,
+        'seeds': seeds,
+    }
+    if path:
+        np.savez_compressed(path, meta=np.array(json.dumps(meta)), **arrays)
+    return Ensemble(arrays, meta)
+
+
+# ==================== RAPPORT ====================
+def coverage_report(ensemble, bundle):
+    """Sur le split de test : largeur des intervalles, accord, et taux d'erreur selon l'accord"""
+    from scoring import predict_scaled
+
+    _, X, _, y = split_features()
+    probabilities = predict_scaled(bundle.scaler.transform(X), bundle.model)
+    result = ensemble.uncertainty(X, probabilities, bundle.metadata)
+    errors = (probabilities >= bundle.metadata['optimal_threshold']) != y.astype(bool)
+    unanimous = result['agreement'] == 1
+    return {
+        'members': ensemble.n_members,
+        'mean_std': float(result['std'].mean()),
+        'mean_interval_width': float((result['high'] - result['low']).mean()),
+        'unanimous_share': float(unanimous.mean()),
+        'error_rate_unanimous': float(errors[unanimous].mean()),
+        'error_rate_split': float(errors[~unanimous].mean()),
+    }
+
+
+def latency(ensemble, raw, repeats=200):
+    """p50 (ms) de l'incertitude d'un client, features comprises"""
+    from features import engineer_features
+
+    row = raw.iloc[:1]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        ensemble.member_probabilities(engineer_features(row).to_numpy(dtype=np.float32))
+        timings.append(time.perf_counter() - start)
+    return float(np.percentile(timings, 50) * 1000)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ensemble bootstrap pour l'incertitude des prédictions")
+    sub = parser.add_subparsers(dest='command', required=True)
+    cmd = sub.add_parser('train', help="Entraîne et enregistre l'ensemble")
+    cmd.add_argument('--members', type=int, default=N_MEMBERS)
+    cmd.add_argument('--workers', type=int, default=None)
+    sub.add_parser('report', help="Couverture, accord et latence sur le split de test")
+    args = parser.parse_args()
+
+    from pipeline import RAW_PATH
+    from registry import load_current
+
+    bundle = load_current()
+    if args.command == 'train':
+        start = time.perf_counter()
+        ensemble = train_ensemble(bundle, args.members, args.workers)
+        print(f"Ensemble de {ensemble.n_members} membres en {time.perf_counter() - start:.1f}s -> {ENSEMBLE_PATH} "
+              f"({os.path.getsize(ENSEMBLE_PATH) / 1024:.0f} Ko, {ensemble.nbytes / 1024:.0f} Ko en mémoire)")
+    else:
+        ensemble = load_ensemble(bundle.version)
+        if ensemble is None:
+            raise SystemExit("Ensemble absent ou périmé : lancer 'python app/uncertainty.py train'")
+        report = coverage_report(ensemble, bundle)
+        print(pd.Series(report).to_string())
+        print(f"Latence p50 (1 client) : {latency(ensemble, pd.read_csv(RAW_PATH, nrows=10)):.2f} ms")
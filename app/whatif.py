@@ -0,0 +1,71 @@
+"""
+Simulation What-If - variantes d'un client scorées en un seul appel predict_proba
+"""
+
+import numpy as np
+import pandas as pd
+
+from features import RAW_COLUMNS
+from scoring import predict_proba
+
+# Leviers simulés : valeurs testées et coût unitaire estimé (€) d'un changement. Les courbes couvrent
+# toute la plage ; seules les hausses (activation, produit ou carte ajoutés, ancienneté, solde) sont
+# des actions proposables, sauf pour les leviers 'action': False (score externe à la banque)
+LEVERS = {
+    'Is Active Member': {'label': 'Activation du membre', 'values': [0, 1], 'unit_cost': 50},
+    'Num Of Products': {'label': 'Nombre de produits', 'values': [1, 2, 3, 4], 'unit_cost': 120},
+    'Has Credit Card': {'label': 'Carte de crédit', 'values': [0, 1], 'unit_cost': 30},
+    'Tenure': {'label': 'Ancienneté (années)', 'values': list(range(0, 11)), 'unit_cost': 80},
+    'Balance': {'label': 'Solde du compte (€)', 'values': list(range(0, 300001, 5000)), 'unit_cost': 0.002},
+    'CreditScore': {'label': 'Credit Score', 'values': list(range(350, 851, 10)), 'unit_cost': 2,
+                    'action': False},
+}
+
+
+def build_grid(client, levers=LEVERS):
+    """Variantes du client : un levier modifié à la fois (client = dict au format brut)"""
+    sizes = [len(lever['values']) for lever in levers.values()]
+    values = np.concatenate([np.asarray(lever['values'], dtype=np.float64) for lever in levers.values()])
+    lever_names = np.repeat(list(levers), sizes)
+
+    grid = {
+        column: np.full(values.size, client[column], dtype=np.float64 if column in levers else None)
+        for column in RAW_COLUMNS
+    }
+    unit_cost = np.repeat([lever['unit_cost'] for lever in levers.values()], sizes)
+    action = np.repeat([lever.get('action', True) for lever in levers.values()], sizes)
+    base = np.empty(values.size)
+
+    offset = 0
+    for column, size in zip(levers, sizes):
+        grid[column][offset:offset + size] = values[offset:offset + size]
+        base[offset:offset + size] = client[column]
+        offset += size
+
+    grid = pd.DataFrame(grid)
+    grid['lever'] = lever_names
+    grid['value'] = values
+    grid['cost'] = np.abs(values - base) * unit_cost
+    grid['actionable'] = action & (values > base)
+    return grid
+
+
+def simulate(client, model, scaler, levers=LEVERS):
+    """Score toute la grille en un seul predict_proba"""
+    grid = build_grid(client, levers)
+    grid['probability'] = predict_proba(grid, model, scaler)
+    return grid
+
+
+def cheapest_lever(grid, base_probability, threshold):
+    """Action (hausse d'un levier) la moins chère passant sous le seuil, sinon meilleure baisse par euro"""
+    candidates = grid[grid['actionable'] & (grid['probability'] < base_probability)]
+    if candidates.empty:
+        return None
+
+    below = candidates[candidates['probability'] < threshold]
+    if not below.empty:
+        return below.sort_values(['cost', 'probability']).iloc[0]
+
+    gain_per_euro = (base_probability - candidates['probability']) / candidates['cost']
+    return candidates.loc[gain_per_euro.idxmax()]